@@ -0,0 +1,147 @@
+"""
+Archivo frío de turnos del backend en memoria
+Un bloque NDJSON comprimido con gzip por mes, en disco junto al journal o en memoria
+"""
+
+import gzip
+import json
+import os
+import threading
+from collections import defaultdict
+from datetime import date
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set
+
+from app.db.journal import dumps, loads
+from app.db.records import AppointmentRecord
+from app.db.store import date_key, order_key
+
+INDEX_FILE = 'index.json'
+
+
+def month_key(value: Any) -> str:
+    """Mes 'YYYY-MM' de una fecha"""
+    return date_key(value)[:7]
+
+
+class MonthlyArchive:
+    """Turnos archivados agrupados por mes del turno
+
+    Cada mes es un bloque comprimido que sólo se descomprime cuando una
+    consulta llega a ese mes; en memoria quedan el índice ID -> mes y la
+    última fecha archivada. Con `directory`, cada mes es un archivo
+    YYYY-MM.ndjson.gz (reemplazado de forma atómica) y el índice se guarda
+    en index.json. Agregar un turno que ya estaba lo reemplaza, así que
+    repetir un archivado (p. ej. al reaplicar el journal) no duplica.
+    """
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory
+        self._blobs: Dict[str, bytes] = {}
+        self._months: Dict[str, Set[int]] = {}
+        self._ids: Dict[int, str] = {}
+        self.until: Optional[date] = None
+        self._lock = threading.Lock()
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self._load_index()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, appointment_id: int) -> bool:
+        return appointment_id in self._ids
+
+    def add(self, appointments: Iterable[Dict[str, Any]]) -> int:
+        """Archiva turnos; devuelve cuántos agregó o reemplazó"""
+        by_month: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+        for appointment in appointments:
+            by_month[month_key(appointment['appointment_date'])].append(appointment)
+        if not by_month:
+            return 0
+        count = 0
+        with self._lock:
+            for month, rows in by_month.items():
+                records = {record['id']: record for record in self._read(month)}
+                for row in rows:
+                    records[row['id']] = row
+                    self._ids[row['id']] = month
+                    last = AppointmentRecord(row)['appointment_date']
+                    self.until = last if self.until is None or last > self.until else self.until
+                    count += 1
+                self._write(month, sorted(records.values(), key=order_key))
+                self._months[month] = set(records)
+            self._save_index()
+        return count
+
+    def get(self, appointment_id: int) -> Optional[AppointmentRecord]:
+        """Turno archivado por ID; descomprime sólo su mes"""
+        month = self._ids.get(appointment_id)
+        if month is None:
+            return None
+        return next((record for record in self._read(month) if record['id'] == appointment_id), None)
+
+    def scan(self, start: Any = None, end: Any = None) -> Iterator[AppointmentRecord]:
+        """Turnos archivados con start <= fecha <= end en orden (fecha, hora, id)"""
+        start_key, end_key = date_key(start), date_key(end)
+        for month in sorted(self._months):
+            if (start_key and month < start_key[:7]) or (end_key and month > end_key[:7]):
+                continue
+            for record in self._read(month):
+                day = date_key(record['appointment_date'])
+                if (start_key and day < start_key) or (end_key and day > end_key):
+                    continue
+                yield record
+
+    def _read(self, month: str) -> List[AppointmentRecord]:
+        if self.directory:
+            path = self._path(month)
+            if not os.path.exists(path):
+                return []
+            with open(path, 'rb') as f:
+                blob = f.read()
+        else:
+            blob = self._blobs.get(month)
+            if blob is None:
+                return []
+        return [AppointmentRecord(loads(line)) for line in gzip.decompress(blob).decode('utf-8').splitlines()]
+
+    def _write(self, month: str, records: List[Dict[str, Any]]):
+        blob = gzip.compress(''.join(dumps(record) + '\n' for record in records).encode('utf-8'))
+        if not self.directory:
+            self._blobs[month] = blob
+            return
+        self._replace(self._path(month), blob)
+
+    def _path(self, month: str) -> str:
+        return os.path.join(self.directory, f'{month}.ndjson.gz')
+
+    def _load_index(self):
+        path = os.path.join(self.directory, INDEX_FILE)
+        if not os.path.exists(path):
+            return
+        with open(path, encoding='utf-8') as f:
+            index = json.load(f)
+        for month, ids in index['months'].items():
+            self._months[month] = set(ids)
+            for appointment_id in ids:
+                self._ids[appointment_id] = month
+        self.until = date.fromisoformat(index['until']) if index.get('until') else None
+
+    def _save_index(self):
+        if not self.directory:
+            return
+        index = {
+            'until': self.until.isoformat() if self.until else None,
+            'months': {month: sorted(ids) for month, ids in self._months.items()}
+        }
+        self._replace(os.path.join(self.directory, INDEX_FILE), json.dumps(index).encode('utf-8'))
+
+    @staticmethod
+    def _replace(path: str, data: bytes):
+        # Archivo temporal + os.replace: un corte a mitad de escritura no deja el mes a medias
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
@@ -0,0 +1,57 @@
+"""
+Backends de almacenamiento
+El backend se elige según el esquema de DATABASE_URL
+"""
+
+import logging
+import threading
+
+from app.config import DATABASE_URL
+from app.db.backends.base import StorageBackend
+from app.db.backends.memory import MemoryBackend, journal_dir_from_url
+from app.db.query_cache import query_cache
+
+logger = logging.getLogger('asistente_salud')
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def create_backend(database_url: str) -> StorageBackend:
+    """Crea el backend correspondiente a una URL de base de datos"""
+    scheme = database_url.split(':', 1)[0].lower() if database_url else 'memory'
+    if scheme == 'memory':
+        return MemoryBackend(journal_dir_from_url(database_url))
+    if scheme in ('postgres', 'postgresql'):
+        from app.db.backends.postgres import PostgresBackend
+        return PostgresBackend()
+    if scheme == 'sqlite':
+        from app.db.backends.sqlite import SQLiteBackend, path_from_url
+        return SQLiteBackend(path_from_url(database_url))
+    raise ValueError(f"DATABASE_URL no soportada: {scheme}://")
+
+
+def get_backend() -> StorageBackend:
+    """Backend activo; se crea en el primer uso"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = create_backend(DATABASE_URL)
+                logger.info(f"Backend de almacenamiento: {_backend.name}")
+    return _backend
+
+
+def set_backend(backend: StorageBackend) -> StorageBackend:
+    """Reemplaza el backend activo (tests, scripts de mantenimiento)"""
+    global _backend
+    with _backend_lock:
+        previous, _backend = _backend, backend
+    if previous is not None and previous is not backend:
+        previous.close()
+    # Los resultados en caché pertenecen al backend anterior
+    query_cache.clear()
+    return backend
+
+
+__all__ = ['StorageBackend', 'MemoryBackend', 'create_backend', 'get_backend', 'set_backend']
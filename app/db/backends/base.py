@@ -0,0 +1,238 @@
+"""
+Interfaz común de los backends de almacenamiento
+Cada backend implementa las mismas operaciones que expone app/db/queries.py
+"""
+
+from enum import Enum
+from typing import Any, Dict, Iterator, List, Tuple
+
+from app.config import DEFAULT_APPOINTMENT_MINUTES
+
+
+def plain(value: Any) -> Any:
+    """Convierte enums (p. ej. EstadoTurno) a su valor primitivo antes de guardarlos"""
+    return value.value if isinstance(value, Enum) else value
+
+
+def new_appointment(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Campos de un turno nuevo con sus valores por defecto"""
+    return {
+        'phone_number': data.get('phone_number'),
+        'patient_name': data.get('patient_name'),
+        'appointment_date': data.get('appointment_date'),
+        'appointment_time': data.get('appointment_time'),
+        'professional': data.get('professional'),
+        'urgency_level': data.get('urgency_level'),
+        'notes': data.get('notes'),
+        'status': 'pendiente',
+        'followup_sent': False,
+        'attended': None,
+        'version': 1,
+        'duration_minutes': data.get('duration_minutes') or DEFAULT_APPOINTMENT_MINUTES
+    }
+
+
+def new_notification(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Campos de una notificación nueva con sus valores por defecto"""
+    return {
+        'phone_number': data.get('phone_number'),
+        'message': data.get('message'),
+        'notification_type': data.get('notification_type'),
+        'status': 'pendiente',
+        'sent_at': None,
+        'error_message': None,
+        'retry_count': 0
+    }
+
+
+def new_feedback(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Campos de un feedback nuevo"""
+    return {
+        'phone_number': data.get('phone_number'),
+        'patient_name': data.get('patient_name'),
+        'rating': data.get('rating'),
+        'comment': data.get('comment')
+    }
+
+
+def new_attachment(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Campos de un adjunto nuevo"""
+    return {
+        'appointment_id': data.get('appointment_id'),
+        'phone_number': data.get('phone_number'),
+        'filename': data.get('filename'),
+        'file_type': data.get('file_type'),
+        'file_size': data.get('file_size')
+    }
+
+
+class StorageBackend:
+    """Operaciones que debe implementar un backend
+
+    Los métodos no capturan excepciones: el manejo de errores y el logging
+    quedan en app/db/queries.py, igual para todos los backends.
+    """
+
+    name = 'base'
+
+    # Turnos
+    def save_appointment(self, data):
+        """Inserta un turno; lanza SlotUnavailableError si el horario está ocupado"""
+        raise NotImplementedError
+
+    def get_appointments(self, phone_number=None):
+        raise NotImplementedError
+
+    def get_appointment(self, appointment_id):
+        raise NotImplementedError
+
+    def update_appointment(self, appointment_id, changes, expected_version=None) -> bool:
+        """Actualiza un turno e incrementa su versión; lanza SlotUnavailableError si lo mueve
+        a un horario ocupado y, con `expected_version`, VersionConflictError si el turno ya
+        tiene otra versión (compare-and-set)"""
+        raise NotImplementedError
+
+    def delete_appointment(self, appointment_id) -> bool:
+        raise NotImplementedError
+
+    def get_appointments_page(self, after, limit, start_date=None, end_date=None, phone_number=None, status=None):
+        """Hasta `limit` turnos posteriores a la clave `after` (fecha, hora, id), en ese orden"""
+        raise NotImplementedError
+
+    def get_appointments_by_date(self, target_date):
+        raise NotImplementedError
+
+    def get_appointments_by_date_range(self, start_date, end_date):
+        raise NotImplementedError
+
+    def get_upcoming_appointments(self, today):
+        raise NotImplementedError
+
+    def get_past_unattended_appointments(self, today):
+        raise NotImplementedError
+
+    def get_last_appointment(self, phone_number):
+        raise NotImplementedError
+
+    def is_slot_available(self, appointment_date, appointment_time, professional=None, exclude_id=None,
+                          duration=None) -> bool:
+        """Indica si [hora, hora + duración) no se solapa con otro turno activo del día y profesional"""
+        raise NotImplementedError
+
+    def get_followup_candidates(self, before):
+        """Turnos confirmados anteriores a `before` sin mensaje de seguimiento"""
+        raise NotImplementedError
+
+    def get_absence_candidates(self, before):
+        """Turnos confirmados anteriores a `before` sin asistencia registrada ni seguimiento"""
+        raise NotImplementedError
+
+    def get_absent_appointments(self, before):
+        """Turnos confirmados anteriores a `before` sin asistencia registrada, con o sin seguimiento"""
+        raise NotImplementedError
+
+    def get_recent_followups(self, since, before):
+        """Turnos con seguimiento enviado y fecha en [since, before)"""
+        raise NotImplementedError
+
+    def get_last_followed_up_appointment(self, phone_number, before):
+        """Último turno del teléfono anterior a `before` al que ya se le envió seguimiento"""
+        raise NotImplementedError
+
+    # Notificaciones
+    def save_notification(self, data):
+        raise NotImplementedError
+
+    def get_notifications(self, phone_number=None):
+        raise NotImplementedError
+
+    def get_notification(self, notification_id):
+        raise NotImplementedError
+
+    def update_notification(self, notification_id, changes) -> bool:
+        raise NotImplementedError
+
+    def notification_counts(self) -> List[Tuple[str, str, int]]:
+        """(estado, día 'YYYY-MM-DD' de creación, cantidad) agrupado, para reconstruir estadísticas"""
+        raise NotImplementedError
+
+    # Estado de conversación
+    def get_conversation_state(self, phone_number):
+        raise NotImplementedError
+
+    def get_conversation_state_entry(self, phone_number):
+        """(estado, updated_at) vigente del teléfono, o None si no hay"""
+        state = self.get_conversation_state(phone_number)
+        return (state, None) if state else None
+
+    def save_conversation_state(self, phone_number, state):
+        raise NotImplementedError
+
+    def update_conversation_state(self, phone_number, state):
+        raise NotImplementedError
+
+    def clear_conversation_state(self, phone_number):
+        raise NotImplementedError
+
+    def conversation_activity(self):
+        """(teléfono, updated_at) de los estados vigentes; vacío si no se persisten"""
+        return []
+
+    def purge_expired_conversation_states(self) -> int:
+        """Elimina estados vencidos; devuelve cuántos quitó"""
+        return 0
+
+    def conversation_state_stats(self) -> Dict[str, int]:
+        """Contadores del almacenamiento de estados (vacío si el backend no los lleva)"""
+        return {}
+
+    # Feedback y adjuntos
+    def insert_feedback(self, data):
+        raise NotImplementedError
+
+    def get_all_feedback(self):
+        raise NotImplementedError
+
+    def insert_attachment(self, data):
+        raise NotImplementedError
+
+    # Archivo de turnos: los turnos viejos cerrados pasan a un almacenamiento frío
+    def archive_appointments(self, before, statuses) -> int:
+        """Mueve al archivo los turnos anteriores a `before` con estado en `statuses`
+        (sin adjuntos vinculados); devuelve cuántos movió"""
+        raise NotImplementedError
+
+    def archived_until(self):
+        """Fecha del turno archivado más reciente, o None si el archivo está vacío"""
+        return None
+
+    def get_archived_appointment(self, appointment_id):
+        return None
+
+    def iter_archived_appointments(self, start_date=None, end_date=None, phone_number=None,
+                                   status=None, after=None) -> Iterator[Dict[str, Any]]:
+        """Turnos archivados en orden (fecha, hora, id), posteriores a la clave `after`"""
+        return iter(())
+
+    # Línea de tiempo del paciente
+    def get_patient_events(self, phone_number, after=None, limit=50):
+        """Un iterador por colección (turnos, notificaciones, feedback, adjuntos) con los
+        eventos del teléfono de clave menor que el cursor `after`, del más reciente al más
+        antiguo; cada uno entrega al menos `limit` eventos si los hay (ver app/db/timeline.py)"""
+        raise NotImplementedError
+
+    # Exportación: generadores que no materializan el resultado completo
+    def iter_appointments(self, start_date=None, end_date=None, status=None) -> Iterator[Dict[str, Any]]:
+        """Turnos en orden (fecha, hora, id), filtrados por fecha del turno y estado"""
+        raise NotImplementedError
+
+    def iter_notifications(self, start_date=None, end_date=None, status=None) -> Iterator[Dict[str, Any]]:
+        """Notificaciones en orden de ID, filtradas por día de creación y estado"""
+        raise NotImplementedError
+
+    def iter_feedback(self, start_date=None, end_date=None) -> Iterator[Dict[str, Any]]:
+        """Feedback en orden de ID, filtrado por día de creación"""
+        raise NotImplementedError
+
+    def close(self):
+        """Libera recursos del backend"""
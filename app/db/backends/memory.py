@@ -0,0 +1,468 @@
+"""
+Backend en memoria
+Simulación para desarrollo y tests, sin servidor de base de datos
+Con un directorio (memory:///ruta) persiste en un journal con snapshots
+"""
+
+import logging
+import os
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from app.db.backends.base import (
+    StorageBackend, plain, new_appointment, new_notification,
+    new_feedback, new_attachment
+)
+from app.config import (
+    CONVERSATION_STATE_TTL, CONVERSATION_STATE_MAX, CONVERSATION_STATE_SWEEP_INTERVAL,
+    MEMORY_SNAPSHOT_EVERY, MEMORY_JOURNAL_FSYNC
+)
+from app.db.archive import MonthlyArchive
+from app.db.journal import Journal
+from app.db.locks import IdAllocator, StripedLock, phone_stripe
+from app.db.store import AppointmentStore, date_key, order_key
+from app.db.timeline import PhoneIndex, bound, created_moment, events
+from app.utils.cache import TTLCache
+
+logger = logging.getLogger('asistente_salud')
+
+
+def journal_dir_from_url(database_url: str) -> Optional[str]:
+    """Directorio del journal en memory:///ruta absoluta o memory://ruta/relativa; None si no hay"""
+    path = database_url.split(':', 1)[1] if ':' in database_url else ''
+    return path[2:] if path.startswith('//') and len(path) > 2 else None
+
+
+class MemoryBackend(StorageBackend):
+    """Guarda todo en estructuras de Python dentro del proceso
+
+    Las mutaciones pasan por _commit(), que las aplica y, si hay journal,
+    las agrega como operación; al arrancar se carga el snapshot y se
+    reaplican las operaciones posteriores con el mismo _apply().
+    Los turnos archivados salen de AppointmentStore a un MonthlyArchive
+    (con journal, en el subdirectorio archive/) y no entran en el snapshot.
+
+    Cada operación se aplica y se registra con las franjas de su teléfono y
+    de su día tomadas (ver _locked()), así las escrituras de un mismo
+    paciente o día quedan en el journal en el orden en que se aplicaron y
+    las de otros no esperan. El snapshot y el archivado toman todas.
+    """
+
+    name = 'memory'
+
+    def __init__(self, journal_dir: Optional[str] = None):
+        self._stripes = StripedLock()
+        self.appointments = AppointmentStore(self._stripes)
+        self.notifications: List[Dict[str, Any]] = []
+        self.conversation_states = TTLCache(CONVERSATION_STATE_TTL, CONVERSATION_STATE_MAX)
+        self.feedback: List[Dict[str, Any]] = []
+        self.attachments: List[Dict[str, Any]] = []
+        # Índices por teléfono para la línea de tiempo del paciente
+        self._timeline = {
+            'notification': PhoneIndex(created_moment),
+            'feedback': PhoneIndex(created_moment),
+            'attachment': PhoneIndex(created_moment)
+        }
+        # IDs que no se repiten aunque dos hilos inserten a la vez
+        self._ids = {'notification': IdAllocator(), 'feedback': IdAllocator(), 'attachment': IdAllocator()}
+        self._notifications_by_id: Dict[int, Dict[str, Any]] = {}
+        self.archive = MonthlyArchive(os.path.join(journal_dir, 'archive') if journal_dir else None)
+        self.journal = None
+        if journal_dir:
+            self.journal = Journal(journal_dir, MEMORY_SNAPSHOT_EVERY, MEMORY_JOURNAL_FSYNC)
+            self._restore()
+        self.conversation_states.start_sweeper(CONVERSATION_STATE_SWEEP_INTERVAL)
+
+    # ========================================
+    # JOURNAL
+    # ========================================
+
+    def _commit(self, op: str, *args):
+        """Aplica una operación y la registra en el journal si tuvo efecto"""
+        with self._locked(op, args):
+            result, compact = self._apply_and_log(op, *args)
+        # Sin ninguna franja tomada: el snapshot las toma todas, en orden
+        if compact:
+            self.snapshot()
+        return result
+
+    def _apply_and_log(self, op: str, *args):
+        """_apply() más el journal, con las franjas ya tomadas; devuelve (resultado, hay que compactar)"""
+        result = self._apply(op, *args)
+        if self.journal is not None and result is not None and result is not False:
+            return result, self.journal.append(op, *args)
+        return result, False
+
+    def _locked(self, op: str, args):
+        """Franjas que necesita una operación: las del teléfono y el día que modifica"""
+        if op == 'appointment+':
+            return self._stripes.holding(*AppointmentStore.stripe_keys(args[0]))
+        if op == 'appointment~':
+            return self.appointments.locking(args[0], args[1])
+        if op == 'appointment-':
+            return self.appointments.locking(args[0])
+        if op in ('notification+', 'feedback+', 'attachment+'):
+            return self._stripes.holding(phone_stripe(args[0].get('phone_number')))
+        if op == 'notification~':
+            notification = self._notifications_by_id.get(args[0]) or {}
+            phones = {notification.get('phone_number'), args[1].get('phone_number', notification.get('phone_number'))}
+            return self._stripes.holding(*(phone_stripe(phone) for phone in phones))
+        if op in ('state=', 'state-'):
+            return self._stripes.holding(phone_stripe(args[0]))
+        return self._stripes.holding_all()
+
+    def _apply(self, op: str, *args):
+        if op == 'appointment+':
+            return self.appointments.insert(args[0])
+        if op == 'appointment~':
+            # Las operaciones previas a la columna version no traen la versión esperada
+            return self.appointments.update(*args)
+        if op == 'appointment-':
+            return self.appointments.delete(args[0])
+        if op == 'notification+':
+            self._add_record('notification', self.notifications, args[0])
+            self._notifications_by_id[args[0]['id']] = args[0]
+            return args[0]
+        if op == 'notification~':
+            notification = self._notifications_by_id.get(args[0])
+            if notification is None:
+                return False
+            index = self._timeline['notification']
+            index.remove(notification.get('phone_number'), notification)
+            notification.update(args[1])
+            index.add(notification.get('phone_number'), notification)
+            return True
+        if op == 'state=':
+            phone_number, state, expires_at = args
+            ttl = expires_at - time.time()
+            if ttl > 0:
+                self.conversation_states.set(phone_number, state, ttl=ttl)
+            return True
+        if op == 'state-':
+            return self.conversation_states.pop(args[0]) is not None
+        if op == 'feedback+':
+            return self._add_record('feedback', self.feedback, args[0])
+        if op == 'attachment+':
+            return self._add_record('attachment', self.attachments, args[0])
+        if op == 'archive':
+            return self._archive(*args)
+        raise ValueError(f"Operación de journal desconocida: {op}")
+
+    def _add_record(self, kind: str, records: List[Dict[str, Any]], record: Dict[str, Any]) -> Dict[str, Any]:
+        records.append(record)
+        self._ids[kind].observe(record['id'])
+        self._timeline[kind].add(record.get('phone_number'), record)
+        return record
+
+    def _restore(self):
+        started = time.monotonic()
+        snapshot, records = self.journal.load()
+        if snapshot:
+            for appointment in snapshot['appointments']:
+                self.appointments.insert(appointment)
+            self.appointments.ids.observe(snapshot['next_appointment_id'] - 1)
+            for kind, collection, rows in (('notification', self.notifications, snapshot['notifications']),
+                                           ('feedback', self.feedback, snapshot['feedback']),
+                                           ('attachment', self.attachments, snapshot['attachments'])):
+                for row in rows:
+                    self._add_record(kind, collection, row)
+            self._notifications_by_id.update((row['id'], row) for row in self.notifications)
+            for phone_number, state, expires_at in snapshot['states']:
+                self._apply('state=', phone_number, state, expires_at)
+        for record in records:
+            self._apply(*record)
+        logger.info(
+            f"Backend en memoria restaurado: {len(self.appointments)} turnos, "
+            f"{len(records)} operaciones del journal en {time.monotonic() - started:.2f}s"
+        )
+
+    def _archive(self, before, statuses):
+        # Idempotente: al reaplicar el journal, los turnos que ya estaban en el archivo se reemplazan
+        linked = {attachment.get('appointment_id') for attachment in self.attachments}
+        moved = [
+            apt for status in statuses for apt in self.appointments.by_status(status, before=before)
+            if apt['id'] not in linked
+        ]
+        if not moved:
+            return None
+        self.archive.add(moved)
+        for apt in moved:
+            self.appointments.delete(apt['id'])
+        return len(moved)
+
+    def snapshot(self):
+        """Escribe un snapshot compactado del estado actual y vacía el journal"""
+        if self.journal is None:
+            return
+        with self._stripes.holding_all():
+            now = time.time()
+            self.journal.write_snapshot({
+                'appointments': self.appointments.all(),
+                'next_appointment_id': self.appointments.ids.next_value,
+                'notifications': self.notifications,
+                'feedback': self.feedback,
+                'attachments': self.attachments,
+                'states': [
+                    [phone_number, state, now + ttl]
+                    for phone_number, state, ttl in self.conversation_states.items()
+                ]
+            })
+
+    # ========================================
+    # TURNOS
+    # ========================================
+
+    def save_appointment(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        now = datetime.now()
+        appointment = {'id': self.appointments.next_id()}
+        appointment.update(new_appointment(data))
+        appointment['created_at'] = now
+        appointment['updated_at'] = now
+        return self._commit('appointment+', appointment)
+
+    def get_appointments(self, phone_number: Optional[str] = None) -> List[Dict[str, Any]]:
+        if phone_number:
+            return self.appointments.by_phone(phone_number)
+        return self.appointments.all()
+
+    def get_appointment(self, appointment_id: int) -> Optional[Dict[str, Any]]:
+        return self.appointments.get(appointment_id)
+
+    def update_appointment(self, appointment_id: int, changes: Dict[str, Any], expected_version=None) -> bool:
+        # La versión la incrementa el store; el chequeo ocurre antes de escribir en el journal
+        changes = {key: plain(value) for key, value in changes.items() if key != 'version'}
+        changes['updated_at'] = datetime.now()
+        return self._commit('appointment~', appointment_id, changes, expected_version) is not None
+
+    def delete_appointment(self, appointment_id: int) -> bool:
+        return self._commit('appointment-', appointment_id)
+
+    def get_appointments_page(self, after, limit, start_date=None, end_date=None,
+                              phone_number=None, status=None) -> List[Dict[str, Any]]:
+        if not phone_number:
+            return self.appointments.page(after, limit, start_date, end_date, status)
+        # El historial de un teléfono es chico: se ordena completo
+        start_key, end_key = date_key(start_date), date_key(end_date)
+        result = []
+        for apt in sorted(self.appointments.by_phone(phone_number), key=order_key):
+            key = order_key(apt)
+            if (after is not None and key <= after) or (status and apt.get('status') != status):
+                continue
+            if (start_key and key[0] < start_key) or (end_key and key[0] > end_key):
+                continue
+            result.append(apt)
+            if len(result) >= limit:
+                break
+        return result
+
+    def get_appointments_by_date(self, target_date) -> List[Dict[str, Any]]:
+        return self.appointments.by_date(target_date)
+
+    def get_appointments_by_date_range(self, start_date, end_date) -> List[Dict[str, Any]]:
+        return self.appointments.by_date_range(start_date, end_date)
+
+    def get_upcoming_appointments(self, today) -> List[Dict[str, Any]]:
+        return self.appointments.by_date_range(start=today)
+
+    def get_past_unattended_appointments(self, today) -> List[Dict[str, Any]]:
+        return self.appointments.by_status('pendiente', before=today)
+
+    def get_last_appointment(self, phone_number: str) -> Optional[Dict[str, Any]]:
+        return self.appointments.last_for_phone(phone_number)
+
+    def is_slot_available(self, appointment_date, appointment_time, professional=None, exclude_id=None,
+                          duration=None) -> bool:
+        return self.appointments.overlapping({
+            'appointment_date': appointment_date,
+            'appointment_time': appointment_time,
+            'professional': professional,
+            'duration_minutes': duration
+        }, exclude_id) is None
+
+    def get_followup_candidates(self, before) -> List[Dict[str, Any]]:
+        return self.appointments.followup_pending(before)
+
+    def get_absence_candidates(self, before) -> List[Dict[str, Any]]:
+        return [apt for apt in self.get_followup_candidates(before) if not apt.get('attended')]
+
+    def get_absent_appointments(self, before) -> List[Dict[str, Any]]:
+        return [apt for apt in self.appointments.by_status('confirmado', before=before) if not apt.get('attended')]
+
+    def get_recent_followups(self, since, before) -> List[Dict[str, Any]]:
+        return [
+            apt for apt in self.appointments.by_date_range(start=since, before=before)
+            if apt.get('followup_sent')
+        ]
+
+    def get_last_followed_up_appointment(self, phone_number: str, before) -> Optional[Dict[str, Any]]:
+        followed_up = [
+            apt for apt in self._before(self.appointments.by_phone(phone_number), before)
+            if apt.get('followup_sent')
+        ]
+        if not followed_up:
+            return None
+        return max(followed_up, key=lambda apt: date_key(apt.get('appointment_date')))
+
+    @staticmethod
+    def _before(appointments, limit) -> List[Dict[str, Any]]:
+        limit_key = date_key(limit)
+        return [
+            apt for apt in appointments
+            if apt.get('appointment_date') and date_key(apt['appointment_date']) < limit_key
+        ]
+
+    # ========================================
+    # NOTIFICACIONES
+    # ========================================
+
+    def save_notification(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        notification = {'id': self._ids['notification'].next()}
+        notification.update(new_notification(data))
+        notification['created_at'] = datetime.now().isoformat()
+        return self._commit('notification+', notification)
+
+    def get_notifications(self, phone_number: Optional[str] = None) -> List[Dict[str, Any]]:
+        if phone_number:
+            return [notif for notif in self.notifications if notif.get('phone_number') == phone_number]
+        return self.notifications
+
+    def get_notification(self, notification_id: int) -> Optional[Dict[str, Any]]:
+        notification = self._notifications_by_id.get(notification_id)
+        return dict(notification) if notification is not None else None
+
+    def update_notification(self, notification_id: int, changes: Dict[str, Any]) -> bool:
+        return self._commit('notification~', notification_id, changes)
+
+    def notification_counts(self) -> List[Tuple[str, str, int]]:
+        counts = Counter(
+            (plain(notification.get('status')), date_key(notification.get('created_at')))
+            for notification in self.notifications
+        )
+        return [(status, day, count) for (status, day), count in counts.items()]
+
+    # ========================================
+    # ESTADO DE CONVERSACIÓN
+    # ========================================
+
+    def get_conversation_state(self, phone_number: str) -> Dict[str, Any]:
+        return dict(self.conversation_states.get(phone_number) or {})
+
+    def get_conversation_state_entry(self, phone_number: str):
+        entry = self.conversation_states.get_entry(phone_number)
+        if not entry:
+            return None
+        state, remaining = entry
+        # Cada escritura renueva el vencimiento completo: la última fue hace (ttl - restante)
+        updated_at = datetime.now() - timedelta(seconds=self.conversation_states.ttl - remaining)
+        return dict(state), updated_at
+
+    def save_conversation_state(self, phone_number: str, state: Dict[str, Any]):
+        self._commit('state=', phone_number, dict(state), time.time() + self.conversation_states.ttl)
+
+    def update_conversation_state(self, phone_number: str, state: Dict[str, Any]):
+        # Lectura y escritura con la franja del teléfono: dos cambios del mismo paciente no se pisan
+        with self._stripes.holding(phone_stripe(phone_number)):
+            merged = dict(self.conversation_states.get(phone_number) or {})
+            merged.update(state)
+            _, compact = self._apply_and_log('state=', phone_number, merged, time.time() + self.conversation_states.ttl)
+        if compact:
+            self.snapshot()
+
+    def clear_conversation_state(self, phone_number: str) -> bool:
+        return self._commit('state-', phone_number)
+
+    def purge_expired_conversation_states(self) -> int:
+        return self.conversation_states.sweep()
+
+    def conversation_state_stats(self) -> Dict[str, int]:
+        return self.conversation_states.stats()
+
+    # ========================================
+    # FEEDBACK Y ADJUNTOS
+    # ========================================
+
+    def insert_feedback(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        feedback = {'id': self._ids['feedback'].next()}
+        feedback.update(new_feedback(data))
+        feedback['created_at'] = datetime.now().isoformat()
+        return self._commit('feedback+', feedback)
+
+    def get_all_feedback(self) -> List[Dict[str, Any]]:
+        return self.feedback
+
+    def insert_attachment(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        attachment = {'id': self._ids['attachment'].next()}
+        attachment.update(new_attachment(data))
+        attachment['created_at'] = datetime.now().isoformat()
+        return self._commit('attachment+', attachment)
+
+    # ========================================
+    # ARCHIVO DE TURNOS
+    # ========================================
+
+    def archive_appointments(self, before, statuses) -> int:
+        return self._commit('archive', before, list(statuses)) or 0
+
+    def archived_until(self):
+        return self.archive.until
+
+    def get_archived_appointment(self, appointment_id: int) -> Optional[Dict[str, Any]]:
+        return self.archive.get(appointment_id)
+
+    def iter_archived_appointments(self, start_date=None, end_date=None, phone_number=None,
+                                   status=None, after=None) -> Iterator[Dict[str, Any]]:
+        if after is not None and (start_date is None or date_key(start_date) < after[0]):
+            start_date = after[0]
+        for apt in self.archive.scan(start_date, end_date):
+            if after is not None and order_key(apt) <= after:
+                continue
+            if (phone_number and apt.get('phone_number') != phone_number) or (status and apt.get('status') != status):
+                continue
+            # Un corte entre la escritura del archivo y el journal puede dejar el turno en ambos lados
+            if self.appointments.get(apt['id']) is not None:
+                continue
+            yield apt
+
+    # ========================================
+    # LÍNEA DE TIEMPO DEL PACIENTE
+    # ========================================
+
+    def get_patient_events(self, phone_number: str, after=None, limit: int = 50) -> List[Iterator[Dict[str, Any]]]:
+        # Cada índice arranca en el cursor con bisect y se consume sólo lo que toma la mezcla
+        sources = [events('appointment', self.appointments.timeline(phone_number, bound('appointment', after)))]
+        for kind, index in self._timeline.items():
+            sources.append(events(kind, index.newest(phone_number, bound(kind, after))))
+        return sources
+
+    # ========================================
+    # EXPORTACIÓN
+    # ========================================
+
+    def iter_appointments(self, start_date=None, end_date=None, status=None) -> Iterator[Dict[str, Any]]:
+        return self.appointments.scan(start=start_date, end=end_date, status=status)
+
+    def iter_notifications(self, start_date=None, end_date=None, status=None) -> Iterator[Dict[str, Any]]:
+        for notification in self._created_between(self.notifications, start_date, end_date):
+            if not status or notification.get('status') == status:
+                yield notification
+
+    def iter_feedback(self, start_date=None, end_date=None) -> Iterator[Dict[str, Any]]:
+        return self._created_between(self.feedback, start_date, end_date)
+
+    @staticmethod
+    def _created_between(records, start, end) -> Iterator[Dict[str, Any]]:
+        start_key, end_key = date_key(start), date_key(end)
+        for record in records:
+            day = date_key(record.get('created_at'))
+            if (start_key and day < start_key) or (end_key and day > end_key):
+                continue
+            yield record
+
+    def close(self):
+        self.conversation_states.stop_sweeper()
+        if self.journal is not None:
+            # Un snapshot al cerrar deja el próximo arranque sin journal que reaplicar
+            self.snapshot()
+            self.journal.close()
@@ -0,0 +1,88 @@
+"""
+Backend PostgreSQL
+Usa el pool de app/db/postgres.py y el esquema de app/db/migrations/postgres
+"""
+
+from contextlib import contextmanager
+from uuid import uuid4
+
+from app.config import EXPORT_FETCH_SIZE
+from app.db import postgres
+from app.db.backends.sql import APPOINTMENT_COLUMNS, SQLBackend
+
+# Clave arbitraria para pg_advisory_xact_lock durante las migraciones
+MIGRATION_LOCK_KEY = 7_400_391
+# Primera mitad de la clave de los locks por (día, profesional); la segunda es hashtext('día|profesional')
+INTERVAL_LOCK_KEY = 7_400_392
+# Primera mitad de la clave del lock de cada día; la segunda es hashtext('día')
+DAY_LOCK_KEY = 7_400_393
+
+
+class PostgresBackend(SQLBackend):
+    """Backend sobre PostgreSQL con conexiones del pool"""
+
+    name = 'postgres'
+    dialect = 'postgres'
+
+    def __init__(self, auto_migrate: bool = True):
+        if auto_migrate:
+            self.migrate()
+
+    @contextmanager
+    def _connection(self):
+        with postgres.connection() as conn:
+            yield conn
+
+    def _stream_cursor(self, conn):
+        # Cursor con nombre (DECLARE ... CURSOR): el servidor entrega las filas de a
+        # EXPORT_FETCH_SIZE en lugar de enviar el resultado completo al cliente
+        cursor = conn.cursor(name=f'export_{uuid4().hex}')
+        cursor.itersize = EXPORT_FETCH_SIZE
+        return cursor
+
+    def _integrity_errors(self):
+        import psycopg2
+        return psycopg2.IntegrityError
+
+    def _lock_migrations(self, cursor):
+        cursor.execute('SELECT pg_advisory_xact_lock(%s)', (MIGRATION_LOCK_KEY,))
+
+    def _lock_interval(self, cursor, key):
+        # Con READ COMMITTED dos transacciones no ven sus INSERT entre sí: el lock
+        # hace que la segunda verifique solapes recién cuando la primera confirmó.
+        # Un turno sin profesional choca con todo el día: toma el lock del día en
+        # exclusiva; uno con profesional lo comparte y toma además el suyo
+        day, professional = key
+        if not professional:
+            cursor.execute('SELECT pg_advisory_xact_lock(%s, hashtext(%s))', (DAY_LOCK_KEY, day))
+            return
+        cursor.execute('SELECT pg_advisory_xact_lock_shared(%s, hashtext(%s))', (DAY_LOCK_KEY, day))
+        cursor.execute('SELECT pg_advisory_xact_lock(%s, hashtext(%s))', (INTERVAL_LOCK_KEY, '|'.join(key)))
+
+    def archive_appointments(self, before, statuses) -> int:
+        # DELETE ... RETURNING en un CTE: se archiva exactamente lo que se borró, aunque
+        # otra transacción modifique un turno entre la lectura y el borrado
+        condition, params = self._archivable(before, statuses)
+        columns = ', '.join(APPOINTMENT_COLUMNS)
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                f'WITH moved AS (DELETE FROM appointments WHERE {condition} RETURNING {columns}) '
+                f'INSERT INTO appointments_archive ({columns}) SELECT {columns} FROM moved',
+                params
+            )
+            return cursor.rowcount
+
+    def _merge_state_sql(self) -> str:
+        return (
+            'INSERT INTO conversation_states (phone_number, state, updated_at, expires_at) '
+            'VALUES (%s, %s::jsonb, %s, %s) '
+            'ON CONFLICT (phone_number) DO UPDATE '
+            'SET state = CASE WHEN conversation_states.expires_at IS NULL '
+            'OR conversation_states.expires_at > excluded.updated_at '
+            'THEN conversation_states.state || excluded.state ELSE excluded.state END, '
+            'updated_at = excluded.updated_at, expires_at = excluded.expires_at'
+        )
+
+    def close(self):
+        postgres.close_pool()
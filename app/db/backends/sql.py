@@ -0,0 +1,683 @@
+"""
+Backend SQL genérico
+Consultas compartidas por los backends de PostgreSQL y SQLite
+"""
+
+import logging
+from contextlib import contextmanager
+from datetime import date, datetime, time, timedelta
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from app.config import CONVERSATION_STATE_TTL, EXPORT_FETCH_SIZE, MAX_APPOINTMENT_MINUTES
+from app.db.backends.base import (
+    StorageBackend, plain, new_appointment, new_notification,
+    new_feedback, new_attachment
+)
+from app.db.errors import SlotUnavailableError, VersionConflictError
+from app.db.intervals import MINUTES_PER_DAY, appointment_interval, clock, minutes
+from app.db.migrations import load_migration, migration_files
+from app.db.records import APPOINTMENT_FIELDS
+from app.db.state.base import encode_state, decode_state
+from app.db.store import date_key
+from app.db.timeline import appointment_moment, bound, created_moment, event
+
+logger = logging.getLogger('asistente_salud')
+
+APPOINTMENT_COLUMNS = APPOINTMENT_FIELDS
+NOTIFICATION_COLUMNS = (
+    'id', 'phone_number', 'message', 'notification_type', 'status',
+    'created_at', 'sent_at', 'error_message', 'retry_count'
+)
+FEEDBACK_COLUMNS = ('id', 'phone_number', 'patient_name', 'rating', 'comment', 'created_at')
+ATTACHMENT_COLUMNS = (
+    'id', 'appointment_id', 'phone_number', 'filename', 'file_type', 'file_size', 'created_at'
+)
+
+# Columnas que se pueden modificar con update_*; el resto se ignora
+UPDATABLE_APPOINTMENT_COLUMNS = frozenset(APPOINTMENT_COLUMNS) - {'id', 'created_at', 'updated_at', 'version'}
+UPDATABLE_NOTIFICATION_COLUMNS = frozenset(NOTIFICATION_COLUMNS) - {'id', 'created_at'}
+
+APPOINTMENT_ORDER = 'appointment_date, appointment_time, id'
+
+# Índice único parcial que reserva (fecha, hora, profesional) para turnos activos
+SLOT_INDEX = 'uq_appointments_active_slot'
+
+# Columnas que cambian el intervalo que ocupa un turno: al modificarlas se buscan solapes
+INTERVAL_COLUMNS = frozenset({'appointment_date', 'appointment_time', 'professional', 'duration_minutes', 'status'})
+
+
+def _select(table: str, columns) -> str:
+    return f"SELECT {', '.join(columns)} FROM {table}"
+
+
+def _where(conditions) -> str:
+    return f" WHERE {' AND '.join(conditions)}" if conditions else ''
+
+
+class SQLBackend(StorageBackend):
+    """Implementación de las queries sobre una base SQL
+
+    Las consultas usan el estilo de parámetros '%s' de psycopg2; cada dialecto
+    implementa _connection() y puede adaptar el SQL en _sql().
+    """
+
+    dialect = None
+    # Segundos de vigencia de un estado de conversación (expires_at)
+    state_ttl = CONVERSATION_STATE_TTL
+
+    @contextmanager
+    def _connection(self):
+        raise NotImplementedError
+        yield
+
+    def _sql(self, sql: str) -> str:
+        """Adapta una sentencia al dialecto"""
+        return sql
+
+    def _insert_returning_id(self, cursor, sql: str, params) -> int:
+        cursor.execute(self._sql(sql + ' RETURNING id'), params)
+        return cursor.fetchone()[0]
+
+    def _run_script(self, cursor, script: str):
+        cursor.execute(script)
+
+    def _lock_migrations(self, cursor):
+        """Serializa migraciones concurrentes (varios workers arrancando a la vez)"""
+
+    def _integrity_errors(self):
+        """Excepciones del driver para violaciones de restricciones"""
+        raise NotImplementedError
+
+    def _lock_interval(self, cursor, key):
+        """Serializa hasta el commit las escrituras que pueden chocar con las de un (día, profesional)
+
+        SQLite no lo necesita: la propia escritura toma el único lock de escritura de la base.
+        """
+
+    @contextmanager
+    def _slot_guard(self):
+        """Traduce la violación del índice de horarios a SlotUnavailableError"""
+        try:
+            yield
+        except self._integrity_errors() as e:
+            if SLOT_INDEX in str(e):
+                raise SlotUnavailableError('Horario ocupado por otro turno activo') from e
+            raise
+
+    def _claim_interval(self, cursor, appointment: Dict[str, Any]):
+        """Rechaza un turno recién escrito que se solapa con otro activo
+
+        Corre en la transacción de la escritura y después de ella: con el lock
+        del día tomado, el último en llegar ve el turno del otro ya confirmado.
+        """
+        interval = appointment_interval(appointment)
+        if interval is None:
+            return
+        self._lock_interval(cursor, interval[0])
+        owner = self._overlapping(cursor, *interval, exclude_id=appointment['id'])
+        if owner is not None:
+            raise SlotUnavailableError(f"Horario ocupado por el turno {owner}")
+
+    def _overlapping(self, cursor, key, start: int, end: int, exclude_id: Optional[int] = None) -> Optional[int]:
+        """ID de un turno activo que se solapa con [start, end) minutos del día, o None"""
+        # uq_appointments_active_slot: sólo se leen los turnos del día que empiezan
+        # antes de `end` y a menos de MAX_APPOINTMENT_MINUTES de `start`
+        # Como en IntervalIndex: un turno sin profesional choca con todos los del día
+        day, professional = key
+        sql = (
+            "SELECT id, appointment_time, duration_minutes FROM appointments"
+            " WHERE appointment_date = %s AND status <> 'cancelado'"
+            " AND appointment_time >= %s AND id <> %s"
+        )
+        params = [date.fromisoformat(day), clock(start - MAX_APPOINTMENT_MINUTES), exclude_id or 0]
+        if professional:
+            sql += " AND COALESCE(professional, '') IN ('', %s)"
+            params.append(professional)
+        if end < MINUTES_PER_DAY:
+            sql += ' AND appointment_time < %s'
+            params.append(clock(end))
+        cursor.execute(self._sql(sql), params)
+        for other_id, other_time, duration in cursor.fetchall():
+            if minutes(other_time) + duration > start:
+                return other_id
+        return None
+
+    # ========================================
+    # HELPERS
+    # ========================================
+
+    def _fetchall(self, sql: str, params=(), columns=None) -> List[Dict[str, Any]]:
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(self._sql(sql), params)
+            names = columns or [col[0] for col in cursor.description]
+            return [dict(zip(names, row)) for row in cursor.fetchall()]
+
+    def _fetchone(self, sql: str, params=(), columns=None) -> Optional[Dict[str, Any]]:
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(self._sql(sql), params)
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            names = columns or [col[0] for col in cursor.description]
+            return dict(zip(names, row))
+
+    def _stream_cursor(self, conn):
+        """Cursor para recorrer resultados grandes; PostgreSQL usa uno del lado del servidor"""
+        return conn.cursor()
+
+    def _stream(self, sql: str, params=(), columns=None) -> Iterator[Dict[str, Any]]:
+        """Itera las filas de a EXPORT_FETCH_SIZE sin traer el resultado completo
+
+        La conexión queda tomada mientras dure el recorrido y se libera al
+        agotarlo o al cerrar el generador (p. ej. si el cliente corta la descarga).
+        """
+        with self._connection() as conn:
+            cursor = self._stream_cursor(conn)
+            try:
+                cursor.execute(self._sql(sql), params)
+                while True:
+                    rows = cursor.fetchmany(EXPORT_FETCH_SIZE)
+                    if not rows:
+                        break
+                    names = columns or [col[0] for col in cursor.description]
+                    for row in rows:
+                        yield dict(zip(names, row))
+            finally:
+                cursor.close()
+
+    def _execute(self, sql: str, params=()) -> int:
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(self._sql(sql), params)
+            return cursor.rowcount
+
+    def _insert(self, table: str, values: Dict[str, Any], columns) -> Dict[str, Any]:
+        with self._connection() as conn:
+            return self._insert_row(conn.cursor(), table, values, columns)
+
+    def _insert_row(self, cursor, table: str, values: Dict[str, Any], columns) -> Dict[str, Any]:
+        names = list(values)
+        sql = (
+            f"INSERT INTO {table} ({', '.join(names)}) "
+            f"VALUES ({', '.join(['%s'] * len(names))})"
+        )
+        new_id = self._insert_returning_id(cursor, sql, [plain(values[name]) for name in names])
+        cursor.execute(self._sql(_select(table, columns) + ' WHERE id = %s'), (new_id,))
+        return dict(zip(columns, cursor.fetchone()))
+
+    def _update(self, table: str, row_id: int, changes: Dict[str, Any], allowed, touch: bool) -> bool:
+        changes = {key: plain(value) for key, value in changes.items() if key in allowed}
+        assignments = [f"{key} = %s" for key in changes]
+        if touch:
+            assignments.append('updated_at = CURRENT_TIMESTAMP')
+        if not assignments:
+            return self._fetchone(f"SELECT id FROM {table} WHERE id = %s", (row_id,)) is not None
+        sql = f"UPDATE {table} SET {', '.join(assignments)} WHERE id = %s"
+        return self._execute(sql, list(changes.values()) + [row_id]) > 0
+
+    # ========================================
+    # MIGRACIONES
+    # ========================================
+
+    def migrate(self) -> List[str]:
+        """Aplica las migraciones pendientes del dialecto, en orden de versión"""
+        applied = []
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            self._lock_migrations(cursor)
+            cursor.execute(
+                "CREATE TABLE IF NOT EXISTS schema_migrations ("
+                "version VARCHAR(64) PRIMARY KEY, "
+                "applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP)"
+            )
+            cursor.execute('SELECT version FROM schema_migrations')
+            done = {row[0] for row in cursor.fetchall()}
+            for version, path in migration_files(self.dialect):
+                if version in done:
+                    continue
+                if path.endswith('.py'):
+                    load_migration(version, path).upgrade(cursor, self._sql)
+                else:
+                    with open(path, encoding='utf-8') as script:
+                        self._run_script(cursor, script.read())
+                cursor.execute(self._sql('INSERT INTO schema_migrations (version) VALUES (%s)'), (version,))
+                applied.append(version)
+                logger.info(f"Migración aplicada: {version}")
+        return applied
+
+    # ========================================
+    # TURNOS
+    # ========================================
+
+    def save_appointment(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        # La reserva del horario es el propio INSERT, verificado en su transacción:
+        # no hay chequeo previo que pueda quedar viejo
+        with self._slot_guard(), self._connection() as conn:
+            cursor = conn.cursor()
+            appointment = self._insert_row(cursor, 'appointments', new_appointment(data), APPOINTMENT_COLUMNS)
+            self._claim_interval(cursor, appointment)
+            return appointment
+
+    def get_appointments(self, phone_number: Optional[str] = None) -> List[Dict[str, Any]]:
+        if phone_number:
+            return self._fetchall(
+                _select('appointments', APPOINTMENT_COLUMNS)
+                + f' WHERE phone_number = %s ORDER BY {APPOINTMENT_ORDER}',
+                (phone_number,), APPOINTMENT_COLUMNS
+            )
+        return self._fetchall(
+            _select('appointments', APPOINTMENT_COLUMNS) + ' ORDER BY id', (), APPOINTMENT_COLUMNS
+        )
+
+    def get_appointment(self, appointment_id: int) -> Optional[Dict[str, Any]]:
+        return self._fetchone(
+            _select('appointments', APPOINTMENT_COLUMNS) + ' WHERE id = %s',
+            (appointment_id,), APPOINTMENT_COLUMNS
+        )
+
+    def update_appointment(self, appointment_id: int, changes: Dict[str, Any], expected_version=None) -> bool:
+        # Compare-and-set: la versión se compara e incrementa en el mismo UPDATE
+        changes = {key: plain(value) for key, value in changes.items() if key in UPDATABLE_APPOINTMENT_COLUMNS}
+        assignments = [f"{key} = %s" for key in changes] + ['updated_at = CURRENT_TIMESTAMP', 'version = version + 1']
+        sql = f"UPDATE appointments SET {', '.join(assignments)} WHERE id = %s"
+        params = list(changes.values()) + [appointment_id]
+        if expected_version is not None:
+            sql += ' AND version = %s'
+            params.append(expected_version)
+        with self._slot_guard(), self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(self._sql(sql), params)
+            if cursor.rowcount > 0:
+                if INTERVAL_COLUMNS & changes.keys():
+                    cursor.execute(
+                        self._sql(_select('appointments', APPOINTMENT_COLUMNS) + ' WHERE id = %s'), (appointment_id,)
+                    )
+                    self._claim_interval(cursor, dict(zip(APPOINTMENT_COLUMNS, cursor.fetchone())))
+                return True
+        if expected_version is None:
+            return False
+        current = self._fetchone('SELECT version FROM appointments WHERE id = %s', (appointment_id,))
+        if current is None:
+            return False
+        raise VersionConflictError(
+            f"Turno {appointment_id} en versión {current['version']}, se esperaba {expected_version}"
+        )
+
+    def delete_appointment(self, appointment_id: int) -> bool:
+        return self._execute('DELETE FROM appointments WHERE id = %s', (appointment_id,)) > 0
+
+    def get_appointments_by_date(self, target_date) -> List[Dict[str, Any]]:
+        # idx_appointments_keyset
+        return self._fetchall(
+            _select('appointments', APPOINTMENT_COLUMNS)
+            + ' WHERE appointment_date = %s ORDER BY appointment_time, id',
+            (target_date,), APPOINTMENT_COLUMNS
+        )
+
+    def get_appointments_page(self, after, limit, start_date=None, end_date=None,
+                              phone_number=None, status=None) -> List[Dict[str, Any]]:
+        # idx_appointments_keyset; con teléfono, idx_appointments_phone_timeline
+        conditions, params = [], []
+        if after is not None:
+            conditions.append('(appointment_date, appointment_time, id) > (%s, %s, %s)')
+            params += [date.fromisoformat(after[0]), time.fromisoformat(after[1]), after[2]]
+        if start_date is not None:
+            conditions.append('appointment_date >= %s')
+            params.append(start_date)
+        if end_date is not None:
+            conditions.append('appointment_date <= %s')
+            params.append(end_date)
+        if phone_number:
+            conditions.append('phone_number = %s')
+            params.append(phone_number)
+        if status:
+            conditions.append('status = %s')
+            params.append(status)
+        where = f" WHERE {' AND '.join(conditions)}" if conditions else ''
+        return self._fetchall(
+            _select('appointments', APPOINTMENT_COLUMNS) + where + f' ORDER BY {APPOINTMENT_ORDER} LIMIT %s',
+            params + [limit], APPOINTMENT_COLUMNS
+        )
+
+    def get_appointments_by_date_range(self, start_date, end_date) -> List[Dict[str, Any]]:
+        return self._fetchall(
+            _select('appointments', APPOINTMENT_COLUMNS)
+            + f' WHERE appointment_date BETWEEN %s AND %s ORDER BY {APPOINTMENT_ORDER}',
+            (start_date, end_date), APPOINTMENT_COLUMNS
+        )
+
+    def get_upcoming_appointments(self, today) -> List[Dict[str, Any]]:
+        return self._fetchall(
+            _select('appointments', APPOINTMENT_COLUMNS)
+            + f' WHERE appointment_date >= %s ORDER BY {APPOINTMENT_ORDER}',
+            (today,), APPOINTMENT_COLUMNS
+        )
+
+    def get_past_unattended_appointments(self, today) -> List[Dict[str, Any]]:
+        # idx_appointments_pending_date (parcial)
+        return self._fetchall(
+            _select('appointments', APPOINTMENT_COLUMNS)
+            + f" WHERE status = 'pendiente' AND appointment_date < %s ORDER BY {APPOINTMENT_ORDER}",
+            (today,), APPOINTMENT_COLUMNS
+        )
+
+    def get_last_appointment(self, phone_number: str) -> Optional[Dict[str, Any]]:
+        # idx_appointments_phone_created
+        return self._fetchone(
+            _select('appointments', APPOINTMENT_COLUMNS)
+            + ' WHERE phone_number = %s ORDER BY created_at DESC, id DESC LIMIT 1',
+            (phone_number,), APPOINTMENT_COLUMNS
+        )
+
+    def is_slot_available(self, appointment_date, appointment_time, professional=None, exclude_id=None,
+                          duration=None) -> bool:
+        interval = appointment_interval({
+            'appointment_date': appointment_date,
+            'appointment_time': appointment_time,
+            'professional': professional,
+            'duration_minutes': duration
+        })
+        with self._connection() as conn:
+            return self._overlapping(conn.cursor(), *interval, exclude_id=exclude_id) is None
+
+    def get_followup_candidates(self, before) -> List[Dict[str, Any]]:
+        # idx_appointments_followup_pending (parcial)
+        return self._fetchall(
+            _select('appointments', APPOINTMENT_COLUMNS)
+            + " WHERE status = 'confirmado' AND followup_sent = FALSE AND appointment_date < %s"
+            + f' ORDER BY {APPOINTMENT_ORDER}',
+            (before,), APPOINTMENT_COLUMNS
+        )
+
+    def get_absence_candidates(self, before) -> List[Dict[str, Any]]:
+        # idx_appointments_followup_pending (parcial)
+        return self._fetchall(
+            _select('appointments', APPOINTMENT_COLUMNS)
+            + " WHERE status = 'confirmado' AND followup_sent = FALSE AND appointment_date < %s"
+            + ' AND (attended IS NULL OR attended = FALSE)'
+            + f' ORDER BY {APPOINTMENT_ORDER}',
+            (before,), APPOINTMENT_COLUMNS
+        )
+
+    def get_absent_appointments(self, before) -> List[Dict[str, Any]]:
+        return self._fetchall(
+            _select('appointments', APPOINTMENT_COLUMNS)
+            + " WHERE status = 'confirmado' AND appointment_date < %s"
+            + ' AND (attended IS NULL OR attended = FALSE)'
+            + f' ORDER BY {APPOINTMENT_ORDER}',
+            (before,), APPOINTMENT_COLUMNS
+        )
+
+    def get_recent_followups(self, since, before) -> List[Dict[str, Any]]:
+        # idx_appointments_keyset
+        return self._fetchall(
+            _select('appointments', APPOINTMENT_COLUMNS)
+            + ' WHERE appointment_date >= %s AND appointment_date < %s AND followup_sent = TRUE'
+            + f' ORDER BY {APPOINTMENT_ORDER}',
+            (since, before), APPOINTMENT_COLUMNS
+        )
+
+    def get_last_followed_up_appointment(self, phone_number: str, before) -> Optional[Dict[str, Any]]:
+        # idx_appointments_phone_timeline, recorrido hacia atrás
+        return self._fetchone(
+            _select('appointments', APPOINTMENT_COLUMNS)
+            + ' WHERE phone_number = %s AND appointment_date < %s AND followup_sent = TRUE'
+            + ' ORDER BY appointment_date DESC LIMIT 1',
+            (phone_number, before), APPOINTMENT_COLUMNS
+        )
+
+    # ========================================
+    # NOTIFICACIONES
+    # ========================================
+
+    def save_notification(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        return self._insert('notifications', new_notification(data), NOTIFICATION_COLUMNS)
+
+    def get_notifications(self, phone_number: Optional[str] = None) -> List[Dict[str, Any]]:
+        if phone_number:
+            return self._fetchall(
+                _select('notifications', NOTIFICATION_COLUMNS)
+                + ' WHERE phone_number = %s ORDER BY created_at, id',
+                (phone_number,), NOTIFICATION_COLUMNS
+            )
+        return self._fetchall(
+            _select('notifications', NOTIFICATION_COLUMNS) + ' ORDER BY id', (), NOTIFICATION_COLUMNS
+        )
+
+    def get_notification(self, notification_id: int) -> Optional[Dict[str, Any]]:
+        return self._fetchone(
+            _select('notifications', NOTIFICATION_COLUMNS) + ' WHERE id = %s',
+            (notification_id,), NOTIFICATION_COLUMNS
+        )
+
+    def update_notification(self, notification_id: int, changes: Dict[str, Any]) -> bool:
+        return self._update('notifications', notification_id, changes, UPDATABLE_NOTIFICATION_COLUMNS, touch=False)
+
+    def notification_counts(self) -> List[Tuple[str, str, int]]:
+        rows = self._fetchall(
+            'SELECT status, date(created_at), COUNT(*) FROM notifications GROUP BY status, date(created_at)',
+            (), ('status', 'day', 'count')
+        )
+        return [(row['status'], date_key(row['day']), row['count']) for row in rows]
+
+    # ========================================
+    # ESTADO DE CONVERSACIÓN
+    # ========================================
+
+    def _merge_state_sql(self) -> str:
+        """UPSERT que combina el estado nuevo con el guardado si no venció
+
+        Parámetros: (phone_number, state, updated_at, expires_at).
+        """
+        raise NotImplementedError
+
+    def _state_params(self, phone_number: str, state: Dict[str, Any]):
+        # Los vencimientos se calculan en Python para no depender de la zona horaria de la base
+        now = datetime.now()
+        return phone_number, encode_state(state), now, now + timedelta(seconds=self.state_ttl)
+
+    def get_conversation_state(self, phone_number: str) -> Dict[str, Any]:
+        # Las filas sin expires_at son anteriores a la migración 0003 y no vencen
+        row = self._fetchone(
+            'SELECT state FROM conversation_states WHERE phone_number = %s '
+            'AND (expires_at IS NULL OR expires_at > %s)',
+            (phone_number, datetime.now()), ('state',)
+        )
+        return decode_state(row['state']) if row else {}
+
+    def get_conversation_state_entry(self, phone_number: str):
+        row = self._fetchone(
+            'SELECT state, updated_at FROM conversation_states WHERE phone_number = %s '
+            'AND (expires_at IS NULL OR expires_at > %s)',
+            (phone_number, datetime.now()), ('state', 'updated_at')
+        )
+        return (decode_state(row['state']), row['updated_at']) if row else None
+
+    def save_conversation_state(self, phone_number: str, state: Dict[str, Any]):
+        self._execute(
+            'INSERT INTO conversation_states (phone_number, state, updated_at, expires_at) '
+            'VALUES (%s, %s, %s, %s) '
+            'ON CONFLICT (phone_number) DO UPDATE '
+            'SET state = excluded.state, updated_at = excluded.updated_at, expires_at = excluded.expires_at',
+            self._state_params(phone_number, state)
+        )
+
+    def update_conversation_state(self, phone_number: str, state: Dict[str, Any]):
+        self._execute(self._merge_state_sql(), self._state_params(phone_number, state))
+
+    def clear_conversation_state(self, phone_number: str) -> bool:
+        return self._execute('DELETE FROM conversation_states WHERE phone_number = %s', (phone_number,)) > 0
+
+    def conversation_activity(self):
+        rows = self._fetchall(
+            'SELECT phone_number, updated_at FROM conversation_states '
+            'WHERE expires_at IS NULL OR expires_at > %s',
+            (datetime.now(),), ('phone_number', 'updated_at')
+        )
+        return [(row['phone_number'], row['updated_at']) for row in rows]
+
+    def purge_expired_conversation_states(self) -> int:
+        # idx_conversation_states_expires
+        return self._execute('DELETE FROM conversation_states WHERE expires_at <= %s', (datetime.now(),))
+
+    # ========================================
+    # FEEDBACK Y ADJUNTOS
+    # ========================================
+
+    def insert_feedback(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        return self._insert('feedback', new_feedback(data), FEEDBACK_COLUMNS)
+
+    def get_all_feedback(self) -> List[Dict[str, Any]]:
+        return self._fetchall(_select('feedback', FEEDBACK_COLUMNS) + ' ORDER BY id', (), FEEDBACK_COLUMNS)
+
+    def insert_attachment(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        return self._insert('attachments', new_attachment(data), ATTACHMENT_COLUMNS)
+
+    # ========================================
+    # ARCHIVO DE TURNOS
+    # ========================================
+
+    @staticmethod
+    def _archivable(before, statuses):
+        placeholders = ', '.join(['%s'] * len(statuses))
+        condition = (
+            f'appointment_date < %s AND status IN ({placeholders}) AND NOT EXISTS '
+            '(SELECT 1 FROM attachments WHERE attachments.appointment_id = appointments.id)'
+        )
+        return condition, [before] + list(statuses)
+
+    def archive_appointments(self, before, statuses) -> int:
+        # Copia y borrado en la misma transacción; SQLite serializa las escrituras,
+        # así que ninguna fila cambia entre las dos sentencias
+        condition, params = self._archivable(before, statuses)
+        columns = ', '.join(APPOINTMENT_COLUMNS)
+        with self._connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(self._sql(
+                f'INSERT INTO appointments_archive ({columns}) SELECT {columns} FROM appointments WHERE {condition}'
+            ), params)
+            cursor.execute(self._sql(f'DELETE FROM appointments WHERE {condition}'), params)
+            return cursor.rowcount
+
+    def archived_until(self):
+        # idx_appointments_archive_keyset
+        row = self._fetchone('SELECT MAX(appointment_date) AS until FROM appointments_archive', (), ('until',))
+        return row['until'] if row else None
+
+    def get_archived_appointment(self, appointment_id: int) -> Optional[Dict[str, Any]]:
+        return self._fetchone(
+            _select('appointments_archive', APPOINTMENT_COLUMNS) + ' WHERE id = %s',
+            (appointment_id,), APPOINTMENT_COLUMNS
+        )
+
+    def iter_archived_appointments(self, start_date=None, end_date=None, phone_number=None,
+                                   status=None, after=None) -> Iterator[Dict[str, Any]]:
+        # idx_appointments_archive_keyset; con teléfono, idx_appointments_archive_phone
+        conditions, params = self._date_range('appointment_date', start_date, end_date, timestamp=False)
+        if after is not None:
+            conditions.append('(appointment_date, appointment_time, id) > (%s, %s, %s)')
+            params += [date.fromisoformat(after[0]), time.fromisoformat(after[1]), after[2]]
+        if phone_number:
+            conditions.append('phone_number = %s')
+            params.append(phone_number)
+        if status:
+            conditions.append('status = %s')
+            params.append(status)
+        return self._stream(
+            _select('appointments_archive', APPOINTMENT_COLUMNS) + _where(conditions)
+            + f' ORDER BY {APPOINTMENT_ORDER}',
+            params, APPOINTMENT_COLUMNS
+        )
+
+    # ========================================
+    # LÍNEA DE TIEMPO DEL PACIENTE
+    # ========================================
+
+    def get_patient_events(self, phone_number: str, after=None, limit: int = 50) -> List[Iterator[Dict[str, Any]]]:
+        # Una consulta por colección sobre su índice (phone_number, instante, id),
+        # recorrido hacia atrás desde el cursor: a lo sumo `limit` filas de cada una
+        sources = []
+        for kind, table, columns, order in (
+            ('appointment', 'appointments', APPOINTMENT_COLUMNS, ('appointment_date', 'appointment_time')),
+            ('notification', 'notifications', NOTIFICATION_COLUMNS, ('created_at',)),
+            ('feedback', 'feedback', FEEDBACK_COLUMNS, ('created_at',)),
+            ('attachment', 'attachments', ATTACHMENT_COLUMNS, ('created_at',))
+        ):
+            conditions, params = ['phone_number = %s'], [phone_number]
+            below = bound(kind, after)
+            if below is not None:
+                condition, values = self._timeline_bound(order, below)
+                conditions.append(condition)
+                params += values
+            descending = ', '.join(f'{column} DESC' for column in order + ('id',))
+            rows = self._fetchall(
+                _select(table, columns) + _where(conditions) + f' ORDER BY {descending} LIMIT %s',
+                params + [limit], columns
+            )
+            moment = appointment_moment if kind == 'appointment' else created_moment
+            sources.append([event(kind, moment(row), row) for row in rows])
+        return sources
+
+    @staticmethod
+    def _timeline_bound(order, below):
+        """Condición (columnas de orden, id) < cota, con la cota de app.db.timeline.bound()"""
+        at = datetime.fromisoformat(below[0])
+        values = [at.date(), at.time()] if len(order) == 2 else [at]
+        columns = ', '.join(order)
+        placeholders = ', '.join(['%s'] * len(values))
+        if below[1] == float('inf'):
+            return f'({columns}) <= ({placeholders})', values
+        if below[1] == float('-inf'):
+            return f'({columns}) < ({placeholders})', values
+        return f'({columns}, id) < ({placeholders}, %s)', values + [below[1]]
+
+    # ========================================
+    # EXPORTACIÓN
+    # ========================================
+
+    def iter_appointments(self, start_date=None, end_date=None, status=None) -> Iterator[Dict[str, Any]]:
+        # idx_appointments_keyset: el orden sale del índice, sin ordenar en el servidor
+        conditions, params = self._date_range('appointment_date', start_date, end_date, timestamp=False)
+        if status:
+            conditions.append('status = %s')
+            params.append(status)
+        return self._stream(
+            _select('appointments', APPOINTMENT_COLUMNS) + _where(conditions) + f' ORDER BY {APPOINTMENT_ORDER}',
+            params, APPOINTMENT_COLUMNS
+        )
+
+    def iter_notifications(self, start_date=None, end_date=None, status=None) -> Iterator[Dict[str, Any]]:
+        # Orden por clave primaria: el recorrido no necesita ordenar el resultado completo
+        conditions, params = self._date_range('created_at', start_date, end_date)
+        if status:
+            conditions.append('status = %s')
+            params.append(status)
+        return self._stream(
+            _select('notifications', NOTIFICATION_COLUMNS) + _where(conditions) + ' ORDER BY id',
+            params, NOTIFICATION_COLUMNS
+        )
+
+    def iter_feedback(self, start_date=None, end_date=None) -> Iterator[Dict[str, Any]]:
+        conditions, params = self._date_range('created_at', start_date, end_date)
+        return self._stream(
+            _select('feedback', FEEDBACK_COLUMNS) + _where(conditions) + ' ORDER BY id',
+            params, FEEDBACK_COLUMNS
+        )
+
+    @staticmethod
+    def _date_range(column: str, start_date, end_date, timestamp: bool = True):
+        """Condiciones del rango de días [start_date, end_date]; con `timestamp` la columna es TIMESTAMP"""
+        conditions, params = [], []
+        if start_date is not None:
+            conditions.append(f'{column} >= %s')
+            params.append(datetime.combine(start_date, time.min) if timestamp else start_date)
+        if end_date is not None:
+            if timestamp:
+                conditions.append(f'{column} < %s')
+                params.append(datetime.combine(end_date + timedelta(days=1), time.min))
+            else:
+                conditions.append(f'{column} <= %s')
+                params.append(end_date)
+        return conditions, params
@@ -0,0 +1,153 @@
+"""
+Backend SQLite
+Base embebida en modo WAL para instalaciones de una sola clínica
+"""
+
+import logging
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import date, datetime, time
+from functools import lru_cache
+
+from app.config import SQLITE_BUSY_TIMEOUT
+from app.db.backends.sql import SQLBackend
+
+logger = logging.getLogger('asistente_salud')
+
+# Tamaño de la caché de sentencias preparadas de cada conexión
+STATEMENT_CACHE_SIZE = 256
+
+# SQLite guarda fechas y horas como texto ISO; se registran adaptadores y
+# conversores explícitos (los implícitos de sqlite3 están deprecados).
+sqlite3.register_adapter(date, lambda value: value.isoformat())
+sqlite3.register_adapter(time, lambda value: value.isoformat())
+sqlite3.register_adapter(datetime, lambda value: value.isoformat(' '))
+sqlite3.register_converter('DATE', lambda raw: date.fromisoformat(raw.decode()))
+sqlite3.register_converter('TIME', lambda raw: time.fromisoformat(raw.decode()))
+sqlite3.register_converter('TIMESTAMP', lambda raw: datetime.fromisoformat(raw.decode()))
+sqlite3.register_converter('BOOLEAN', lambda raw: bool(int(raw)))
+
+
+def path_from_url(database_url: str) -> str:
+    """Ruta del archivo a partir de sqlite:///relativa.db o sqlite:////absoluta.db"""
+    path = database_url.split(':', 1)[1]
+    if path.startswith('///'):
+        path = path[3:]
+    elif path.startswith('//'):
+        path = path[2:]
+    return path or ':memory:'
+
+
+@lru_cache(maxsize=None)
+def _to_qmark(sql: str) -> str:
+    """Traduce el estilo '%s' de psycopg2 al '?' de sqlite3 (una vez por sentencia)"""
+    return sql.replace('%s', '?').replace('CURRENT_TIMESTAMP', "datetime('now', 'localtime')")
+
+
+def _statements(script: str):
+    """Sentencias de un script SQL, sin las líneas que sólo tienen comentarios"""
+    pending = ''
+    for line in script.splitlines(keepends=True):
+        if not pending and line.lstrip().startswith('--'):
+            continue
+        pending += line
+        if sqlite3.complete_statement(pending):
+            if pending.strip():
+                yield pending.strip()
+            pending = ''
+    if pending.strip():
+        raise ValueError(f"Sentencia incompleta al final del script: {pending.strip()[:60]}")
+
+
+class SQLiteBackend(SQLBackend):
+    """Backend sobre un archivo SQLite con una conexión por hilo"""
+
+    name = 'sqlite'
+    dialect = 'sqlite'
+
+    def __init__(self, path: str, auto_migrate: bool = True):
+        self.path = path
+        self._uri = path == ':memory:'
+        if self._uri:
+            # Base en memoria compartida entre los hilos de este proceso
+            self.path = f'file:asistente_{id(self)}?mode=memory&cache=shared'
+        self._local = threading.local()
+        self._connections = []
+        self._connections_lock = threading.Lock()
+        if auto_migrate:
+            self.migrate()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.path,
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            cached_statements=STATEMENT_CACHE_SIZE,
+            check_same_thread=False,
+            uri=self._uri
+        )
+        conn.execute(f'PRAGMA busy_timeout = {int(SQLITE_BUSY_TIMEOUT * 1000)}')
+        conn.execute('PRAGMA foreign_keys = ON')
+        if not self._uri:
+            mode = conn.execute('PRAGMA journal_mode = WAL').fetchone()[0]
+            if mode.lower() != 'wal':
+                logger.warning(f"SQLite no pudo activar WAL (modo actual: {mode})")
+            conn.execute('PRAGMA synchronous = NORMAL')
+        with self._connections_lock:
+            self._connections.append(conn)
+        return conn
+
+    @contextmanager
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+
+    def _sql(self, sql: str) -> str:
+        return _to_qmark(sql)
+
+    def _insert_returning_id(self, cursor, sql: str, params) -> int:
+        # RETURNING requiere SQLite 3.35; lastrowid funciona en todas las versiones
+        cursor.execute(self._sql(sql), params)
+        return cursor.lastrowid
+
+    def _integrity_errors(self):
+        return sqlite3.IntegrityError
+
+    def _lock_migrations(self, cursor):
+        # BEGIN IMMEDIATE toma el lock de escritura de la base hasta el commit: otro
+        # proceso que migra a la vez espera (busy_timeout) y después ve las versiones
+        # ya registradas. Cada script y su fila en schema_migrations van en esta transacción
+        if cursor.connection.in_transaction:
+            cursor.connection.commit()
+        cursor.execute('BEGIN IMMEDIATE')
+
+    def _run_script(self, cursor, script: str):
+        # executescript() confirma la transacción abierta y corre en autocommit:
+        # las sentencias se ejecutan de a una para que la migración sea atómica
+        for statement in _statements(script):
+            cursor.execute(statement)
+
+    def _merge_state_sql(self) -> str:
+        return (
+            'INSERT INTO conversation_states (phone_number, state, updated_at, expires_at) '
+            'VALUES (%s, %s, %s, %s) '
+            'ON CONFLICT (phone_number) DO UPDATE '
+            'SET state = CASE WHEN conversation_states.expires_at IS NULL '
+            'OR conversation_states.expires_at > excluded.updated_at '
+            'THEN json_patch(conversation_states.state, excluded.state) ELSE excluded.state END, '
+            'updated_at = excluded.updated_at, expires_at = excluded.expires_at'
+        )
+
+    def close(self):
+        with self._connections_lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = []
+        self._local = threading.local()
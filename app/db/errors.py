@@ -0,0 +1,12 @@
+"""
+Errores de la capa de datos que los servicios deben distinguir
+El resto de los errores se registran y se traducen a valores vacíos en queries.py
+"""
+
+
+class SlotUnavailableError(Exception):
+    """El horario (fecha, hora, profesional) ya está reservado por otro turno activo"""
+
+
+class VersionConflictError(Exception):
+    """El turno cambió desde que se leyó: su versión ya no es la esperada"""
@@ -0,0 +1,120 @@
+"""
+Intervalos ocupados por los turnos activos de cada día y profesional
+Listas ordenadas por hora de inicio: un solape se detecta con bisect en O(log n)
+"""
+
+from bisect import bisect_left, insort
+from datetime import datetime, time
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config import DEFAULT_APPOINTMENT_MINUTES
+
+# Estados que liberan el horario para otro turno
+RELEASED_STATUSES = frozenset({'cancelado'})
+
+MINUTES_PER_DAY = 24 * 60
+
+# (fecha 'YYYY-MM-DD', profesional o '')
+IntervalKey = Tuple[str, str]
+
+
+def minutes(value: Any) -> int:
+    """Minutos desde las 00:00 de un time, datetime o 'HH:MM[:SS]'"""
+    if isinstance(value, datetime):
+        value = value.time()
+    if not isinstance(value, time):
+        value = time.fromisoformat(str(value))
+    return value.hour * 60 + value.minute
+
+
+def clock(value: int) -> time:
+    """Hora de un minuto del día, acotada a [00:00, 23:59]"""
+    value = min(max(value, 0), MINUTES_PER_DAY - 1)
+    return time(value // 60, value % 60)
+
+
+def appointment_interval(appointment: Dict[str, Any]) -> Optional[Tuple[IntervalKey, int, int]]:
+    """(clave, inicio, fin) en minutos del intervalo que ocupa un turno activo, o None si no ocupa"""
+    if appointment.get('status') in RELEASED_STATUSES:
+        return None
+    day, hour = appointment.get('appointment_date'), appointment.get('appointment_time')
+    if day is None or hour is None:
+        return None
+    if isinstance(day, datetime):
+        day = day.date()
+    start = minutes(hour)
+    duration = appointment.get('duration_minutes') or DEFAULT_APPOINTMENT_MINUTES
+    return (day.isoformat() if hasattr(day, 'isoformat') else str(day)[:10],
+            appointment.get('professional') or ''), start, start + duration
+
+
+class IntervalIndex:
+    """Intervalos [inicio, fin) de los turnos activos por (día, profesional)
+
+    Cada lista está ordenada por inicio. Un turno nuevo [start, end) choca
+    con los que empiezan antes de `end` y terminan después de `start`:
+    bisect ubica el último que empieza antes de `end` y se retrocede sólo
+    mientras el inicio esté a menos de la duración más larga vista, así
+    que el chequeo es O(log n) aunque los intervalos previos se solapen
+    entre sí (datos anteriores a las duraciones).
+    Un turno sin profesional ocupa a toda la clínica: choca con los turnos
+    de cualquier profesional, y el de un profesional choca con los suyos y
+    con los sin profesional (la misma regla que usa la disponibilidad).
+    Quien escribe un día tiene su franja (ver AppointmentStore); las
+    lecturas no toman locks y leen con slices, que no fallan si otro hilo
+    acorta la lista.
+    """
+
+    def __init__(self):
+        self._days: Dict[str, Dict[str, List[Tuple[int, int, int]]]] = {}
+        self._longest = DEFAULT_APPOINTMENT_MINUTES
+
+    def add(self, key: IntervalKey, start: int, end: int, appointment_id: int):
+        day, professional = key
+        insort(self._days.setdefault(day, {}).setdefault(professional, []), (start, end, appointment_id))
+        if end - start > self._longest:
+            self._longest = end - start
+
+    def remove(self, key: IntervalKey, start: int, end: int, appointment_id: int):
+        day, professional = key
+        professionals = self._days.get(day)
+        entries = professionals.get(professional) if professionals else None
+        if not entries:
+            return
+        position = bisect_left(entries, (start, end, appointment_id))
+        if entries[position:position + 1] == [(start, end, appointment_id)]:
+            del entries[position]
+        if not entries:
+            del professionals[professional]
+            if not professionals:
+                del self._days[day]
+
+    def conflict(self, key: IntervalKey, start: int, end: int, exclude_id: Optional[int] = None) -> Optional[int]:
+        """ID de un turno que se solapa con [start, end), o None si el intervalo está libre"""
+        day, professional = key
+        professionals = self._days.get(day)
+        if not professionals:
+            return None
+        if professional:
+            candidates = (professionals.get(professional), professionals.get(''))
+        else:
+            candidates = list(professionals.values())
+        for entries in candidates:
+            owner = self._conflict(entries or (), start, end, exclude_id)
+            if owner is not None:
+                return owner
+        return None
+
+    def _conflict(self, entries, start: int, end: int, exclude_id: Optional[int]) -> Optional[int]:
+        position = bisect_left(entries, (end,))
+        while position > 0:
+            position -= 1
+            entry = entries[position:position + 1]
+            if not entry:
+                continue
+            other_start, other_end, other_id = entry[0]
+            if other_start + self._longest <= start:
+                break
+            if other_end > start and other_id != exclude_id:
+                return other_id
+        return None
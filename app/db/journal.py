@@ -0,0 +1,151 @@
+"""
+Journal append-only y snapshots para el backend en memoria
+Da durabilidad a memory:///directorio sin un servidor de base de datos
+"""
+
+import json
+import logging
+import os
+import threading
+from collections.abc import Mapping
+from datetime import date, datetime, time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger('asistente_salud')
+
+SNAPSHOT_FILE = 'snapshot.json'
+JOURNAL_FILE = 'journal.log'
+
+
+def _encode(value: Any) -> Any:
+    # Fechas y horas se etiquetan para recuperar el tipo original al leer
+    if isinstance(value, datetime):
+        return {'$dt': value.isoformat()}
+    if isinstance(value, date):
+        return {'$d': value.isoformat()}
+    if isinstance(value, time):
+        return {'$t': value.isoformat()}
+    if hasattr(value, 'value'):  # Enum
+        return value.value
+    if isinstance(value, Mapping):  # AppointmentRecord
+        return dict(value)
+    raise TypeError(f"Tipo no serializable en el journal: {type(value).__name__}")
+
+
+def _decode(obj: Dict[str, Any]) -> Any:
+    if len(obj) == 1:
+        if '$d' in obj:
+            return date.fromisoformat(obj['$d'])
+        if '$t' in obj:
+            return time.fromisoformat(obj['$t'])
+        if '$dt' in obj:
+            return datetime.fromisoformat(obj['$dt'])
+    return obj
+
+
+# Codificador y decodificador reutilizables: evitan construirlos en cada línea al reaplicar
+_encoder = json.JSONEncoder(separators=(',', ':'), ensure_ascii=False, default=_encode)
+_decoder = json.JSONDecoder(object_hook=_decode)
+
+
+def dumps(value: Any) -> str:
+    return _encoder.encode(value)
+
+
+def loads(raw: str) -> Any:
+    return _decoder.decode(raw)
+
+
+class Journal:
+    """Un snapshot compactado más el journal de operaciones posteriores
+
+    Cada mutación se agrega como una línea JSON [secuencia, operación, args...].
+    Al llegar a `snapshot_every` líneas se escribe un snapshot nuevo (archivo
+    temporal + os.replace, atómico) y se vacía el journal, de modo que el
+    arranque lee a lo sumo un snapshot y `snapshot_every` operaciones. El
+    snapshot guarda la última secuencia que incluye: si el proceso cae entre
+    el reemplazo del snapshot y el vaciado del journal, esas líneas se omiten.
+    """
+
+    def __init__(self, directory: str, snapshot_every: int = 10000, fsync: bool = False):
+        self.directory = directory
+        self.snapshot_every = snapshot_every
+        self.fsync = fsync
+        os.makedirs(directory, exist_ok=True)
+        self._snapshot_path = os.path.join(directory, SNAPSHOT_FILE)
+        self._journal_path = os.path.join(directory, JOURNAL_FILE)
+        self._file = None
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.seq = 0
+
+    def load(self) -> Tuple[Optional[Dict[str, Any]], List[list]]:
+        """Lee el snapshot (o None) y las operaciones [op, args...] posteriores a él"""
+        snapshot = None
+        if os.path.exists(self._snapshot_path):
+            with open(self._snapshot_path, encoding='utf-8') as f:
+                snapshot = loads(f.read())
+            self.seq = snapshot.pop('_seq', 0)
+        records = []
+        for record in self._records():
+            if record[0] > self.seq:
+                self.seq = record[0]
+                records.append(record[1:])
+        self.pending = len(records)
+        return snapshot, records
+
+    def _records(self) -> Iterator[list]:
+        if not os.path.exists(self._journal_path):
+            return
+        valid = 0
+        with open(self._journal_path, 'rb') as f:
+            for number, line in enumerate(f, 1):
+                try:
+                    if not line.endswith(b'\n'):
+                        raise ValueError('sin fin de línea')
+                    record = loads(line.decode('utf-8'))
+                except ValueError as e:
+                    # Línea a medio escribir por una caída del proceso: se descarta
+                    # junto con lo que siga, y el archivo se corta ahí para seguir agregando
+                    logger.warning(f"Journal: línea {number} descartada ({e})")
+                    break
+                valid += len(line)
+                yield record
+        if valid < os.path.getsize(self._journal_path):
+            with open(self._journal_path, 'r+b') as f:
+                f.truncate(valid)
+
+    def append(self, *record):
+        """Agrega una operación; devuelve True si corresponde compactar"""
+        with self._lock:
+            self.seq += 1
+            line = dumps((self.seq,) + record) + '\n'
+            if self._file is None:
+                self._file = open(self._journal_path, 'a', encoding='utf-8')
+            self._file.write(line)
+            self._file.flush()
+            if self.fsync:
+                os.fsync(self._file.fileno())
+            self.pending += 1
+            return self.pending >= self.snapshot_every
+
+    def write_snapshot(self, state: Dict[str, Any]):
+        """Reemplaza el snapshot por `state` y vacía el journal"""
+        tmp_path = self._snapshot_path + '.tmp'
+        with self._lock:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(dumps(dict(state, _seq=self.seq)))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self._snapshot_path)
+            if self._file is not None:
+                self._file.close()
+            self._file = open(self._journal_path, 'w', encoding='utf-8')
+            self.pending = 0
+        logger.info(f"Journal compactado en {self._snapshot_path}")
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
@@ -0,0 +1,90 @@
+"""
+Locks por franja e IDs monotónicos del backend en memoria
+Las escrituras de pacientes y días distintos no compiten por un mismo lock
+"""
+
+import threading
+from contextlib import contextmanager
+from typing import Hashable, Iterable, Iterator, List
+
+from app.config import MEMORY_LOCK_STRIPES
+
+
+def phone_stripe(phone_number) -> tuple:
+    return ('phone', phone_number)
+
+
+def day_stripe(day) -> tuple:
+    return ('day', day)
+
+
+class StripedLock:
+    """Un conjunto fijo de locks reentrantes; cada clave usa el de hash(clave) % n
+
+    holding() toma los locks de varias claves siempre en orden creciente de
+    franja, así dos escrituras que comparten franjas no se bloquean entre sí
+    en orden inverso. Los locks son reentrantes: quien ya tiene una franja
+    puede volver a pedirla (p. ej. el backend y luego el store), siempre
+    que no pida franjas nuevas después de tomar otras.
+    """
+
+    def __init__(self, stripes: int = MEMORY_LOCK_STRIPES):
+        self._locks = [threading.RLock() for _ in range(max(stripes, 1))]
+
+    def __len__(self) -> int:
+        return len(self._locks)
+
+    def indexes(self, keys: Iterable[Hashable]) -> List[int]:
+        """Franjas de las claves, sin repetir y en el orden en que se toman"""
+        return sorted({hash(key) % len(self._locks) for key in keys})
+
+    @contextmanager
+    def holding(self, *keys: Hashable) -> Iterator[None]:
+        """Toma las franjas de `keys` mientras dura el bloque"""
+        with self._holding(self.indexes(keys)):
+            yield
+
+    @contextmanager
+    def holding_all(self) -> Iterator[None]:
+        """Toma todas las franjas (snapshot, archivo): espera a las escrituras en curso"""
+        with self._holding(range(len(self._locks))):
+            yield
+
+    @contextmanager
+    def _holding(self, indexes: Iterable[int]) -> Iterator[None]:
+        taken = []
+        try:
+            for index in indexes:
+                self._locks[index].acquire()
+                taken.append(index)
+            yield
+        finally:
+            for index in reversed(taken):
+                self._locks[index].release()
+
+
+class IdAllocator:
+    """IDs crecientes que no se repiten aunque se borren registros
+
+    observe() adelanta el contador al restaurar registros con ID propio
+    (snapshot, journal), como una secuencia de SQL tras un INSERT explícito.
+    """
+
+    def __init__(self, start: int = 1):
+        self._next = start
+        self._lock = threading.Lock()
+
+    @property
+    def next_value(self) -> int:
+        return self._next
+
+    def next(self) -> int:
+        with self._lock:
+            value = self._next
+            self._next += 1
+            return value
+
+    def observe(self, value: int):
+        with self._lock:
+            if value >= self._next:
+                self._next = value + 1
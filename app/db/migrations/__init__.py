@@ -0,0 +1,33 @@
+"""
+Migraciones versionadas del esquema
+Un directorio por dialecto con scripts NNNN_descripcion.sql que se aplican en orden.
+Las migraciones de datos que no se pueden expresar en SQL son NNNN_descripcion.py
+con una función upgrade(cursor, sql), donde `sql` adapta los placeholders %s al dialecto
+"""
+
+import importlib.util
+import os
+import re
+from types import ModuleType
+from typing import List, Tuple
+
+MIGRATIONS_DIR = os.path.dirname(os.path.abspath(__file__))
+MIGRATION_FILE = re.compile(r'^(\d{4})_[a-z0-9_]+\.(sql|py)$')
+
+
+def migration_files(dialect: str) -> List[Tuple[str, str]]:
+    """Lista (versión, ruta) de las migraciones de un dialecto, ordenadas por versión"""
+    directory = os.path.join(MIGRATIONS_DIR, dialect)
+    files = []
+    for filename in sorted(os.listdir(directory)):
+        if MIGRATION_FILE.match(filename):
+            files.append((os.path.splitext(filename)[0], os.path.join(directory, filename)))
+    return files
+
+
+def load_migration(version: str, path: str) -> ModuleType:
+    """Carga el módulo de una migración de datos en Python"""
+    spec = importlib.util.spec_from_file_location(f'app.db.migrations._{version}', path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
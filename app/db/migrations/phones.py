@@ -0,0 +1,28 @@
+"""
+Normalización a E.164 de los teléfonos guardados
+La usan las migraciones 0010_phone_normalize de cada dialecto: 0005 sólo quitaba el
+prefijo 'whatsapp:', y quedaban claves con separadores, prefijo 00 o números nacionales
+"""
+
+from app.utils.phone import normalize_phone
+
+# Tablas con historia del paciente: los teléfonos se reescriben a su forma E.164
+PHONE_TABLES = ('appointments', 'appointments_archive', 'notifications', 'feedback', 'attachments')
+
+
+def upgrade(cursor, sql):
+    for table in PHONE_TABLES:
+        for raw, phone_number in _denormalized(cursor, table):
+            # Lo que no es un teléfono válido se deja como está: no hay a qué normalizarlo
+            if phone_number is not None:
+                cursor.execute(sql(f'UPDATE {table} SET phone_number = %s WHERE phone_number = %s'), (phone_number, raw))
+    # El estado de conversación es efímero y su clave es única: las filas no normalizadas se descartan
+    for raw, _ in _denormalized(cursor, 'conversation_states'):
+        cursor.execute(sql('DELETE FROM conversation_states WHERE phone_number = %s'), (raw,))
+
+
+def _denormalized(cursor, table):
+    """(guardado, normalizado) de los teléfonos distintos de la tabla que no están en E.164"""
+    cursor.execute(f'SELECT DISTINCT phone_number FROM {table}')
+    pairs = [(raw, normalize_phone(raw)) for (raw,) in cursor.fetchall()]
+    return [(raw, phone_number) for raw, phone_number in pairs if phone_number != raw]
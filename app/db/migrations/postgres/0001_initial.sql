@@ -0,0 +1,84 @@
+-- Esquema inicial: turnos, notificaciones, estado de conversación, feedback y adjuntos
+
+CREATE TABLE IF NOT EXISTS appointments (
+    id               SERIAL PRIMARY KEY,
+    phone_number     VARCHAR(32)  NOT NULL,
+    patient_name     VARCHAR(120),
+    appointment_date DATE         NOT NULL,
+    appointment_time TIME         NOT NULL,
+    urgency_level    VARCHAR(20),
+    notes            TEXT,
+    status           VARCHAR(20)  NOT NULL DEFAULT 'pendiente',
+    followup_sent    BOOLEAN      NOT NULL DEFAULT FALSE,
+    attended         BOOLEAN,
+    created_at       TIMESTAMP    NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    updated_at       TIMESTAMP    NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Turnos de un paciente y feedback post-turno (webhook)
+CREATE INDEX IF NOT EXISTS idx_appointments_phone_date
+    ON appointments (phone_number, appointment_date);
+-- Último turno de un paciente
+CREATE INDEX IF NOT EXISTS idx_appointments_phone_created
+    ON appointments (phone_number, created_at);
+-- Agenda del día, rangos y horarios disponibles
+CREATE INDEX IF NOT EXISTS idx_appointments_date_time
+    ON appointments (appointment_date, appointment_time);
+-- Jobs de seguimiento y ausencias: solo los confirmados aún sin seguimiento
+CREATE INDEX IF NOT EXISTS idx_appointments_followup_pending
+    ON appointments (appointment_date)
+    WHERE status = 'confirmado' AND followup_sent = FALSE;
+-- Turnos pasados que siguen pendientes
+CREATE INDEX IF NOT EXISTS idx_appointments_pending_date
+    ON appointments (appointment_date)
+    WHERE status = 'pendiente';
+
+CREATE TABLE IF NOT EXISTS notifications (
+    id                SERIAL PRIMARY KEY,
+    phone_number      VARCHAR(32) NOT NULL,
+    message           TEXT,
+    notification_type VARCHAR(40),
+    status            VARCHAR(20) NOT NULL DEFAULT 'pendiente',
+    created_at        TIMESTAMP   NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    sent_at           TIMESTAMP,
+    error_message     TEXT,
+    retry_count       INTEGER     NOT NULL DEFAULT 0
+);
+
+CREATE INDEX IF NOT EXISTS idx_notifications_phone_created
+    ON notifications (phone_number, created_at);
+CREATE INDEX IF NOT EXISTS idx_notifications_status_created
+    ON notifications (status, created_at);
+
+CREATE TABLE IF NOT EXISTS conversation_states (
+    phone_number VARCHAR(32) PRIMARY KEY,
+    state        JSONB       NOT NULL DEFAULT '{}'::jsonb,
+    updated_at   TIMESTAMP   NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE TABLE IF NOT EXISTS feedback (
+    id           SERIAL PRIMARY KEY,
+    phone_number VARCHAR(32) NOT NULL,
+    patient_name VARCHAR(120),
+    rating       SMALLINT,
+    comment      TEXT,
+    created_at   TIMESTAMP   NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_feedback_phone_created
+    ON feedback (phone_number, created_at);
+
+CREATE TABLE IF NOT EXISTS attachments (
+    id             SERIAL PRIMARY KEY,
+    appointment_id INTEGER REFERENCES appointments (id) ON DELETE SET NULL,
+    phone_number   VARCHAR(32) NOT NULL,
+    filename       VARCHAR(255),
+    file_type      VARCHAR(60),
+    file_size      INTEGER,
+    created_at     TIMESTAMP   NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_attachments_phone_created
+    ON attachments (phone_number, created_at);
+CREATE INDEX IF NOT EXISTS idx_attachments_appointment
+    ON attachments (appointment_id);
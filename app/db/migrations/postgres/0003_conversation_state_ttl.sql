@@ -0,0 +1,7 @@
+-- Vencimiento del estado de conversación: las filas vencidas se ignoran al leer
+-- y se borran con purge_expired_conversation_states()
+
+ALTER TABLE conversation_states ADD COLUMN IF NOT EXISTS expires_at TIMESTAMP;
+
+CREATE INDEX IF NOT EXISTS idx_conversation_states_expires
+    ON conversation_states (expires_at);
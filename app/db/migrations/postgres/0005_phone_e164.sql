@@ -0,0 +1,11 @@
+-- Teléfonos en E.164: se quita el prefijo 'whatsapp:' que algunas rutas guardaban,
+-- para que cada paciente tenga una sola clave (ver app/utils/phone.py). El resto de las
+-- formas (separadores, prefijo 00, números nacionales) las normaliza 0010_phone_normalize.py
+
+UPDATE appointments SET phone_number = SUBSTR(phone_number, 10) WHERE phone_number LIKE 'whatsapp:%';
+UPDATE notifications SET phone_number = SUBSTR(phone_number, 10) WHERE phone_number LIKE 'whatsapp:%';
+UPDATE feedback SET phone_number = SUBSTR(phone_number, 10) WHERE phone_number LIKE 'whatsapp:%';
+UPDATE attachments SET phone_number = SUBSTR(phone_number, 10) WHERE phone_number LIKE 'whatsapp:%';
+
+-- El estado de conversación es efímero y su clave es única: las filas con prefijo se descartan
+DELETE FROM conversation_states WHERE phone_number LIKE 'whatsapp:%';
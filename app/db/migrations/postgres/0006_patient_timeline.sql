@@ -0,0 +1,19 @@
+-- Línea de tiempo del paciente: cada colección se recorre por teléfono del
+-- instante más reciente al más antiguo, con el id como desempate del cursor.
+-- Los índices (teléfono, instante) anteriores quedan cubiertos como prefijo.
+
+CREATE INDEX IF NOT EXISTS idx_appointments_phone_timeline
+    ON appointments (phone_number, appointment_date, appointment_time, id);
+DROP INDEX IF EXISTS idx_appointments_phone_date;
+
+CREATE INDEX IF NOT EXISTS idx_notifications_phone_timeline
+    ON notifications (phone_number, created_at, id);
+DROP INDEX IF EXISTS idx_notifications_phone_created;
+
+CREATE INDEX IF NOT EXISTS idx_feedback_phone_timeline
+    ON feedback (phone_number, created_at, id);
+DROP INDEX IF EXISTS idx_feedback_phone_created;
+
+CREATE INDEX IF NOT EXISTS idx_attachments_phone_timeline
+    ON attachments (phone_number, created_at, id);
+DROP INDEX IF EXISTS idx_attachments_phone_created;
@@ -0,0 +1,27 @@
+-- Archivo de turnos: los cerrados (completados, cancelados, ausentes) anteriores
+-- al horizonte ARCHIVE_AFTER_DAYS se mueven acá y salen de los índices calientes.
+-- Mismas columnas que appointments; el id se conserva, así que no es SERIAL.
+
+CREATE TABLE IF NOT EXISTS appointments_archive (
+    id               INTEGER      PRIMARY KEY,
+    phone_number     VARCHAR(32)  NOT NULL,
+    patient_name     VARCHAR(120),
+    appointment_date DATE         NOT NULL,
+    appointment_time TIME         NOT NULL,
+    urgency_level    VARCHAR(20),
+    notes            TEXT,
+    status           VARCHAR(20)  NOT NULL,
+    followup_sent    BOOLEAN      NOT NULL DEFAULT FALSE,
+    attended         BOOLEAN,
+    created_at       TIMESTAMP    NOT NULL,
+    updated_at       TIMESTAMP    NOT NULL,
+    professional     VARCHAR(60),
+    archived_at      TIMESTAMP    NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Consultas por fecha que llegan al archivo y límite del archivo (MAX(appointment_date))
+CREATE INDEX IF NOT EXISTS idx_appointments_archive_keyset
+    ON appointments_archive (appointment_date, appointment_time, id);
+-- Historial de un paciente
+CREATE INDEX IF NOT EXISTS idx_appointments_archive_phone
+    ON appointments_archive (phone_number, appointment_date);
@@ -0,0 +1,6 @@
+-- Control de concurrencia optimista: cada UPDATE de un turno incrementa su versión
+-- y los cambios que parten de una lectura la comparan (compare-and-set).
+-- El archivo conserva la versión con la que se archivó el turno.
+
+ALTER TABLE appointments ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1;
+ALTER TABLE appointments_archive ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1;
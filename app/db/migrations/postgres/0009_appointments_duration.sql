@@ -0,0 +1,7 @@
+-- Duración de cada turno: un turno ocupa [hora, hora + duration_minutes) y choca
+-- con cualquier turno activo del mismo día y profesional que se solape.
+-- El chequeo de solapes usa uq_appointments_active_slot (fecha, hora) para
+-- leer sólo los turnos que empiezan hasta MAX_APPOINTMENT_MINUTES antes.
+
+ALTER TABLE appointments ADD COLUMN IF NOT EXISTS duration_minutes INTEGER NOT NULL DEFAULT 30;
+ALTER TABLE appointments_archive ADD COLUMN IF NOT EXISTS duration_minutes INTEGER NOT NULL DEFAULT 30;
@@ -0,0 +1,3 @@
+"""Teléfonos en E.164 con app.utils.phone.normalize_phone (completa 0005_phone_e164)"""
+
+from app.db.migrations.phones import upgrade  # noqa: F401
@@ -0,0 +1,7 @@
+-- Reserva atómica de horarios: un solo turno activo por (fecha, hora, profesional)
+
+ALTER TABLE appointments ADD COLUMN professional VARCHAR(60);
+
+CREATE UNIQUE INDEX IF NOT EXISTS uq_appointments_active_slot
+    ON appointments (appointment_date, appointment_time, COALESCE(professional, ''))
+    WHERE status <> 'cancelado';
@@ -0,0 +1,7 @@
+-- Orden total (fecha, hora, id) para la paginación por cursor; reemplaza al
+-- índice (fecha, hora), que queda cubierto como prefijo
+
+CREATE INDEX IF NOT EXISTS idx_appointments_keyset
+    ON appointments (appointment_date, appointment_time, id);
+
+DROP INDEX IF EXISTS idx_appointments_date_time;
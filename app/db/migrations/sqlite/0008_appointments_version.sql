@@ -0,0 +1,6 @@
+-- Control de concurrencia optimista: cada UPDATE de un turno incrementa su versión
+-- y los cambios que parten de una lectura la comparan (compare-and-set).
+-- Mismas columnas que postgres/0008_appointments_version.sql
+
+ALTER TABLE appointments ADD COLUMN version INTEGER NOT NULL DEFAULT 1;
+ALTER TABLE appointments_archive ADD COLUMN version INTEGER NOT NULL DEFAULT 1;
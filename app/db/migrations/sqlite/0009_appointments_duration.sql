@@ -0,0 +1,6 @@
+-- Duración de cada turno: un turno ocupa [hora, hora + duration_minutes) y choca
+-- con cualquier turno activo del mismo día y profesional que se solape.
+-- Mismas columnas que postgres/0009_appointments_duration.sql
+
+ALTER TABLE appointments ADD COLUMN duration_minutes INTEGER NOT NULL DEFAULT 30;
+ALTER TABLE appointments_archive ADD COLUMN duration_minutes INTEGER NOT NULL DEFAULT 30;
@@ -1,33 +1,184 @@
 """
 Conexión a PostgreSQL
-Configuración básica para desarrollo
+Pool de conexiones thread-safe sobre psycopg2
 """
 
 import logging
+import threading
+import time
+from contextlib import contextmanager
 from typing import Optional
 
+from app.config import (
+    DATABASE_URL, DB_POOL_MIN, DB_POOL_MAX, DB_POOL_TIMEOUT,
+    DB_CONNECT_TIMEOUT, DB_POOL_PING_AFTER
+)
+
 logger = logging.getLogger('asistente_salud')
 
-# Para desarrollo, usamos la simulación en memoria
-# En producción, aquí iría la conexión real a PostgreSQL
+_pool = None
+_slots = None
+_last_used = {}
+_pool_lock = threading.Lock()
+
+
+class PoolTimeoutError(Exception):
+    """No se liberó ninguna conexión del pool dentro del tiempo de espera"""
+
+
+class PooledConnection:
+    """Conexión prestada por el pool
+
+    Delega todo en la conexión de psycopg2, salvo close(), que la devuelve al
+    pool en lugar de cerrarla. Así el código que hace conn.close() al terminar
+    sigue funcionando sin abrir una conexión nueva en cada uso.
+    """
+
+    def __init__(self, raw):
+        self._raw = raw
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def close(self):
+        if self._raw is not None:
+            release_connection(self._raw)
+            self._raw = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._raw is not None:
+            if exc_type is None:
+                self._raw.commit()
+            else:
+                self._raw.rollback()
+        self.close()
+
+
+def _get_pool():
+    """Crea el pool la primera vez que se necesita"""
+    global _pool, _slots
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                from psycopg2.pool import ThreadedConnectionPool
+                _pool = ThreadedConnectionPool(
+                    DB_POOL_MIN, DB_POOL_MAX,
+                    dsn=DATABASE_URL,
+                    connect_timeout=DB_CONNECT_TIMEOUT
+                )
+                _slots = threading.BoundedSemaphore(DB_POOL_MAX)
+                logger.info(f"Pool de PostgreSQL creado ({DB_POOL_MIN}-{DB_POOL_MAX} conexiones)")
+    return _pool
+
+
+def _is_usable(raw) -> bool:
+    """Valida una conexión al sacarla del pool"""
+    if raw.closed:
+        return False
+    idle_since = _last_used.get(id(raw))
+    if idle_since is not None and time.monotonic() - idle_since < DB_POOL_PING_AFTER:
+        return True
+    try:
+        with raw.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        raw.rollback()
+        return True
+    except Exception as e:
+        logger.warning(f"Conexión descartada del pool: {str(e)}")
+        return False
+
+
+def acquire_connection(timeout: Optional[float] = None):
+    """Obtiene una conexión validada del pool, esperando como máximo `timeout` segundos"""
+    db_pool = _get_pool()
+    wait = DB_POOL_TIMEOUT if timeout is None else timeout
+    if not _slots.acquire(timeout=wait):
+        raise PoolTimeoutError(f"Sin conexiones libres tras {wait}s")
+    try:
+        while True:
+            raw = db_pool.getconn()
+            if _is_usable(raw):
+                return raw
+            _last_used.pop(id(raw), None)
+            db_pool.putconn(raw, close=True)
+    except Exception:
+        _slots.release()
+        raise
+
+
+def release_connection(raw):
+    """Devuelve una conexión al pool, descartando cualquier transacción abierta"""
+    from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+    discard = bool(raw.closed)
+    if not discard:
+        try:
+            if raw.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+                raw.rollback()
+        except Exception as e:
+            logger.warning(f"Error limpiando conexión antes de devolverla: {str(e)}")
+            discard = True
+    if discard:
+        _last_used.pop(id(raw), None)
+    else:
+        _last_used[id(raw)] = time.monotonic()
+    try:
+        _pool.putconn(raw, close=discard)
+    finally:
+        _slots.release()
+
+
+@contextmanager
+def connection(timeout: Optional[float] = None):
+    """Context manager que presta una conexión y la devuelve al pool
+
+    Hace commit si el bloque termina bien y rollback si lanza una excepción.
+    """
+    raw = acquire_connection(timeout)
+    try:
+        yield raw
+        raw.commit()
+    except Exception:
+        if not raw.closed:
+            raw.rollback()
+        raise
+    finally:
+        release_connection(raw)
+
 
 def get_connection():
-    """Obtiene conexión a la base de datos"""
-    # Por ahora retornamos None para usar la simulación en memoria
-    return None
+    """Obtiene conexión a la base de datos desde el pool"""
+    return PooledConnection(acquire_connection())
+
 
 def close_connection(connection):
-    """Cierra la conexión a la base de datos"""
+    """Cierra la conexión a la base de datos (las del pool vuelven al pool)"""
     if connection:
         try:
             connection.close()
         except Exception as e:
             logger.error(f"Error cerrando conexión: {str(e)}")
 
+
+def close_pool():
+    """Cierra todas las conexiones del pool (al apagar o tras un fork)"""
+    global _pool, _slots
+    with _pool_lock:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+            _slots = None
+            _last_used.clear()
+
+
 def test_connection() -> bool:
     """Prueba la conexión a la base de datos"""
     try:
-        # Por ahora siempre retorna True para desarrollo
+        with connection() as conn:
+            with conn.cursor() as cursor:
+                cursor.execute('SELECT 1')
         return True
     except Exception as e:
         logger.error(f"Error probando conexión: {str(e)}")
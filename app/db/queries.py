@@ -1,44 +1,57 @@
 """
 Queries completas para la base de datos
 Funciones para interactuar con la BD - versión completa
+
+Cada función delega en el backend activo (memoria, PostgreSQL...) elegido
+según DATABASE_URL; ver app/db/backends.
 """
 
+import heapq
 import logging
-from typing import Dict, List, Optional, Any
+from contextlib import closing
+from itertools import islice
+from typing import Dict, Iterable, Iterator, List, Optional, Any, Tuple
 from datetime import datetime, date, timedelta
+from app.config import ARCHIVE_AFTER_DAYS
+from app.db.backends import get_backend
+from app.db.errors import SlotUnavailableError, VersionConflictError
+from app.db.query_cache import (
+    ALL_APPOINTMENTS, availability_cache, query_cache, appointment_tag, appointment_tags, day_tag, phone_tag, range_tags
+)
+from app.db.state import get_state_backend
+from app.db.stats import stats
+from app.db.store import date_key, order_key
+from app.db.timeline import event, event_key, merge, moment_key
+from app.utils.phone import phone_key
 
 logger = logging.getLogger('asistente_salud')
 
-# Simulación de base de datos en memoria para desarrollo
-_appointments = []
-_notifications = []
-_conversation_states = {}
-_feedback = []
-_attachments = []
+# Estados de los turnos cerrados que pasan al archivo pasado el horizonte
+ARCHIVED_STATUSES = ('completado', 'cancelado', 'ausente')
+
+def _with_phone_key(data: Dict[str, Any]) -> Dict[str, Any]:
+    # Los teléfonos se guardan siempre en E.164: la misma clave para cada paciente en todos los backends
+    if data.get('phone_number') is None:
+        return data
+    return dict(data, phone_number=phone_key(data['phone_number']))
 
 # ========================================
 # FUNCIONES DE TURNOS
 # ========================================
 
 def save_appointment(appointment_data: Dict[str, Any]) -> Dict[str, Any]:
-    """Guarda un turno en la base de datos"""
-    try:
-        appointment_id = len(_appointments) + 1
-        appointment = {
-            'id': appointment_id,
-            'phone_number': appointment_data.get('phone_number'),
-            'patient_name': appointment_data.get('patient_name'),
-            'appointment_date': appointment_data.get('appointment_date'),
-            'appointment_time': appointment_data.get('appointment_time'),
-            'urgency_level': appointment_data.get('urgency_level'),
-            'notes': appointment_data.get('notes'),
-            'status': 'pendiente',
-            'created_at': datetime.now().isoformat(),
-            'updated_at': datetime.now().isoformat()
-        }
-        _appointments.append(appointment)
-        logger.info(f"Turno guardado: ID {appointment_id}")
+    """Guarda un turno en la base de datos
+
+    Raises:
+        SlotUnavailableError: si la fecha, hora y profesional ya están reservados
+    """
+    try:
+        appointment = get_backend().save_appointment(_with_phone_key(appointment_data))
+        query_cache.invalidate(appointment_tags(appointment))
+        logger.info(f"Turno guardado: ID {appointment['id']}")
         return appointment
+    except SlotUnavailableError:
+        raise
     except Exception as e:
         logger.error(f"Error guardando turno: {str(e)}")
         return {}
@@ -50,9 +63,12 @@ def create_appointment(appointment_data: Dict[str, Any]) -> Dict[str, Any]:
 def get_appointments(phone_number: Optional[str] = None) -> List[Dict[str, Any]]:
     """Obtiene turnos de la base de datos"""
     try:
-        if phone_number:
-            return [apt for apt in _appointments if apt.get('phone_number') == phone_number]
-        return _appointments
+        phone_number = phone_key(phone_number)
+        return query_cache.get_or_load(
+            ('appointments', phone_number),
+            {phone_tag(phone_number)} if phone_number else {ALL_APPOINTMENTS},
+            lambda: get_backend().get_appointments(phone_number)
+        )
     except Exception as e:
         logger.error(f"Error obteniendo turnos: {str(e)}")
         return []
@@ -61,27 +77,71 @@ def get_all_appointments() -> List[Dict[str, Any]]:
     """Obtiene todos los turnos de la base de datos"""
     return get_appointments()
 
+def get_appointments_page(after: Optional[Tuple[str, str, int]] = None, limit: int = 50,
+                          start_date: Optional[date] = None, end_date: Optional[date] = None,
+                          phone_number: Optional[str] = None, status: Optional[str] = None) -> List[Dict[str, Any]]:
+    """Página de turnos en orden (fecha, hora, id) posterior a la clave `after`"""
+    try:
+        backend = get_backend()
+        phone_number = phone_key(phone_number)
+        page = backend.get_appointments_page(after, limit, start_date, end_date, phone_number, status)
+        if not _reaches_archive(start_date):
+            return page
+        # Los dos lados vienen ordenados: alcanza con los primeros `limit` del archivo
+        with closing(backend.iter_archived_appointments(start_date, end_date, phone_number, status, after)) as cold:
+            return sorted(page + list(islice(cold, limit)), key=order_key)[:limit]
+    except Exception as e:
+        logger.error(f"Error obteniendo página de turnos: {str(e)}")
+        return []
+
 def get_appointment(appointment_id: int) -> Optional[Dict[str, Any]]:
     """Obtiene un turno específico por ID"""
     try:
-        for appointment in _appointments:
-            if appointment.get('id') == appointment_id:
-                return appointment
-        return None
+        return query_cache.get_or_load(
+            ('appointment', appointment_id), {appointment_tag(appointment_id)},
+            lambda: _find_appointment(get_backend(), appointment_id)
+        )
     except Exception as e:
         logger.error(f"Error obteniendo turno: {str(e)}")
         return None
 
-def update_appointment(appointment_id: int, update_data: Dict[str, Any]) -> bool:
-    """Actualiza un turno existente"""
+def _find_appointment(backend, appointment_id: int) -> Optional[Dict[str, Any]]:
+    # Un ID que no está entre los turnos activos puede ser de un turno archivado
+    appointment = backend.get_appointment(appointment_id)
+    if appointment is None:
+        appointment = backend.get_archived_appointment(appointment_id)
+    return appointment
+
+def update_appointment(appointment_id: int, update_data: Dict[str, Any],
+                       expected_version: Optional[int] = None) -> bool:
+    """Actualiza un turno existente
+
+    Con `expected_version` el cambio sólo se aplica si el turno sigue en esa
+    versión (la que tenía al leerlo).
+
+    Raises:
+        SlotUnavailableError: si el cambio lo mueve a un horario ya reservado
+        VersionConflictError: si otro cambio se aplicó después de `expected_version`
+    """
     try:
-        for appointment in _appointments:
-            if appointment.get('id') == appointment_id:
-                appointment.update(update_data)
-                appointment['updated_at'] = datetime.now().isoformat()
-                logger.info(f"Turno actualizado: ID {appointment_id}")
-                return True
-        return False
+        backend = get_backend()
+        update_data = _with_phone_key(update_data)
+        # Se invalidan el día y el teléfono de antes y de después del cambio
+        current = backend.get_appointment(appointment_id)
+        tags = appointment_tags(current) | appointment_tags(dict(current, **update_data) if current else None)
+        try:
+            updated = backend.update_appointment(appointment_id, update_data, expected_version)
+        except VersionConflictError:
+            # Lo guardado en caché es anterior al cambio que ganó: la próxima lectura va al backend
+            query_cache.invalidate(tags)
+            raise
+        if not updated:
+            return False
+        query_cache.invalidate(tags)
+        logger.info(f"Turno actualizado: ID {appointment_id}")
+        return True
+    except (SlotUnavailableError, VersionConflictError):
+        raise
     except Exception as e:
         logger.error(f"Error actualizando turno: {str(e)}")
         return False
@@ -89,12 +149,13 @@ def update_appointment(appointment_id: int, update_data: Dict[str, Any]) -> bool
 def delete_appointment(appointment_id: int) -> bool:
     """Elimina un turno de la base de datos"""
     try:
-        for i, appointment in enumerate(_appointments):
-            if appointment.get('id') == appointment_id:
-                del _appointments[i]
-                logger.info(f"Turno eliminado: ID {appointment_id}")
-                return True
-        return False
+        backend = get_backend()
+        tags = appointment_tags(backend.get_appointment(appointment_id))
+        if not backend.delete_appointment(appointment_id):
+            return False
+        query_cache.invalidate(tags)
+        logger.info(f"Turno eliminado: ID {appointment_id}")
+        return True
     except Exception as e:
         logger.error(f"Error eliminando turno: {str(e)}")
         return False
@@ -102,25 +163,33 @@ def delete_appointment(appointment_id: int) -> bool:
 def get_appointments_by_date(date: str) -> List[Dict[str, Any]]:
     """Obtiene todos los turnos para una fecha específica"""
     try:
-        appointments = []
-        for appointment in _appointments:
-            if appointment.get('appointment_date') == date:
-                appointments.append(appointment)
-        return appointments
+        return query_cache.get_or_load(
+            ('by_date', date), {day_tag(date)},
+            lambda: _with_archived(get_backend().get_appointments_by_date(date), date, date)
+        )
     except Exception as e:
         logger.error(f"Error obteniendo turnos por fecha: {str(e)}")
         return []
 
+def is_slot_available(appointment_date: date, appointment_time: Any, professional: Optional[str] = None,
+                      exclude_id: Optional[int] = None, duration: Optional[int] = None) -> bool:
+    """Indica si [hora, hora + duración) está libre consultando el índice de reservas"""
+    try:
+        return query_cache.get_or_load(
+            ('slot', appointment_date, appointment_time, professional, exclude_id, duration), {day_tag(appointment_date)},
+            lambda: get_backend().is_slot_available(appointment_date, appointment_time, professional, exclude_id, duration)
+        )
+    except Exception as e:
+        logger.error(f"Error verificando horario: {str(e)}")
+        return False
+
 def get_upcoming_appointments() -> List[Dict[str, Any]]:
     """Obtiene turnos futuros"""
     try:
         today = datetime.now().date()
-        upcoming = []
-        for appointment in _appointments:
-            apt_date = appointment.get('appointment_date')
-            if apt_date and apt_date >= today.isoformat():
-                upcoming.append(appointment)
-        return upcoming
+        return query_cache.get_or_load(
+            ('upcoming', today), {ALL_APPOINTMENTS}, lambda: get_backend().get_upcoming_appointments(today)
+        )
     except Exception as e:
         logger.error(f"Error obteniendo turnos futuros: {str(e)}")
         return []
@@ -128,13 +197,7 @@ def get_upcoming_appointments() -> List[Dict[str, Any]]:
 def get_past_unattended_appointments() -> List[Dict[str, Any]]:
     """Obtiene turnos pasados sin asistir"""
     try:
-        today = datetime.now().date()
-        past_unattended = []
-        for appointment in _appointments:
-            apt_date = appointment.get('appointment_date')
-            if apt_date and apt_date < today.isoformat() and appointment.get('status') == 'pendiente':
-                past_unattended.append(appointment)
-        return past_unattended
+        return get_backend().get_past_unattended_appointments(datetime.now().date())
     except Exception as e:
         logger.error(f"Error obteniendo turnos pasados sin asistir: {str(e)}")
         return []
@@ -142,10 +205,11 @@ def get_past_unattended_appointments() -> List[Dict[str, Any]]:
 def get_last_appointment(phone_number: str) -> Optional[Dict[str, Any]]:
     """Obtiene el último turno de un paciente"""
     try:
-        appointments = [apt for apt in _appointments if apt.get('phone_number') == phone_number]
-        if appointments:
-            return max(appointments, key=lambda x: x.get('created_at', ''))
-        return None
+        phone_number = phone_key(phone_number)
+        return query_cache.get_or_load(
+            ('last', phone_number), {phone_tag(phone_number)},
+            lambda: get_backend().get_last_appointment(phone_number)
+        )
     except Exception as e:
         logger.error(f"Error obteniendo último turno: {str(e)}")
         return None
@@ -167,6 +231,54 @@ def mark_appointment_absent(appointment_id: int) -> bool:
         logger.error(f"Error marcando turno como ausente: {str(e)}")
         return False
 
+def get_followup_candidates(before: date) -> List[Dict[str, Any]]:
+    """Obtiene turnos confirmados anteriores a una fecha que aún no recibieron seguimiento"""
+    try:
+        return get_backend().get_followup_candidates(before)
+    except Exception as e:
+        logger.error(f"Error obteniendo turnos para seguimiento: {str(e)}")
+        return []
+
+def get_absence_candidates(before: date) -> List[Dict[str, Any]]:
+    """Obtiene turnos confirmados anteriores a una fecha sin asistencia registrada ni seguimiento"""
+    try:
+        return get_backend().get_absence_candidates(before)
+    except Exception as e:
+        logger.error(f"Error obteniendo turnos sin asistencia: {str(e)}")
+        return []
+
+def get_absent_appointments(before: date) -> List[Dict[str, Any]]:
+    """Obtiene turnos confirmados anteriores a una fecha sin asistencia registrada, con o sin seguimiento"""
+    try:
+        return get_backend().get_absent_appointments(before)
+    except Exception as e:
+        logger.error(f"Error obteniendo turnos ausentes: {str(e)}")
+        return []
+
+def mark_followup_sent(appointment_id: int) -> bool:
+    """Marca que ya se envió el mensaje de seguimiento de un turno"""
+    return update_appointment(appointment_id, {'followup_sent': True})
+
+def set_appointment_attended(appointment_id: int, attended: bool) -> bool:
+    """Registra si el paciente asistió al turno"""
+    return update_appointment(appointment_id, {'attended': attended})
+
+def get_recent_followups(since: date) -> List[Dict[str, Any]]:
+    """Turnos pasados desde `since` a los que ya se les envió seguimiento"""
+    try:
+        return get_backend().get_recent_followups(since, datetime.now().date())
+    except Exception as e:
+        logger.error(f"Error obteniendo seguimientos recientes: {str(e)}")
+        return []
+
+def get_last_followed_up_appointment(phone_number: str) -> Optional[Dict[str, Any]]:
+    """Obtiene el último turno pasado de un paciente al que se le envió seguimiento"""
+    try:
+        return get_backend().get_last_followed_up_appointment(phone_key(phone_number), datetime.now().date())
+    except Exception as e:
+        logger.error(f"Error obteniendo último turno con seguimiento: {str(e)}")
+        return None
+
 # ========================================
 # FUNCIONES DE NOTIFICACIONES
 # ========================================
@@ -174,20 +286,9 @@ def mark_appointment_absent(appointment_id: int) -> bool:
 def save_notification(notification_data: Dict[str, Any]) -> Dict[str, Any]:
     """Guarda una notificación en la base de datos"""
     try:
-        notification_id = len(_notifications) + 1
-        notification = {
-            'id': notification_id,
-            'phone_number': notification_data.get('phone_number'),
-            'message': notification_data.get('message'),
-            'notification_type': notification_data.get('notification_type'),
-            'status': 'pendiente',
-            'created_at': datetime.now().isoformat(),
-            'sent_at': None,
-            'error_message': None,
-            'retry_count': 0
-        }
-        _notifications.append(notification)
-        logger.info(f"Notificación guardada: ID {notification_id}")
+        notification = get_backend().save_notification(_with_phone_key(notification_data))
+        stats.notification_saved(notification)
+        logger.info(f"Notificación guardada: ID {notification['id']}")
         return notification
     except Exception as e:
         logger.error(f"Error guardando notificación: {str(e)}")
@@ -196,9 +297,7 @@ def save_notification(notification_data: Dict[str, Any]) -> Dict[str, Any]:
 def get_notifications(phone_number: Optional[str] = None) -> List[Dict[str, Any]]:
     """Obtiene notificaciones de la base de datos"""
     try:
-        if phone_number:
-            return [notif for notif in _notifications if notif.get('phone_number') == phone_number]
-        return _notifications
+        return get_backend().get_notifications(phone_key(phone_number))
     except Exception as e:
         logger.error(f"Error obteniendo notificaciones: {str(e)}")
         return []
@@ -206,12 +305,15 @@ def get_notifications(phone_number: Optional[str] = None) -> List[Dict[str, Any]
 def update_notification(notification_id: int, update_data: Dict[str, Any]) -> bool:
     """Actualiza una notificación existente"""
     try:
-        for notification in _notifications:
-            if notification.get('id') == notification_id:
-                notification.update(update_data)
-                logger.info(f"Notificación actualizada: ID {notification_id}")
-                return True
-        return False
+        backend = get_backend()
+        # El estado anterior se lee antes de escribir: los contadores pasan de uno al otro
+        previous = backend.get_notification(notification_id) if 'status' in update_data else None
+        if not backend.update_notification(notification_id, update_data):
+            return False
+        if previous:
+            stats.notification_updated(previous, update_data)
+        logger.info(f"Notificación actualizada: ID {notification_id}")
+        return True
     except Exception as e:
         logger.error(f"Error actualizando notificación: {str(e)}")
         return False
@@ -222,12 +324,18 @@ def update_notification(notification_id: int, update_data: Dict[str, Any]) -> bo
 
 def get_conversation_state(phone_number: str) -> Dict[str, Any]:
     """Obtiene el estado de conversación de un usuario"""
-    return _conversation_states.get(phone_number, {})
+    try:
+        return get_state_backend().get(phone_key(phone_number))
+    except Exception as e:
+        logger.error(f"Error obteniendo estado de conversación: {str(e)}")
+        return {}
 
 def save_conversation_state(phone_number: str, state: Dict[str, Any]) -> bool:
     """Guarda el estado de conversación de un usuario"""
+    phone_number = phone_key(phone_number)
     try:
-        _conversation_states[phone_number] = state
+        get_state_backend().save(phone_number, state)
+        stats.conversation_started(phone_number)
         logger.info(f"Estado de conversación guardado para {phone_number}")
         return True
     except Exception as e:
@@ -236,11 +344,10 @@ def save_conversation_state(phone_number: str, state: Dict[str, Any]) -> bool:
 
 def update_conversation_state(phone_number: str, state: Dict[str, Any]) -> bool:
     """Actualiza el estado de conversación de un usuario"""
+    phone_number = phone_key(phone_number)
     try:
-        if phone_number in _conversation_states:
-            _conversation_states[phone_number].update(state)
-        else:
-            _conversation_states[phone_number] = state
+        get_state_backend().update(phone_number, state)
+        stats.conversation_message(phone_number)
         logger.info(f"Estado de conversación actualizado para {phone_number}")
         return True
     except Exception as e:
@@ -249,8 +356,10 @@ def update_conversation_state(phone_number: str, state: Dict[str, Any]) -> bool:
 
 def create_conversation_state(phone_number: str, state: Dict[str, Any]) -> bool:
     """Crea un nuevo estado de conversación para un usuario"""
+    phone_number = phone_key(phone_number)
     try:
-        _conversation_states[phone_number] = state
+        get_state_backend().save(phone_number, state)
+        stats.conversation_started(phone_number)
         logger.info(f"Nuevo estado de conversación creado para {phone_number}")
         return True
     except Exception as e:
@@ -259,15 +368,35 @@ def create_conversation_state(phone_number: str, state: Dict[str, Any]) -> bool:
 
 def clear_conversation_state(phone_number: str) -> bool:
     """Limpia el estado de conversación de un usuario"""
+    phone_number = phone_key(phone_number)
     try:
-        if phone_number in _conversation_states:
-            del _conversation_states[phone_number]
+        if get_state_backend().clear(phone_number):
+            stats.conversation_cleared(phone_number)
             logger.info(f"Estado de conversación limpiado para {phone_number}")
         return True
     except Exception as e:
         logger.error(f"Error limpiando estado de conversación: {str(e)}")
         return False
 
+def purge_expired_conversation_states() -> int:
+    """Borra los estados de conversación vencidos (job periódico)"""
+    try:
+        removed = get_state_backend().purge_expired()
+        if removed:
+            logger.info(f"Estados de conversación vencidos eliminados: {removed}")
+        return removed
+    except Exception as e:
+        logger.error(f"Error eliminando estados de conversación vencidos: {str(e)}")
+        return 0
+
+def get_conversation_state_stats() -> Dict[str, int]:
+    """Tamaño, aciertos, fallos y desalojos del almacenamiento de estados"""
+    try:
+        return get_state_backend().stats()
+    except Exception as e:
+        logger.error(f"Error obteniendo métricas de estados de conversación: {str(e)}")
+        return {}
+
 # ========================================
 # FUNCIONES DE FEEDBACK
 # ========================================
@@ -275,16 +404,8 @@ def clear_conversation_state(phone_number: str) -> bool:
 def insert_feedback(feedback_data: Dict[str, Any]) -> Dict[str, Any]:
     """Inserta feedback en la base de datos"""
     try:
-        feedback_id = len(_feedback) + 1
-        feedback = {
-            'id': feedback_id,
-            'phone_number': feedback_data.get('phone_number'),
-            'rating': feedback_data.get('rating'),
-            'comment': feedback_data.get('comment'),
-            'created_at': datetime.now().isoformat()
-        }
-        _feedback.append(feedback)
-        logger.info(f"Feedback insertado: ID {feedback_id}")
+        feedback = get_backend().insert_feedback(_with_phone_key(feedback_data))
+        logger.info(f"Feedback insertado: ID {feedback['id']}")
         return feedback
     except Exception as e:
         logger.error(f"Error insertando feedback: {str(e)}")
@@ -293,7 +414,7 @@ def insert_feedback(feedback_data: Dict[str, Any]) -> Dict[str, Any]:
 def get_all_feedback() -> List[Dict[str, Any]]:
     """Obtiene todo el feedback"""
     try:
-        return _feedback
+        return get_backend().get_all_feedback()
     except Exception as e:
         logger.error(f"Error obteniendo feedback: {str(e)}")
         return []
@@ -305,23 +426,112 @@ def get_all_feedback() -> List[Dict[str, Any]]:
 def insert_attachment(attachment_data: Dict[str, Any]) -> Dict[str, Any]:
     """Inserta un adjunto en la base de datos"""
     try:
-        attachment_id = len(_attachments) + 1
-        attachment = {
-            'id': attachment_id,
-            'appointment_id': attachment_data.get('appointment_id'),
-            'phone_number': attachment_data.get('phone_number'),
-            'filename': attachment_data.get('filename'),
-            'file_type': attachment_data.get('file_type'),
-            'file_size': attachment_data.get('file_size'),
-            'created_at': datetime.now().isoformat()
-        }
-        _attachments.append(attachment)
-        logger.info(f"Adjunto insertado: ID {attachment_id}")
+        attachment = get_backend().insert_attachment(_with_phone_key(attachment_data))
+        logger.info(f"Adjunto insertado: ID {attachment['id']}")
         return attachment
     except Exception as e:
         logger.error(f"Error insertando adjunto: {str(e)}")
         return {}
 
+# ========================================
+# LÍNEA DE TIEMPO DEL PACIENTE
+# ========================================
+
+def get_patient_timeline(phone_number: str, after: Optional[Tuple[str, str, int]] = None,
+                         limit: int = 50) -> List[Dict[str, Any]]:
+    """Hasta `limit` eventos del paciente (turnos, notificaciones, feedback, adjuntos y
+    estado de conversación) del más reciente al más antiguo, posteriores al cursor `after`"""
+    try:
+        phone_number = phone_key(phone_number)
+        sources = get_backend().get_patient_events(phone_number, after, limit)
+        entry = get_state_backend().entry(phone_number)
+        if entry:
+            state, updated_at = entry
+            conversation = event('conversation', moment_key(updated_at or datetime.now()), state)
+            if after is None or event_key(conversation) < after:
+                sources.append([conversation])
+        return merge(sources, limit)
+    except Exception as e:
+        logger.error(f"Error obteniendo línea de tiempo del paciente: {str(e)}")
+        return []
+
+# ========================================
+# ARCHIVO DE TURNOS
+# ========================================
+
+def archive_old_appointments(today: Optional[date] = None) -> int:
+    """Mueve al archivo los turnos cerrados anteriores al horizonte ARCHIVE_AFTER_DAYS
+
+    Los turnos con adjuntos vinculados quedan en la tabla activa.
+    Devuelve cuántos turnos se archivaron.
+    """
+    if ARCHIVE_AFTER_DAYS <= 0:
+        return 0
+    try:
+        before = (today or datetime.now().date()) - timedelta(days=ARCHIVE_AFTER_DAYS)
+        count = get_backend().archive_appointments(before, ARCHIVED_STATUSES)
+        if count:
+            # Los turnos archivados pueden estar en cualquier consulta guardada
+            query_cache.clear()
+        logger.info(f"Archivo de turnos: {count} turnos anteriores a {before} archivados")
+        return count
+    except Exception as e:
+        logger.error(f"Error archivando turnos: {str(e)}")
+        return 0
+
+def _reaches_archive(start_date: Any) -> bool:
+    # Sólo una fecha de inicio explícita hasta el turno archivado más reciente lee el archivo.
+    # El límite no se guarda en caché: otro worker puede haber archivado recién
+    if start_date is None:
+        return False
+    until = date_key(get_backend().archived_until())
+    return until is not None and date_key(start_date) <= until
+
+def _with_archived(appointments: List[Dict[str, Any]], start_date: Any, end_date: Any) -> List[Dict[str, Any]]:
+    # Agrega los turnos archivados del rango sólo si el rango llega al archivo
+    if not _reaches_archive(start_date):
+        return appointments
+    archived = list(get_backend().iter_archived_appointments(start_date, end_date))
+    return sorted(appointments + archived, key=order_key) if archived else appointments
+
+# ========================================
+# FUNCIONES DE EXPORTACIÓN
+# ========================================
+
+def _export(label: str, rows: Iterable[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+    # A diferencia del resto, un error a mitad del recorrido se registra y se
+    # propaga: la respuesta ya empezó a enviarse y cortarla es la única forma
+    # de que el cliente no tome una exportación parcial como completa
+    count = 0
+    try:
+        for row in rows:
+            count += 1
+            yield row
+    except Exception as e:
+        logger.error(f"Error exportando {label} tras {count} filas: {str(e)}")
+        raise
+    logger.info(f"Exportación de {label}: {count} filas")
+
+def iter_appointments(start_date: Optional[date] = None, end_date: Optional[date] = None,
+                      status: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """Recorre los turnos en orden (fecha, hora, id) sin cargarlos todos en memoria"""
+    backend = get_backend()
+    rows = backend.iter_appointments(start_date, end_date, status)
+    if _reaches_archive(start_date):
+        rows = heapq.merge(
+            backend.iter_archived_appointments(start_date, end_date, status=status), rows, key=order_key
+        )
+    return _export('turnos', rows)
+
+def iter_notifications(start_date: Optional[date] = None, end_date: Optional[date] = None,
+                       status: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+    """Recorre las notificaciones creadas en el rango sin cargarlas todas en memoria"""
+    return _export('notificaciones', get_backend().iter_notifications(start_date, end_date, status))
+
+def iter_feedback(start_date: Optional[date] = None, end_date: Optional[date] = None) -> Iterator[Dict[str, Any]]:
+    """Recorre el feedback recibido en el rango sin cargarlo todo en memoria"""
+    return _export('feedback', get_backend().iter_feedback(start_date, end_date))
+
 def get_settings() -> Dict[str, Any]:
     """Obtiene configuraciones del sistema"""
     return {
@@ -335,26 +545,27 @@ def get_settings() -> Dict[str, Any]:
 # ========================================
 
 def get_connection():
-    """Obtiene conexión a la base de datos (simulado)"""
-    return None
+    """Obtiene una conexión del pool de PostgreSQL"""
+    from app.db import postgres
+    return postgres.get_connection()
 
 def close_connection(connection):
-    """Cierra la conexión a la base de datos (simulado)"""
-    pass
+    """Devuelve la conexión al pool"""
+    from app.db import postgres
+    postgres.close_connection(connection)
 
 def test_connection() -> bool:
-    """Prueba la conexión a la base de datos (simulado)"""
-    return True
+    """Prueba la conexión a la base de datos"""
+    from app.db import postgres
+    return postgres.test_connection()
 
 def get_appointments_by_date_range(start_date: date, end_date: date) -> List[Dict[str, Any]]:
     """Obtiene turnos en un rango de fechas"""
     try:
-        appointments = []
-        for appointment in _appointments:
-            apt_date = appointment.get('appointment_date')
-            if apt_date and start_date <= apt_date <= end_date:
-                appointments.append(appointment)
-        return appointments
+        return query_cache.get_or_load(
+            ('range', start_date, end_date), range_tags(start_date, end_date),
+            lambda: _with_archived(get_backend().get_appointments_by_date_range(start_date, end_date), start_date, end_date)
+        )
     except Exception as e:
         logger.error(f"Error obteniendo turnos por rango de fechas: {str(e)}")
         return []
@@ -381,21 +592,28 @@ def get_all_users() -> List[Dict[str, Any]]:
     # Implementación simplificada - retorna lista vacía
     return []
 
+def get_query_cache_stats() -> Dict[str, Any]:
+    """Tamaño, aciertos, fallos, tasa de aciertos e invalidaciones de la caché de consultas"""
+    return query_cache.stats()
+
+def get_availability_cache_stats() -> Dict[str, Any]:
+    """Los mismos contadores para la caché de horarios libres por día, con la antigüedad de lo servido"""
+    return availability_cache.stats()
+
 def get_notifications_stats() -> Dict[str, Any]:
-    """Obtiene estadísticas de notificaciones"""
-    # Implementación simplificada
-    return {
-        'total': 0,
-        'sent': 0,
-        'failed': 0,
-        'pending': 0
-    }
+    """Obtiene estadísticas de notificaciones (contadores incrementales, O(1))"""
+    return stats.notifications()
 
 def get_conversation_stats() -> Dict[str, Any]:
-    """Obtiene estadísticas de conversaciones"""
-    # Implementación simplificada
-    return {
-        'total_conversations': 0,
-        'active_conversations': 0,
-        'messages_today': 0
-    }
+    """Obtiene estadísticas de conversaciones (contadores incrementales, O(1))"""
+    return stats.conversations()
+
+def rebuild_stats() -> bool:
+    """Recalcula los contadores del dashboard desde el almacenamiento"""
+    try:
+        stats.rebuild(get_backend().notification_counts(), get_state_backend().activity())
+        logger.info("Estadísticas del dashboard reconstruidas")
+        return True
+    except Exception as e:
+        logger.error(f"Error reconstruyendo estadísticas: {str(e)}")
+        return False
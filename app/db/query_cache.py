@@ -0,0 +1,207 @@
+"""
+Caché de lectura de app/db/queries.py con invalidación por etiquetas
+Las consultas repetidas (agenda del día, semana, horarios) se sirven desde memoria
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, timedelta
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Set
+
+from app.config import AVAILABILITY_CACHE_SIZE, AVAILABILITY_CACHE_TTL, QUERY_CACHE_SIZE, QUERY_CACHE_TTL
+from app.db.store import date_key
+
+# Etiqueta de las consultas sin acotar (todos los turnos, próximos turnos): la invalida cualquier escritura
+ALL_APPOINTMENTS = 'appointments'
+# Rangos más largos que esto se etiquetan como ALL_APPOINTMENTS en lugar de día por día
+MAX_RANGE_TAG_DAYS = 62
+
+
+def day_tag(value: Any) -> str:
+    return f"day:{date_key(value)}"
+
+
+def phone_tag(phone_number: str) -> str:
+    return f"phone:{phone_number}"
+
+
+def appointment_tag(appointment_id: int) -> str:
+    return f"appointment:{appointment_id}"
+
+
+def range_tags(start: Any, end: Any) -> Set[str]:
+    """Etiquetas de un rango de días: una por día, o ALL_APPOINTMENTS si es muy largo"""
+    start, end = date.fromisoformat(date_key(start)), date.fromisoformat(date_key(end))
+    days = (end - start).days + 1
+    if days > MAX_RANGE_TAG_DAYS:
+        return {ALL_APPOINTMENTS}
+    return {day_tag(start + timedelta(days=offset)) for offset in range(max(days, 0))}
+
+
+def appointment_tags(appointment: Optional[Dict[str, Any]]) -> Set[str]:
+    """Etiquetas que toca una escritura sobre `appointment` (su día, su teléfono y su ID)"""
+    if not appointment:
+        return set()
+    tags = {ALL_APPOINTMENTS}
+    if appointment.get('id') is not None:
+        tags.add(appointment_tag(appointment['id']))
+    if appointment.get('appointment_date') is not None:
+        tags.add(day_tag(appointment['appointment_date']))
+    if appointment.get('phone_number') is not None:
+        tags.add(phone_tag(appointment['phone_number']))
+    return tags
+
+
+def _copy(value: Any) -> Any:
+    # Las listas y dicts guardados no se entregan tal cual: quien los recibe puede modificarlos
+    if type(value) is list:
+        return list(value)
+    if type(value) is dict:
+        return dict(value)
+    return value
+
+
+class QueryCache:
+    """Resultados de consultas por (función, argumentos), con etiquetas y desalojo LRU
+
+    Cada entrada lleva las etiquetas de lo que leyó (días, teléfono, ID de
+    turno); una escritura invalida exactamente las entradas con sus
+    etiquetas. Una carga que se cruza con una invalidación no se guarda, así
+    que una lectura anterior a la escritura no reaparece después. El TTL
+    acota lo que puede durar un resultado cuando la escritura ocurre en otro
+    proceso (varios workers sobre la misma base). La antigüedad de lo que se
+    sirve (desde que empezó la carga) se acumula como medida de staleness.
+    Las cachés enlazadas con link() reciben las mismas invalidaciones.
+    """
+
+    def __init__(self, maxsize: int = QUERY_CACHE_SIZE, ttl: float = QUERY_CACHE_TTL, clock=time.monotonic):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._linked: List['QueryCache'] = []
+        self.reset()
+
+    def link(self, other: 'QueryCache'):
+        """Propaga a `other` las invalidaciones y vaciados de esta caché"""
+        self._linked.append(other)
+
+    def reset(self):
+        """Vacía la caché y sus contadores"""
+        with self._lock:
+            self._entries: 'OrderedDict[Hashable, list]' = OrderedDict()  # clave -> [valor, etiquetas, vence, cargado]
+            self._tags: Dict[str, Set[Hashable]] = {}
+            self._generation = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+            self.expirations = 0
+            self.invalidations = 0
+            self.hit_age_total = 0.0
+            self.max_hit_age = 0.0
+        for cache in self._linked:
+            cache.reset()
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0 and self.ttl > 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get_or_load(self, key: Hashable, tags: Iterable[str], loader: Callable[[], Any]) -> Any:
+        """Valor en caché de `key` o el de loader(), que se guarda con `tags`
+
+        Las excepciones de loader() se propagan y no se guarda nada.
+        """
+        if not self.enabled:
+            return loader()
+        with self._lock:
+            now = self._clock()
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                age = now - entry[3]
+                self.hit_age_total += age
+                self.max_hit_age = max(self.max_hit_age, age)
+                return _copy(entry[0])
+            if entry is not None:
+                self._drop(key)
+                self.expirations += 1
+            self.misses += 1
+            generation = self._generation
+        value = loader()
+        with self._lock:
+            if generation == self._generation:
+                self._store(key, value, frozenset(tags), now)
+        return _copy(value)
+
+    def invalidate(self, tags: Iterable[str]) -> int:
+        """Elimina las entradas con alguna de las etiquetas; devuelve cuántas quitó"""
+        removed = 0
+        with self._lock:
+            self._generation += 1
+            for tag in tags:
+                for key in list(self._tags.get(tag, ())):
+                    self._drop(key)
+                    removed += 1
+            self.invalidations += removed
+        for cache in self._linked:
+            cache.invalidate(tags)
+        return removed
+
+    def clear(self):
+        """Elimina todas las entradas (p. ej. al cambiar de backend)"""
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._tags.clear()
+        for cache in self._linked:
+            cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de uso para métricas y diagnóstico"""
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'invalidations': self.invalidations,
+            # Segundos desde que se leyó del backend lo que se sirvió desde caché
+            'avg_hit_age': round(self.hit_age_total / self.hits, 3) if self.hits else 0.0,
+            'max_hit_age': round(self.max_hit_age, 3)
+        }
+
+    def _store(self, key: Hashable, value: Any, tags: frozenset, loaded: float):
+        if key in self._entries:
+            self._drop(key)
+        self._entries[key] = [value, tags, loaded + self.ttl, loaded]
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+        while len(self._entries) > self.maxsize:
+            self._drop(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _drop(self, key: Hashable):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[1]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+
+query_cache = QueryCache()
+
+# Horarios libres por día (app/services/agenda_service.py): se invalida con cada escritura de turnos del día
+availability_cache = QueryCache(AVAILABILITY_CACHE_SIZE, AVAILABILITY_CACHE_TTL)
+query_cache.link(availability_cache)
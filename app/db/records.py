@@ -0,0 +1,165 @@
+"""
+Registro compacto de turno para el almacenamiento en memoria
+Atributos en __slots__ con tipos nativos en lugar de un dict con fechas como texto ISO
+"""
+
+import sys
+from collections.abc import Mapping
+from datetime import date, datetime, time
+from enum import Enum
+from typing import Any, Callable, Dict, Iterator, Optional
+
+from app.config import DEFAULT_APPOINTMENT_MINUTES
+
+# Mismo orden que las columnas de la tabla appointments
+APPOINTMENT_FIELDS = (
+    'id', 'phone_number', 'patient_name', 'appointment_date', 'appointment_time',
+    'professional', 'urgency_level', 'notes', 'status', 'followup_sent', 'attended',
+    'created_at', 'updated_at', 'version', 'duration_minutes'
+)
+_FIELD_SET = frozenset(APPOINTMENT_FIELDS)
+
+
+def _to_date(value: Any) -> Optional[date]:
+    if value is None or value == '':
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def _to_time(value: Any) -> Optional[time]:
+    if value is None or value == '':
+        return None
+    if isinstance(value, datetime):
+        return value.time()
+    if isinstance(value, time):
+        return value
+    return time.fromisoformat(str(value))
+
+
+def _to_datetime(value: Any) -> Optional[datetime]:
+    if value is None or value == '':
+        return None
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime.combine(value, time.min)
+    return datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+
+
+def _to_version(value: Any) -> int:
+    # Los turnos guardados antes de la columna version empiezan en 1, como en SQL
+    return 1 if value is None or value == '' else int(value)
+
+
+def _to_duration(value: Any) -> int:
+    # Los turnos guardados antes de la columna duration_minutes duran lo mismo que el default de SQL
+    return DEFAULT_APPOINTMENT_MINUTES if value is None or value == '' else int(value)
+
+
+def _interned(value: Any) -> Optional[str]:
+    # Teléfonos, estados, urgencias y profesionales se repiten entre turnos: una sola copia de cada texto
+    if value is None:
+        return None
+    if isinstance(value, Enum):
+        value = value.value
+    return sys.intern(str(value))
+
+
+def _as_is(value: Any) -> Any:
+    return value.value if isinstance(value, Enum) else value
+
+
+_COERCE: Dict[str, Callable[[Any], Any]] = {
+    'appointment_date': _to_date,
+    'appointment_time': _to_time,
+    'created_at': _to_datetime,
+    'updated_at': _to_datetime,
+    'version': _to_version,
+    'duration_minutes': _to_duration,
+    'phone_number': _interned,
+    'status': _interned,
+    'urgency_level': _interned,
+    'professional': _interned
+}
+
+
+def _iso(value: Any) -> Optional[str]:
+    if value is None or value == '':
+        return None
+    return value.isoformat() if hasattr(value, 'isoformat') else str(value)
+
+
+def _hour(value: Any) -> Optional[str]:
+    if value is None or value == '':
+        return None
+    if isinstance(value, datetime):
+        value = value.time()
+    if isinstance(value, time):
+        return value.isoformat(timespec='minutes')
+    return str(value)[:5]
+
+
+def appointment_json(appointment: Mapping) -> Dict[str, Any]:
+    """Turno listo para JSON: fechas en ISO, hora 'HH:MM' y enums por su valor
+
+    Acepta cualquier mapeo (filas de SQL, dicts de tests); los registros en
+    memoria lo guardan en caché con AppointmentRecord.as_json().
+    """
+    data = {name: _as_is(appointment.get(name)) for name in APPOINTMENT_FIELDS}
+    data['appointment_date'] = _iso(data['appointment_date'])
+    data['appointment_time'] = _hour(data['appointment_time'])
+    data['created_at'] = _iso(data['created_at'])
+    data['updated_at'] = _iso(data['updated_at'])
+    return data
+
+
+class AppointmentRecord(Mapping):
+    """Turno del almacenamiento en memoria
+
+    Se comporta como un mapeo de sólo lectura (apt['status'], apt.get(...),
+    dict(apt)), así que el resto del código lo usa igual que una fila de SQL.
+    Los valores se normalizan al guardarlos: fecha, hora y marcas de tiempo
+    como date/time/datetime, y los textos repetidos internados. as_json() se
+    calcula una vez por versión del turno; apply() lo invalida.
+    """
+
+    __slots__ = APPOINTMENT_FIELDS + ('_json',)
+
+    def __init__(self, data: Mapping):
+        for name in APPOINTMENT_FIELDS:
+            value = data.get(name)
+            coerce = _COERCE.get(name)
+            setattr(self, name, coerce(value) if coerce else _as_is(value))
+        self._json = None
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in _FIELD_SET:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(APPOINTMENT_FIELDS)
+
+    def __len__(self) -> int:
+        return len(APPOINTMENT_FIELDS)
+
+    def __repr__(self) -> str:
+        return f"AppointmentRecord({dict(self)!r})"
+
+    def apply(self, changes: Mapping):
+        """Aplica cambios a los campos conocidos (el resto se ignora, como en SQL)"""
+        for name, value in changes.items():
+            if name in _FIELD_SET and name != 'id':
+                coerce = _COERCE.get(name)
+                setattr(self, name, coerce(value) if coerce else _as_is(value))
+        self._json = None
+
+    def as_json(self) -> Dict[str, Any]:
+        """Representación JSON en caché; no modificar el dict devuelto"""
+        if self._json is None:
+            self._json = appointment_json(self)
+        return self._json
@@ -0,0 +1,54 @@
+"""
+Backends de estado de conversación
+Se elige con STATE_BACKEND_URL; vacío guarda el estado en el backend de almacenamiento
+"""
+
+import logging
+import threading
+
+from app.config import STATE_BACKEND_URL
+from app.db.state.base import StateBackend, encode_state, decode_state
+from app.db.state.storage import StorageStateBackend
+
+logger = logging.getLogger('asistente_salud')
+
+_state_backend = None
+_state_backend_lock = threading.Lock()
+
+
+def create_state_backend(state_url: str) -> StateBackend:
+    """Crea el backend de estado correspondiente a una URL"""
+    if not state_url:
+        return StorageStateBackend()
+    scheme = state_url.split(':', 1)[0].lower()
+    if scheme in ('redis', 'rediss', 'unix'):
+        from app.db.state.redis import RedisStateBackend
+        return RedisStateBackend(state_url)
+    raise ValueError(f"STATE_BACKEND_URL no soportada: {scheme}://")
+
+
+def get_state_backend() -> StateBackend:
+    """Backend de estado activo; se crea en el primer uso"""
+    global _state_backend
+    if _state_backend is None:
+        with _state_backend_lock:
+            if _state_backend is None:
+                _state_backend = create_state_backend(STATE_BACKEND_URL)
+                logger.info(f"Backend de estado de conversación: {_state_backend.name}")
+    return _state_backend
+
+
+def set_state_backend(backend: StateBackend) -> StateBackend:
+    """Reemplaza el backend de estado activo (tests, scripts de mantenimiento)"""
+    global _state_backend
+    with _state_backend_lock:
+        previous, _state_backend = _state_backend, backend
+    if previous is not None and previous is not backend:
+        previous.close()
+    return backend
+
+
+__all__ = [
+    'StateBackend', 'StorageStateBackend', 'encode_state', 'decode_state',
+    'create_state_backend', 'get_state_backend', 'set_state_backend'
+]
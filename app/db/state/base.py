@@ -0,0 +1,70 @@
+"""
+Interfaz de los backends de estado de conversación
+El estado es un dict JSON por teléfono con vencimiento (TTL)
+"""
+
+import json
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+
+def encode_state(state: Dict[str, Any]) -> str:
+    """Serializa el estado en JSON compacto (sin espacios); fechas y horas como texto"""
+    return json.dumps(state, separators=(',', ':'), ensure_ascii=False, default=str)
+
+
+def decode_state(raw: Optional[Union[str, bytes, Dict[str, Any]]]) -> Dict[str, Any]:
+    """Inverso de encode_state; acepta también el dict ya decodificado (jsonb)"""
+    if not raw:
+        return {}
+    if isinstance(raw, dict):
+        return raw
+    if isinstance(raw, bytes):
+        raw = raw.decode('utf-8')
+    return json.loads(raw)
+
+
+class StateBackend:
+    """Operaciones sobre el estado de conversación
+
+    Igual que StorageBackend, los métodos no capturan excepciones: el manejo
+    de errores y el logging quedan en app/db/queries.py.
+    """
+
+    name = 'base'
+
+    def get(self, phone_number: str) -> Dict[str, Any]:
+        """Estado vigente del teléfono, o {} si no hay o venció"""
+        raise NotImplementedError
+
+    def entry(self, phone_number: str) -> Optional[Tuple[Dict[str, Any], Optional[datetime]]]:
+        """(estado, última actualización) vigente del teléfono, o None; la fecha puede no conocerse"""
+        state = self.get(phone_number)
+        return (state, None) if state else None
+
+    def save(self, phone_number: str, state: Dict[str, Any]):
+        """Reemplaza el estado y renueva su vencimiento"""
+        raise NotImplementedError
+
+    def update(self, phone_number: str, state: Dict[str, Any]):
+        """Combina las claves dadas con el estado vigente y renueva su vencimiento"""
+        raise NotImplementedError
+
+    def clear(self, phone_number: str) -> bool:
+        """Elimina el estado; devuelve si existía"""
+        raise NotImplementedError
+
+    def activity(self) -> List[Tuple[str, datetime]]:
+        """(teléfono, última actualización) de los estados guardados, si se conocen"""
+        return []
+
+    def purge_expired(self) -> int:
+        """Elimina estados vencidos cuando el almacenamiento no lo hace solo"""
+        return 0
+
+    def stats(self) -> Dict[str, int]:
+        """Contadores de uso, si el backend los lleva"""
+        return {}
+
+    def close(self):
+        """Libera recursos del backend"""
@@ -0,0 +1,96 @@
+"""
+Estado de conversación en Redis
+Compartido entre procesos (varios workers de gunicorn); el TTL lo aplica Redis
+"""
+
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Tuple
+
+from app.config import CONVERSATION_STATE_TTL
+from app.db.state.base import StateBackend, encode_state, decode_state
+
+KEY_PREFIX = 'conv:'
+# Claves por vuelta de SCAN (y por pipeline de TTL) al recorrer los estados
+SCAN_BATCH = 500
+
+
+class RedisStateBackend(StateBackend):
+    """Un string JSON compacto por teléfono, con expiración nativa (SET ... EX)"""
+
+    name = 'redis'
+
+    def __init__(self, url: str = None, ttl: float = CONVERSATION_STATE_TTL, client=None):
+        if client is None:
+            try:
+                import redis
+            except ImportError as e:
+                raise RuntimeError("STATE_BACKEND_URL=redis:// requiere el paquete redis (pip install redis)") from e
+            client = redis.Redis.from_url(url, socket_timeout=5, health_check_interval=30)
+        self._client = client
+        self.ttl = max(int(ttl), 1)
+
+    @staticmethod
+    def _key(phone_number: str) -> str:
+        return KEY_PREFIX + phone_number
+
+    def get(self, phone_number: str) -> Dict[str, Any]:
+        return decode_state(self._client.get(self._key(phone_number)))
+
+    def entry(self, phone_number: str):
+        key = self._key(phone_number)
+        raw, remaining = self._client.pipeline(transaction=False).get(key).ttl(key).execute()
+        state = decode_state(raw)
+        if not state:
+            return None
+        # Cada SET renueva el TTL completo: la última escritura fue hace (ttl - restante)
+        updated_at = datetime.now() - timedelta(seconds=self.ttl - remaining) if remaining >= 0 else None
+        return state, updated_at
+
+    def save(self, phone_number: str, state: Dict[str, Any]):
+        self._client.set(self._key(phone_number), encode_state(state), ex=self.ttl)
+
+    def update(self, phone_number: str, state: Dict[str, Any]):
+        key = self._key(phone_number)
+
+        def merge(pipe):
+            current = decode_state(pipe.get(key))
+            current.update(state)
+            pipe.multi()
+            pipe.set(key, encode_state(current), ex=self.ttl)
+
+        # WATCH/MULTI: se reintenta si otro worker modificó la clave en el medio
+        self._client.transaction(merge, key)
+
+    def clear(self, phone_number: str) -> bool:
+        return self._client.delete(self._key(phone_number)) > 0
+
+    def activity(self) -> List[Tuple[str, datetime]]:
+        # SCAN no bloquea a Redis como KEYS; el TTL restante de cada clave da su última escritura
+        now = datetime.now()
+        activity = []
+        batch = []
+        for key in self._client.scan_iter(match=KEY_PREFIX + '*', count=SCAN_BATCH):
+            batch.append(key)
+            if len(batch) == SCAN_BATCH:
+                activity.extend(self._last_writes(batch, now))
+                batch = []
+        activity.extend(self._last_writes(batch, now))
+        return activity
+
+    def _last_writes(self, keys, now: datetime) -> List[Tuple[str, datetime]]:
+        if not keys:
+            return []
+        pipe = self._client.pipeline(transaction=False)
+        for key in keys:
+            pipe.ttl(key)
+        activity = []
+        for key, remaining in zip(keys, pipe.execute()):
+            # -2: la clave venció entre SCAN y TTL; -1: sin vencimiento, no se conoce la fecha
+            if remaining < 0:
+                continue
+            key = key.decode() if isinstance(key, bytes) else key
+            activity.append((key[len(KEY_PREFIX):], now - timedelta(seconds=self.ttl - remaining)))
+        return activity
+
+    def close(self):
+        self._client.close()
@@ -0,0 +1,45 @@
+"""
+Estado de conversación en el backend de almacenamiento principal
+Memoria (TTLCache del proceso) o la tabla conversation_states de PostgreSQL/SQLite
+"""
+
+from typing import Any, Dict
+
+from app.db.state.base import StateBackend
+
+
+class StorageStateBackend(StateBackend):
+    """Delega en el backend activo de app.db.backends
+
+    El backend se resuelve en cada llamada para seguir a set_backend().
+    """
+
+    name = 'storage'
+
+    def _backend(self):
+        from app.db.backends import get_backend
+        return get_backend()
+
+    def get(self, phone_number: str) -> Dict[str, Any]:
+        return self._backend().get_conversation_state(phone_number)
+
+    def entry(self, phone_number: str):
+        return self._backend().get_conversation_state_entry(phone_number)
+
+    def save(self, phone_number: str, state: Dict[str, Any]):
+        self._backend().save_conversation_state(phone_number, state)
+
+    def update(self, phone_number: str, state: Dict[str, Any]):
+        self._backend().update_conversation_state(phone_number, state)
+
+    def clear(self, phone_number: str) -> bool:
+        return self._backend().clear_conversation_state(phone_number)
+
+    def activity(self):
+        return self._backend().conversation_activity()
+
+    def purge_expired(self) -> int:
+        return self._backend().purge_expired_conversation_states()
+
+    def stats(self) -> Dict[str, int]:
+        return self._backend().conversation_state_stats()
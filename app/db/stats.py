@@ -0,0 +1,167 @@
+"""
+Estadísticas del dashboard mantenidas de forma incremental
+Los contadores se actualizan en cada escritura de app/db/queries.py y se leen en O(1)
+"""
+
+import threading
+import time
+from collections import Counter, OrderedDict
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from app.db.backends.base import plain
+from app.db.store import date_key
+
+# Días de historia que se conservan en los buckets diarios
+DAY_BUCKETS = 31
+# Una conversación cuenta como activa si tuvo movimiento en esta ventana (segundos)
+ACTIVE_WINDOW = 30 * 60
+
+# Estados de notificación (EstadoNotificacion) agrupados como los muestra el dashboard
+SENT_STATUSES = ('enviada', 'enviado')
+FAILED_STATUSES = ('fallida', 'fallido')
+PENDING_STATUSES = ('pendiente',)
+
+
+class StatsCollector:
+    """Contadores de notificaciones y conversaciones de este proceso
+
+    - Notificaciones: total por estado y altas por día. Un cambio de estado
+      mueve un contador del estado anterior (leído antes de escribir) al
+      nuevo, así que no se guarda nada por notificación.
+    - Conversaciones: conversaciones iniciadas, mensajes por día y las activas
+      en una ventana deslizante (OrderedDict por última actividad; lo vencido
+      se descarta desde el frente).
+    """
+
+    def __init__(self, active_window: float = ACTIVE_WINDOW, clock=time.time):
+        self.active_window = active_window
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._notifications_by_status: Counter = Counter()
+            self._notifications_by_day: Dict[str, int] = {}
+            self._conversations_started = 0
+            self._messages_by_day: Dict[str, int] = {}
+            self._last_activity: 'OrderedDict[str, float]' = OrderedDict()
+
+    # ========================================
+    # NOTIFICACIONES
+    # ========================================
+
+    def notification_saved(self, notification: Dict[str, Any]):
+        status = plain(notification.get('status')) or 'pendiente'
+        with self._lock:
+            self._notifications_by_status[status] += 1
+            self._bump(self._notifications_by_day, date_key(notification.get('created_at')) or _today())
+
+    def notification_updated(self, previous: Dict[str, Any], changes: Dict[str, Any]):
+        """Mueve el contador del estado de `previous` (la notificación antes del cambio) al nuevo"""
+        if 'status' not in changes:
+            return
+        before = plain(previous.get('status')) or 'pendiente'
+        status = plain(changes['status'])
+        if before == status:
+            return
+        with self._lock:
+            # Siempre se mueve de a pares: el total no cambia aunque la notificación
+            # la haya creado otro worker (su alta no se contó en este proceso)
+            self._notifications_by_status[before] -= 1
+            self._notifications_by_status[status] += 1
+
+    def notifications(self) -> Dict[str, Any]:
+        with self._lock:
+            by_status = {status: count for status, count in self._notifications_by_status.items() if count > 0}
+            return {
+                'total': sum(by_status.values()),
+                'sent': sum(by_status.get(status, 0) for status in SENT_STATUSES),
+                'failed': sum(by_status.get(status, 0) for status in FAILED_STATUSES),
+                'pending': sum(by_status.get(status, 0) for status in PENDING_STATUSES),
+                'by_status': by_status,
+                'today': self._notifications_by_day.get(_today(), 0),
+                'by_day': dict(self._notifications_by_day)
+            }
+
+    # ========================================
+    # CONVERSACIONES
+    # ========================================
+
+    def conversation_started(self, phone_number: str):
+        with self._lock:
+            self._conversations_started += 1
+        self.conversation_message(phone_number)
+
+    def conversation_message(self, phone_number: str, at: Optional[float] = None):
+        at = self._clock() if at is None else at
+        with self._lock:
+            self._bump(self._messages_by_day, datetime.fromtimestamp(at).date().isoformat())
+            if at >= self._last_activity.get(phone_number, 0):
+                self._last_activity[phone_number] = at
+                self._last_activity.move_to_end(phone_number)
+            self._expire_activity()
+
+    def conversation_cleared(self, phone_number: str):
+        with self._lock:
+            self._last_activity.pop(phone_number, None)
+
+    def conversations(self) -> Dict[str, Any]:
+        with self._lock:
+            self._expire_activity()
+            return {
+                'total_conversations': self._conversations_started,
+                'active_conversations': len(self._last_activity),
+                'messages_today': self._messages_by_day.get(_today(), 0),
+                'by_day': dict(self._messages_by_day)
+            }
+
+    # ========================================
+    # RECONSTRUCCIÓN
+    # ========================================
+
+    def rebuild(self, notification_counts: Iterable[Tuple[str, Optional[str], int]],
+                activity: Iterable[Tuple[str, datetime]]):
+        """Recalcula los contadores desde el almacenamiento (al arrancar el proceso)
+
+        `notification_counts` son filas (estado, día, cantidad) ya agrupadas por
+        el backend (ver notification_counts), no las notificaciones una por una.
+        """
+        self.reset()
+        with self._lock:
+            for status, day, count in notification_counts:
+                self._notifications_by_status[plain(status) or 'pendiente'] += count
+                self._bump(self._notifications_by_day, day or _today(), count)
+        for phone_number, updated_at in sorted(activity, key=lambda item: item[1]):
+            with self._lock:
+                self._conversations_started += 1
+            self._touch(phone_number, updated_at.timestamp())
+
+    def _touch(self, phone_number: str, at: float):
+        # Última actividad conocida sin contar un mensaje nuevo
+        with self._lock:
+            self._last_activity[phone_number] = at
+            self._last_activity.move_to_end(phone_number)
+            self._expire_activity()
+
+    def _expire_activity(self):
+        limit = self._clock() - self.active_window
+        while self._last_activity:
+            phone_number, at = next(iter(self._last_activity.items()))
+            if at >= limit:
+                break
+            self._last_activity.popitem(last=False)
+
+    @staticmethod
+    def _bump(buckets: Dict[str, int], day: str, count: int = 1):
+        buckets[day] = buckets.get(day, 0) + count
+        if len(buckets) > DAY_BUCKETS:
+            del buckets[min(buckets)]
+
+
+def _today() -> str:
+    return date.today().isoformat()
+
+
+stats = StatsCollector()
@@ -0,0 +1,352 @@
+"""
+Almacenamiento en memoria con índices secundarios
+Reemplaza las búsquedas lineales sobre listas de la simulación en memoria
+"""
+
+import threading
+from bisect import bisect_left, bisect_right, insort
+from contextlib import contextmanager
+from itertools import islice
+from datetime import date, datetime, time
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from app.db.errors import SlotUnavailableError, VersionConflictError
+from app.db.intervals import IntervalIndex, appointment_interval
+from app.db.locks import IdAllocator, StripedLock, day_stripe, phone_stripe
+from app.db.records import AppointmentRecord
+from app.db.timeline import PhoneIndex, appointment_moment
+
+
+def date_key(value: Any) -> Optional[str]:
+    """Normaliza una fecha (date, datetime o ISO) a la clave 'YYYY-MM-DD' del índice"""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.date().isoformat()
+    if isinstance(value, date):
+        return value.isoformat()
+    return str(value)[:10]
+
+
+def time_key(value: Any) -> Optional[str]:
+    """Normaliza una hora (time, datetime o 'HH:MM[:SS]') a la clave 'HH:MM'"""
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.time().isoformat(timespec='minutes')
+    if isinstance(value, time):
+        return value.isoformat(timespec='minutes')
+    return str(value)[:5]
+
+
+def order_key(appointment: Dict[str, Any]) -> Tuple[str, str, int]:
+    """Clave (fecha, hora, id) del orden de los listados y de la paginación por cursor"""
+    return (
+        date_key(appointment.get('appointment_date')) or '',
+        time_key(appointment.get('appointment_time')) or '',
+        appointment['id']
+    )
+
+
+def _awaits_followup(appointment: Dict[str, Any]) -> bool:
+    return appointment.get('status') == 'confirmado' and not appointment.get('followup_sent')
+
+
+class DateIndex:
+    """IDs de turnos agrupados por día, con los días en una lista ordenada
+
+    Los rangos y las consultas "antes de" se resuelven con bisect sobre la
+    lista de días: O(log d + k), con d días distintos y k turnos devueltos,
+    sin recorrer el historial completo. Los turnos sin fecha van al día ''
+    (ordena antes que cualquier fecha) y sólo aparecen sin límites.
+    Quien escribe un día tiene su franja (ver AppointmentStore); la lista de
+    días, compartida entre franjas, tiene su propio lock. Las lecturas no
+    toman locks: copian cada día antes de recorrerlo.
+    """
+
+    def __init__(self):
+        self._days: Dict[str, Dict[int, None]] = {}
+        self._sorted: List[str] = []
+        self._lock = threading.Lock()
+
+    def add(self, day: Optional[str], appointment_id: int):
+        day = day or ''
+        bucket = self._days.get(day)
+        if bucket is None:
+            bucket = {}
+            with self._lock:
+                insort(self._sorted, day)
+                self._days[day] = bucket
+        bucket[appointment_id] = None
+
+    def remove(self, day: Optional[str], appointment_id: int):
+        day = day or ''
+        bucket = self._days.get(day)
+        if bucket is None:
+            return
+        bucket.pop(appointment_id, None)
+        if not bucket:
+            with self._lock:
+                del self._days[day]
+                del self._sorted[bisect_left(self._sorted, day)]
+
+    def day(self, day: Optional[str]) -> List[int]:
+        """IDs de un día en orden de inserción"""
+        return list(self._days.get(day or '', ()))
+
+    def days(self, start: Optional[str] = None, end: Optional[str] = None,
+             before: Optional[str] = None) -> Iterator[str]:
+        """Días ordenados con start <= día <= end y día < before"""
+        if start is None and end is None and before is None:
+            position = 0
+        else:
+            position = bisect_left(self._sorted, start) if start else bisect_right(self._sorted, '')
+        # Sin copiar la lista: una página puede cortar en los primeros días. Cada
+        # paso se ubica con bisect a partir del día anterior, así un recorrido
+        # largo (una exportación) no salta ni repite días si se agregan otros.
+        while True:
+            # Un slice y no un índice: otro hilo puede quitar días entre la comparación y la lectura
+            following = self._sorted[position:position + 1]
+            if not following:
+                return
+            day = following[0]
+            if (end is not None and day > end) or (before is not None and day >= before):
+                return
+            yield day
+            position = bisect_right(self._sorted, day)
+
+    def range(self, start: Optional[str] = None, end: Optional[str] = None,
+              before: Optional[str] = None) -> Iterator[int]:
+        """IDs ordenados por día con start <= día <= end y día < before"""
+        for day in list(self.days(start, end, before)):
+            yield from self.day(day)
+
+
+class AppointmentStore:
+    """Turnos en memoria (AppointmentRecord) indexados por ID, teléfono, fecha y estado
+
+    Cada índice secundario guarda los IDs en orden de inserción, de modo que
+    las consultas devuelven los turnos en el mismo orden que la lista original.
+    Los índices por fecha y por estado son DateIndex: además del acceso por
+    día, resuelven rangos de fechas ordenados con bisect.
+    El índice de intervalos reserva [hora, hora + duración) por día y
+    profesional de forma atómica: un alta o cambio que se solapa con un
+    turno activo lanza SlotUnavailableError (ver app/db/intervals.py).
+    La línea de tiempo ordena los turnos de cada teléfono por fecha y hora
+    para recorrerlos del más reciente al más antiguo (ver app/db/timeline.py).
+
+    Cada escritura toma las franjas (StripedLock) de su teléfono y de su día,
+    que cubren los índices de ese paciente y los horarios de ese día: altas
+    y cambios de pacientes y días distintos no se esperan entre sí. Las
+    lecturas no toman locks; resuelven IDs sobre copias de los índices y
+    omiten los turnos borrados entretanto.
+    """
+
+    def __init__(self, stripes: Optional[StripedLock] = None):
+        self._by_id: Dict[int, AppointmentRecord] = {}
+        self._by_phone: Dict[str, Dict[int, None]] = {}
+        self._by_date = DateIndex()
+        self._by_status: Dict[str, DateIndex] = {}
+        # Equivalente al índice parcial idx_appointments_followup_pending
+        self._followup_pending = DateIndex()
+        self._intervals = IntervalIndex()
+        self._timeline = PhoneIndex(appointment_moment)
+        self.ids = IdAllocator()
+        self.stripes = stripes or StripedLock()
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def next_id(self) -> int:
+        """Reserva el próximo ID de turno"""
+        return self.ids.next()
+
+    @staticmethod
+    def stripe_keys(appointment: Optional[Dict[str, Any]], changes: Optional[Dict[str, Any]] = None) -> Set[tuple]:
+        """Franjas que toca escribir `appointment`: su teléfono y su día, antes y después de `changes`"""
+        keys = set()
+        if appointment is None:
+            return keys
+        for data in (appointment, dict(appointment, **changes) if changes else None):
+            if data is not None:
+                keys.add(phone_stripe(data.get('phone_number')))
+                keys.add(day_stripe(date_key(data.get('appointment_date'))))
+        return keys
+
+    @contextmanager
+    def locking(self, appointment_id: int, changes: Optional[Dict[str, Any]] = None) -> Iterator[Optional[AppointmentRecord]]:
+        """Toma las franjas de un turno existente y lo entrega (None si no existe)
+
+        Si otro hilo le cambia el teléfono o el día mientras se esperan los
+        locks, se liberan y se vuelven a pedir los de los valores nuevos.
+        """
+        while True:
+            keys = self.stripe_keys(self._by_id.get(appointment_id), changes)
+            with self.stripes.holding(*keys):
+                appointment = self._by_id.get(appointment_id)
+                if self.stripe_keys(appointment, changes) == keys:
+                    yield appointment
+                    return
+
+    def insert(self, appointment: Dict[str, Any]) -> AppointmentRecord:
+        """Agrega un turno (con 'id' ya asignado) y lo indexa como AppointmentRecord"""
+        if not isinstance(appointment, AppointmentRecord):
+            appointment = AppointmentRecord(appointment)
+        appointment_id = appointment['id']
+        with self.stripes.holding(*self.stripe_keys(appointment)):
+            self._claim(appointment, appointment_id)
+            self._by_id[appointment_id] = appointment
+            self.ids.observe(appointment_id)
+            self._index(appointment)
+        return appointment
+
+    def get(self, appointment_id: int) -> Optional[AppointmentRecord]:
+        """Obtiene un turno por ID en O(1)"""
+        return self._by_id.get(appointment_id)
+
+    def update(self, appointment_id: int, changes: Dict[str, Any],
+               expected_version: Optional[int] = None) -> Optional[AppointmentRecord]:
+        """Aplica cambios a un turno, incrementa su versión y reindexa los campos modificados
+
+        Con `expected_version`, lanza VersionConflictError si el turno tiene otra versión.
+        """
+        with self.locking(appointment_id, changes) as appointment:
+            if appointment is None:
+                return None
+            if expected_version is not None and appointment.version != expected_version:
+                raise VersionConflictError(
+                    f"Turno {appointment_id} en versión {appointment.version}, se esperaba {expected_version}"
+                )
+            self._claim(dict(appointment, **changes), appointment_id)
+            self._unindex(appointment)
+            appointment.apply(dict(changes, version=appointment.version + 1))
+            self._index(appointment)
+        return appointment
+
+    def delete(self, appointment_id: int) -> bool:
+        """Elimina un turno y sus entradas en los índices"""
+        with self.locking(appointment_id) as appointment:
+            if appointment is None:
+                return False
+            del self._by_id[appointment_id]
+            self._unindex(appointment)
+        return True
+
+    def all(self) -> List[AppointmentRecord]:
+        """Todos los turnos en orden de inserción"""
+        return list(self._by_id.values())
+
+    def by_phone(self, phone_number: str) -> List[AppointmentRecord]:
+        """Turnos de un teléfono"""
+        return self._resolve(self._by_phone.get(phone_number, ()))
+
+    def by_date(self, value: Any) -> List[AppointmentRecord]:
+        """Turnos de una fecha (acepta date o cadena ISO)"""
+        return self._resolve(self._by_date.day(date_key(value)))
+
+    def by_date_range(self, start: Any = None, end: Any = None, before: Any = None) -> List[AppointmentRecord]:
+        """Turnos ordenados por fecha entre start y end (inclusive) y anteriores a before"""
+        return self._resolve(self._by_date.range(date_key(start), date_key(end), date_key(before)))
+
+    def by_status(self, status: str, before: Any = None) -> List[AppointmentRecord]:
+        """Turnos con un estado dado ordenados por fecha, opcionalmente anteriores a before"""
+        index = self._by_status.get(status)
+        if index is None:
+            return []
+        return self._resolve(index.range(before=date_key(before)))
+
+    def page(self, after: Optional[Tuple[str, str, int]] = None, limit: int = 50,
+             start: Any = None, end: Any = None, status: Optional[str] = None) -> List[AppointmentRecord]:
+        """Hasta `limit` turnos posteriores al cursor `after` en orden (fecha, hora, id)"""
+        return list(islice(self.scan(after, start, end, status), limit))
+
+    def scan(self, after: Optional[Tuple[str, str, int]] = None, start: Any = None, end: Any = None,
+             status: Optional[str] = None) -> Iterator[AppointmentRecord]:
+        """Recorre los turnos posteriores al cursor `after` en orden (fecha, hora, id)
+
+        Avanza día por día desde el del cursor y ordena sólo los turnos del
+        día en curso: una página cuesta según su tamaño y una exportación
+        completa retiene a lo sumo un día a la vez, no el total de turnos.
+        """
+        index = self._by_date if status is None else self._by_status.get(status)
+        if index is None:
+            return
+        low = date_key(start)
+        if after is not None and (low is None or after[0] > low):
+            low = after[0]
+        for day in index.days(low, date_key(end)):
+            for appointment in sorted(self._resolve(index.day(day)), key=order_key):
+                if after is not None and order_key(appointment) <= after:
+                    continue
+                yield appointment
+
+    def timeline(self, phone_number: str, below: Optional[Tuple[str, float]] = None) -> Iterator[Tuple[str, AppointmentRecord]]:
+        """(instante, turno) del teléfono con (instante, id) menor que `below`, del más reciente al más antiguo"""
+        return self._timeline.newest(phone_number, below)
+
+    def followup_pending(self, before: Any) -> List[AppointmentRecord]:
+        """Turnos confirmados anteriores a before sin mensaje de seguimiento"""
+        return self._resolve(self._followup_pending.range(before=date_key(before)))
+
+    def overlapping(self, appointment: Dict[str, Any], exclude_id: Optional[int] = None) -> Optional[int]:
+        """ID de un turno activo que se solapa con el horario de `appointment`, en O(log n)"""
+        interval = appointment_interval(appointment)
+        return self._intervals.conflict(*interval, exclude_id=exclude_id) if interval else None
+
+    def last_for_phone(self, phone_number: str) -> Optional[AppointmentRecord]:
+        """Último turno creado para un teléfono (los IDs crecen con created_at)"""
+        for appointment_id in reversed(list(self._by_phone.get(phone_number, ()))):
+            appointment = self._by_id.get(appointment_id)
+            if appointment is not None:
+                return appointment
+        return None
+
+    def clear(self):
+        """Vacía el almacenamiento y sus índices"""
+        self.__init__(self.stripes)
+
+    def _resolve(self, ids: Iterable[int]) -> List[AppointmentRecord]:
+        # list(ids) copia el índice de una vez; un turno borrado después de la copia se omite
+        by_id = self._by_id
+        return [appointment for appointment in map(by_id.get, list(ids)) if appointment is not None]
+
+    def _claim(self, appointment: Dict[str, Any], appointment_id: int):
+        owner = self.overlapping(appointment, exclude_id=appointment_id)
+        if owner is not None:
+            raise SlotUnavailableError(f"Horario ocupado por el turno {owner}")
+
+    def _index(self, appointment: Dict[str, Any]):
+        appointment_id = appointment['id']
+        phone = appointment.get('phone_number')
+        if phone is not None:
+            self._by_phone.setdefault(phone, {})[appointment_id] = None
+            self._timeline.add(phone, appointment)
+        day = date_key(appointment.get('appointment_date'))
+        self._by_date.add(day, appointment_id)
+        status = appointment.get('status')
+        if status is not None:
+            self._by_status.setdefault(status, DateIndex()).add(day, appointment_id)
+        if _awaits_followup(appointment):
+            self._followup_pending.add(day, appointment_id)
+        interval = appointment_interval(appointment)
+        if interval:
+            self._intervals.add(*interval, appointment_id)
+
+    def _unindex(self, appointment: Dict[str, Any]):
+        appointment_id = appointment['id']
+        interval = appointment_interval(appointment)
+        if interval:
+            self._intervals.remove(*interval, appointment_id)
+        phone = appointment.get('phone_number')
+        bucket = self._by_phone.get(phone)
+        if bucket is not None:
+            bucket.pop(appointment_id, None)
+            if not bucket:
+                del self._by_phone[phone]
+        self._timeline.remove(phone, appointment)
+        day = date_key(appointment.get('appointment_date'))
+        self._by_date.remove(day, appointment_id)
+        status_index = self._by_status.get(appointment.get('status'))
+        if status_index is not None:
+            status_index.remove(day, appointment_id)
+        self._followup_pending.remove(day, appointment_id)
@@ -0,0 +1,150 @@
+"""
+Línea de tiempo de un paciente
+Turnos, notificaciones, feedback, adjuntos y estado de conversación en un solo flujo ordenado
+"""
+
+import heapq
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, time
+from itertools import islice
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from app.db.records import appointment_json
+
+# Tipos de evento; el orden alfabético desempata eventos del mismo instante
+EVENT_TYPES = ('appointment', 'attachment', 'conversation', 'feedback', 'notification')
+
+# Clave de orden de un evento: (instante ISO con microsegundos, tipo, id)
+EventKey = Tuple[str, str, int]
+
+
+def moment_key(value: Any) -> str:
+    """Instante como texto ISO de ancho fijo ('YYYY-MM-DDTHH:MM:SS.ffffff'), que ordena como el tiempo"""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value.replace(' ', 'T'))
+    elif not isinstance(value, datetime) and isinstance(value, date):
+        value = datetime.combine(value, time.min)
+    return value.replace(tzinfo=None).isoformat(timespec='microseconds')
+
+
+def appointment_moment(appointment: Dict[str, Any]) -> Optional[str]:
+    """Instante de un turno: su fecha y hora (no la de creación); None si no tiene fecha"""
+    day = appointment.get('appointment_date')
+    hour = appointment.get('appointment_time')
+    if day is None or day == '':
+        return None
+    if isinstance(day, str):
+        day = date.fromisoformat(day[:10])
+    if isinstance(hour, str):
+        hour = time.fromisoformat(hour)
+    return moment_key(datetime.combine(day, hour or time.min))
+
+
+def created_moment(record: Dict[str, Any]) -> str:
+    return moment_key(record['created_at'])
+
+
+def event(kind: str, moment: str, record: Dict[str, Any]) -> Dict[str, Any]:
+    return {'type': kind, 'at': moment, 'id': record.get('id') or 0, 'data': record}
+
+
+def events(kind: str, pairs: Iterable[Tuple[str, Dict[str, Any]]]) -> Iterator[Dict[str, Any]]:
+    """Eventos de `kind` a partir de pares (instante, registro)"""
+    for moment, record in pairs:
+        yield event(kind, moment, record)
+
+
+def event_key(item: Dict[str, Any]) -> EventKey:
+    return item['at'], item['type'], item['id']
+
+
+def bound(kind: str, after: Optional[EventKey]) -> Optional[Tuple[str, float]]:
+    """Cota (instante, id) exclusiva para los eventos de `kind` posteriores al cursor
+
+    El recorrido va del más reciente al más antiguo, así que "posterior al
+    cursor" es "menor que su clave". Como el tipo desempata, para los tipos
+    que ordenan antes que el del cursor entra también su mismo instante.
+    """
+    if after is None:
+        return None
+    moment, after_kind, after_id = after
+    if kind < after_kind:
+        return moment, float('inf')
+    if kind == after_kind:
+        return moment, after_id
+    return moment, float('-inf')
+
+
+def _plain(value: Any) -> Any:
+    return value.isoformat() if isinstance(value, (date, time)) else value
+
+
+def event_json(item: Dict[str, Any],
+               format_appointment: Optional[Callable[[Dict[str, Any]], Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """Evento listo para JSON, con los datos del registro en ISO
+
+    `format_appointment` reemplaza la representación por defecto de los turnos
+    (la de appointment_json), p. ej. por la respuesta de la API.
+    """
+    data = item['data']
+    if item['type'] == 'appointment':
+        if format_appointment is not None:
+            data = format_appointment(data)
+        else:
+            data = data.as_json() if hasattr(data, 'as_json') else appointment_json(data)
+    else:
+        data = {key: _plain(value) for key, value in data.items()}
+    return {'type': item['type'], 'at': item['at'], 'id': item['id'], 'data': data}
+
+
+def merge(sources: Iterable[Iterable[Dict[str, Any]]], limit: int) -> List[Dict[str, Any]]:
+    """Mezcla fuentes ya ordenadas de la más reciente a la más antigua y corta en `limit`"""
+    return list(islice(heapq.merge(*sources, key=event_key, reverse=True), limit))
+
+
+class PhoneIndex:
+    """Registros de cada teléfono ordenados por (instante, id)
+
+    Los altas en orden de creación se agregan al final en O(1); newest()
+    ubica el cursor con bisect y recorre hacia atrás sólo lo que devuelve.
+    Cada teléfono es una sola lista de (instante, id, registro): newest()
+    recorre una copia, así una lectura no ve un alta o baja a medias aunque
+    otro hilo escriba en el mismo teléfono (quien escribe tiene su franja).
+    """
+
+    def __init__(self, moment: Callable[[Dict[str, Any]], str]):
+        self._moment = moment
+        self._entries: Dict[str, List[Tuple[str, int, Dict[str, Any]]]] = {}
+
+    def add(self, phone_number: Optional[str], record: Dict[str, Any]):
+        moment = self._moment(record) if phone_number is not None else None
+        if moment is None:
+            return
+        key = (moment, record['id'])
+        entries = self._entries.setdefault(phone_number, [])
+        # (instante, id) ordena justo antes de la entrada con la misma clave: nunca se comparan registros
+        entries.insert(bisect_right(entries, key), key + (record,))
+
+    def remove(self, phone_number: Optional[str], record: Dict[str, Any]):
+        entries = self._entries.get(phone_number)
+        moment = self._moment(record) if entries else None
+        if moment is None:
+            return
+        key = (moment, record['id'])
+        position = bisect_left(entries, key)
+        if position < len(entries) and entries[position][:2] == key:
+            del entries[position]
+            if not entries:
+                del self._entries[phone_number]
+
+    def newest(self, phone_number: str, below: Optional[Tuple[str, float]] = None) -> Iterator[Tuple[str, Dict[str, Any]]]:
+        """(instante, registro) del teléfono con clave menor que `below`, del más reciente al más antiguo"""
+        entries = list(self._entries.get(phone_number, ()))
+        if not entries:
+            return
+        position = bisect_left(entries, below) if below is not None else len(entries)
+        for index in range(position - 1, -1, -1):
+            yield entries[index][0], entries[index][2]
+
+    def clear(self):
+        self._entries.clear()
@@ -1,5 +1,5 @@
 from flask import Blueprint, request, Response, render_template_string
-from app.db.queries import get_upcoming_appointments, get_past_unattended_appointments, get_all_feedback
+from app.db.queries import get_upcoming_appointments, get_absent_appointments, get_all_feedback
 from datetime import datetime
 import os
 
@@ -34,28 +34,18 @@ def requires_auth(f):
 @requires_auth
 def admin():
     """Ruta protegida que muestra turnos futuros, ausencias y feedback en tabla HTML."""
-    now = datetime.now()
-    # Obtener todos los turnos futuros
-    conn = None
-    try:
-        from app.db.postgres import get_connection
-        conn = get_connection()
-        c = conn.cursor()
-        c.execute("SELECT patient_name, phone_number, appointment_date, status FROM appointments WHERE appointment_date > %s ORDER BY appointment_date ASC", (now,))
-        futuros = c.fetchall()
-        c.execute("SELECT patient_name, phone_number, appointment_date FROM appointments WHERE status = 'confirmado' AND appointment_date < %s AND (attended IS NULL OR attended = FALSE)", (now,))
-        ausentes = c.fetchall()
-        # Obtener feedback
-        feedbacks = get_all_feedback()
-    finally:
-        if conn:
-            conn.close()
+    # Turnos futuros y ausencias salen de los índices de turnos activos: no leen el archivo.
+    # Los ausentes siguen listados después de que el job les envía el seguimiento
+    futuros = get_upcoming_appointments()
+    ausentes = get_absent_appointments(datetime.now().date())
+    # Obtener feedback
+    feedbacks = get_all_feedback()
     html = '''
     <h2>Turnos futuros</h2>
     <table border="1">
         <tr><th>Nombre</th><th>Teléfono</th><th>Fecha</th><th>Estado</th></tr>
         {% for t in futuros %}
-        <tr><td>{{t[0]}}</td><td>{{t[1]}}</td><td>{{t[2]}}</td><td>{{t[3]}}</td></tr>
+        <tr><td>{{t.patient_name}}</td><td>{{t.phone_number}}</td><td>{{t.appointment_date}}</td><td>{{t.status}}</td></tr>
         {% endfor %}
     </table>
     
@@ -63,7 +53,7 @@ def admin():
     <table border="1">
         <tr><th>Nombre</th><th>Teléfono</th><th>Fecha</th></tr>
         {% for a in ausentes %}
-        <tr><td>{{a[0]}}</td><td>{{a[1]}}</td><td>{{a[2]}}</td></tr>
+        <tr><td>{{a.patient_name}}</td><td>{{a.phone_number}}</td><td>{{a.appointment_date}}</td></tr>
         {% endfor %}
     </table>
     
@@ -71,7 +61,7 @@ def admin():
     <table border="1">
         <tr><th>Nombre</th><th>Teléfono</th><th>Fecha</th><th>Mensaje</th></tr>
         {% for f in feedbacks %}
-        <tr><td>{{f[0]}}</td><td>{{f[1]}}</td><td>{{f[2]}}</td><td>{{f[3]}}</td></tr>
+        <tr><td>{{f.patient_name}}</td><td>{{f.phone_number}}</td><td>{{f.created_at}}</td><td>{{f.comment}}</td></tr>
         {% endfor %}
     </table>
     '''
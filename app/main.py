@@ -12,6 +12,8 @@ from app.config import (
 from app.logging_config import setup_logging
 from app.routes import webhook_bp, dashboard_bp, api_bp
 from app.utils.error_handler import ErrorHandler
+from app.db.queries import rebuild_stats
+from app.services import agenda_service
 
 def create_app():
     """
@@ -31,6 +33,12 @@ def create_app():
     if not validate_config():
         logger.warning("⚠️  Configuración incompleta. Algunas funciones pueden no funcionar correctamente.")
     
+    # Contadores del dashboard a partir de lo ya almacenado
+    rebuild_stats()
+    
+    # Horarios libres de los próximos días en caché antes de la primera consulta
+    agenda_service.warm_availability()
+    
     # Registrar manejador global de errores
     app.register_error_handler(Exception, ErrorHandler.handle_exception)
     
@@ -8,14 +8,59 @@ import logging
 from datetime import datetime, date
 from app.services import agenda_service, notification_service, ai_service
 from app.schemas import TurnoCreate, TurnoUpdate, NotificacionCreate
-from app.utils.validators import is_valid_phone
-from app.config import CLINIC_NAME
+from app.utils.phone import normalize_phone
+from app.utils.pagination import decode_cursor, decode_event_cursor, parse_limit
+from app.config import CLINIC_NAME, MAX_APPOINTMENT_MINUTES, AVAILABILITY_SEARCH_DAYS
+from app.db.queries import get_availability_cache_stats, get_query_cache_stats
 
 logger = logging.getLogger('asistente_salud')
 
 # Crear blueprint para API
 api_bp = Blueprint('api', __name__, url_prefix='/api/v1')
 
+def _version(value):
+    """Versión de turno enviada por el cliente, o None si no es un entero positivo"""
+    if isinstance(value, bool) or not isinstance(value, int) or value < 1:
+        return None
+    return value
+
+def _duration(value):
+    """Duración de turno enviada por el cliente, o None si no es un entero entre 5 y MAX_APPOINTMENT_MINUTES"""
+    if isinstance(value, str) and value.isdigit():
+        value = int(value)
+    if isinstance(value, bool) or not isinstance(value, int) or not 5 <= value <= MAX_APPOINTMENT_MINUTES:
+        return None
+    return value
+
+def _error_status(result):
+    """Código HTTP de una operación fallida: 409 si el turno cambió desde que el cliente lo leyó"""
+    return 409 if result.get('error') == 'VERSION_CONFLICT' else 400
+
+# Horarios que devuelve como máximo /available-slots/next
+MAX_NEXT_SLOTS = 50
+
+def _slot_constraints(args):
+    """Filtros de /available-slots/next a partir de los parámetros; ValueError si alguno es inválido"""
+    constraints = {}
+    if args.get('professional'):
+        constraints['professional'] = args['professional']
+    if args.get('weekdays'):
+        weekdays = {int(day) for day in args['weekdays'].split(',')}
+        if not weekdays <= set(range(7)):
+            raise ValueError('weekdays')
+        constraints['weekdays'] = weekdays
+    for param, key in (('after', 'earliest'), ('before', 'latest')):
+        if args.get(param):
+            constraints[key] = datetime.strptime(args[param], '%H:%M').strftime('%H:%M')
+    if args.get('days'):
+        # Acotado como la búsqueda por defecto: un rango enorme no encuentra más, sólo tarda más
+        constraints['max_days'] = min(max(1, int(args['days'])), AVAILABILITY_SEARCH_DAYS)
+    if args.get('duration'):
+        constraints['duration'] = _duration(args['duration'])
+        if constraints['duration'] is None:
+            raise ValueError('duration')
+    return constraints
+
 @api_bp.route('/health', methods=['GET'])
 def health_check():
     """Health check de la API"""
@@ -34,6 +79,18 @@ def health_check():
             'error': str(e)
         }), 500
 
+@api_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Métricas de las cachés de este proceso: tasa de aciertos y antigüedad de lo servido"""
+    try:
+        return jsonify({
+            'query_cache': get_query_cache_stats(),
+            'availability_cache': get_availability_cache_stats()
+        })
+    except Exception as e:
+        logger.error(f"Error obteniendo métricas: {str(e)}", exc_info=True)
+        return jsonify({'error': str(e)}), 500
+
 @api_bp.route('/appointments', methods=['GET'])
 def get_appointments():
     """Obtener turnos con filtros"""
@@ -42,8 +99,19 @@ def get_appointments():
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date')
         phone_number = request.args.get('phone_number')
+        if phone_number:
+            phone_number = normalize_phone(phone_number)
+            if not phone_number:
+                return jsonify({'error': 'Número de teléfono inválido'}), 400
         status = request.args.get('status')
         
+        # Paginación por cursor: ?limit=N&cursor=<next_cursor de la página anterior>
+        try:
+            limit = parse_limit(request.args.get('limit'))
+            after = decode_cursor(request.args.get('cursor'))
+        except ValueError:
+            return jsonify({'error': 'Parámetros de paginación inválidos (limit, cursor)'}), 400
+        
         # Validar parámetros
         if start_date:
             try:
@@ -57,25 +125,28 @@ def get_appointments():
             except ValueError:
                 return jsonify({'error': 'Formato de fecha inválido (YYYY-MM-DD)'}), 400
         
-        # Obtener turnos según filtros
-        if phone_number:
-            appointments = agenda_service.get_appointments_by_phone(phone_number)
-        elif start_date and end_date:
-            appointments = agenda_service.get_appointments_by_date_range(start_date, end_date)
-        elif start_date:
-            appointments = agenda_service.get_appointments_by_date(start_date)
-        else:
+        if not (phone_number or start_date):
             # Sin filtros, devolver error
             return jsonify({'error': 'Se requiere al menos un filtro (start_date, end_date, phone_number)'}), 400
         
-        # Filtrar por estado si se especifica
-        if status:
-            appointments = [apt for apt in appointments if apt.get('status') == status]
+        # Sólo start_date: los turnos de ese día
+        if start_date and not end_date and not phone_number:
+            end_date = start_date
+        
+        # Obtener la página de turnos según filtros (el estado se filtra en la consulta)
+        page = agenda_service.get_appointments_page(
+            after, limit, start_date=start_date, end_date=end_date,
+            phone_number=phone_number, status=status
+        )
+        appointments = page['appointments']
         
         return jsonify({
             'success': True,
             'appointments': appointments,
-            'total': len(appointments)
+            # Cantidad de esta página, no el total de turnos que cumplen el filtro
+            'count': len(appointments),
+            'limit': limit,
+            'next_cursor': page['next_cursor']
         })
         
     except Exception as e:
@@ -100,8 +171,9 @@ def create_appointment():
             if field not in data:
                 return jsonify({'error': f'Campo requerido: {field}'}), 400
         
-        # Validar número de teléfono
-        if not is_valid_phone(data['phone_number']):
+        # Validar y normalizar número de teléfono (E.164)
+        phone_number = normalize_phone(data['phone_number'])
+        if not phone_number:
             return jsonify({'error': 'Número de teléfono inválido'}), 400
         
         # Crear objeto TurnoCreate
@@ -111,11 +183,19 @@ def create_appointment():
         except ValueError:
             return jsonify({'error': 'Formato de fecha/hora inválido'}), 400
         
+        duration = None
+        if 'duration_minutes' in data:
+            duration = _duration(data['duration_minutes'])
+            if duration is None:
+                return jsonify({'error': f'Duración inválida (5 a {MAX_APPOINTMENT_MINUTES} minutos)'}), 400
+        
         turno_data = TurnoCreate(
-            phone_number=data['phone_number'],
+            phone_number=phone_number,
             patient_name=data.get('patient_name'),
             appointment_date=appointment_date,
             appointment_time=appointment_time,
+            professional=data.get('professional') or None,
+            duration_minutes=duration,
             urgency_level=data.get('urgency_level'),
             notes=data.get('notes')
         )
@@ -176,9 +256,10 @@ def update_appointment(appointment_id):
         update_data = TurnoUpdate()
         
         if 'phone_number' in data:
-            if not is_valid_phone(data['phone_number']):
+            phone_number = normalize_phone(data['phone_number'])
+            if not phone_number:
                 return jsonify({'error': 'Número de teléfono inválido'}), 400
-            update_data.phone_number = data['phone_number']
+            update_data.phone_number = phone_number
         
         if 'patient_name' in data:
             update_data.patient_name = data['patient_name']
@@ -195,6 +276,14 @@ def update_appointment(appointment_id):
             except ValueError:
                 return jsonify({'error': 'Formato de hora inválido (HH:MM)'}), 400
         
+        if 'professional' in data:
+            update_data.professional = data['professional'] or None
+        
+        if 'duration_minutes' in data:
+            update_data.duration_minutes = _duration(data['duration_minutes'])
+            if update_data.duration_minutes is None:
+                return jsonify({'error': f'Duración inválida (5 a {MAX_APPOINTMENT_MINUTES} minutos)'}), 400
+        
         if 'urgency_level' in data:
             update_data.urgency_level = data['urgency_level']
         
@@ -204,6 +293,12 @@ def update_appointment(appointment_id):
         if 'status' in data:
             update_data.status = data['status']
         
+        if 'version' in data:
+            version = _version(data['version'])
+            if version is None:
+                return jsonify({'error': 'Versión inválida'}), 400
+            update_data.version = version
+        
         # Actualizar turno
         result = agenda_service.update_appointment(appointment_id, update_data)
         
@@ -216,7 +311,7 @@ def update_appointment(appointment_id):
             return jsonify({
                 'success': False,
                 'error': result.get('message', 'Error desconocido')
-            }), 400
+            }), _error_status(result)
             
     except Exception as e:
         logger.error(f"Error al actualizar turno por ID: {str(e)}", exc_info=True)
@@ -231,8 +326,13 @@ def cancel_appointment(appointment_id):
     try:
         data = request.get_json() or {}
         reason = data.get('reason', 'Cancelado via API')
+        version = None
+        if 'version' in data:
+            version = _version(data['version'])
+            if version is None:
+                return jsonify({'error': 'Versión inválida'}), 400
         
-        result = agenda_service.cancel_appointment(appointment_id, reason)
+        result = agenda_service.cancel_appointment(appointment_id, reason, expected_version=version)
         
         if result['success']:
             return jsonify({
@@ -243,7 +343,7 @@ def cancel_appointment(appointment_id):
             return jsonify({
                 'success': False,
                 'error': result.get('message', 'Error desconocido')
-            }), 400
+            }), _error_status(result)
             
     except Exception as e:
         logger.error(f"Error al cancelar turno por ID: {str(e)}", exc_info=True)
@@ -266,7 +366,15 @@ def get_available_slots():
         except ValueError:
             return jsonify({'error': 'Formato de fecha inválido (YYYY-MM-DD)'}), 400
         
-        available_slots = agenda_service.get_available_slots(date_obj)
+        duration = None
+        if request.args.get('duration'):
+            duration = _duration(request.args['duration'])
+            if duration is None:
+                return jsonify({'error': f'Duración inválida (5 a {MAX_APPOINTMENT_MINUTES} minutos)'}), 400
+        
+        available_slots = agenda_service.get_available_slots(
+            date_obj, request.args.get('professional') or None, duration
+        )
         
         return jsonify({
             'success': True,
@@ -281,6 +389,63 @@ def get_available_slots():
             'error': str(e)
         }), 500
 
+@api_bp.route('/availability/month', methods=['GET'])
+def get_month_availability():
+    """Obtener libres, ocupados y primer horario libre de cada día de un mes"""
+    try:
+        # ?year=YYYY&month=M (mes actual por defecto)&professional=
+        try:
+            today = date.today()
+            year = int(request.args.get('year') or today.year)
+            month = int(request.args.get('month') or today.month)
+            date(year, month, 1)
+        except ValueError:
+            return jsonify({'error': 'Parámetros inválidos (year, month)'}), 400
+        
+        days = agenda_service.get_month_availability(year, month, request.args.get('professional') or None)
+        
+        return jsonify({
+            'success': True,
+            'year': year,
+            'month': month,
+            'days': days
+        })
+        
+    except Exception as e:
+        logger.error(f"Error al obtener disponibilidad del mes: {str(e)}", exc_info=True)
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@api_bp.route('/available-slots/next', methods=['GET'])
+def get_next_available_slots():
+    """Obtener los próximos horarios disponibles desde una fecha"""
+    try:
+        # ?from=YYYY-MM-DD (hoy por defecto)&count=N&professional=&weekdays=0,1,2&after=HH:MM&before=HH:MM&days=N&duration=M
+        try:
+            from_date = request.args.get('from')
+            from_date = datetime.strptime(from_date, '%Y-%m-%d').date() if from_date else date.today()
+            count = max(1, min(int(request.args.get('count') or 1), MAX_NEXT_SLOTS))
+            constraints = _slot_constraints(request.args)
+        except ValueError:
+            return jsonify({'error': 'Parámetros inválidos (from, count, weekdays, after, before, days, duration)'}), 400
+        
+        slots = agenda_service.find_next_available(from_date, count, constraints)
+        
+        return jsonify({
+            'success': True,
+            'from': from_date.isoformat(),
+            'slots': slots
+        })
+        
+    except Exception as e:
+        logger.error(f"Error al buscar próximos horarios disponibles: {str(e)}", exc_info=True)
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @api_bp.route('/notifications', methods=['POST'])
 def send_notification():
     """Enviar notificación"""
@@ -294,13 +459,14 @@ def send_notification():
         if 'phone_number' not in data or 'message' not in data:
             return jsonify({'error': 'phone_number y message son requeridos'}), 400
         
-        # Validar número de teléfono
-        if not is_valid_phone(data['phone_number']):
+        # Validar y normalizar número de teléfono (E.164)
+        phone_number = normalize_phone(data['phone_number'])
+        if not phone_number:
             return jsonify({'error': 'Número de teléfono inválido'}), 400
         
         # Enviar notificación
         result = notification_service.send_whatsapp(
-            phone_number=data['phone_number'],
+            phone_number=phone_number,
             message=data['message'],
             priority=data.get('priority', 'normal')
         )
@@ -323,6 +489,39 @@ def send_notification():
             'error': str(e)
         }), 500
 
+@api_bp.route('/patients/<phone_number>/timeline', methods=['GET'])
+def get_patient_timeline(phone_number):
+    """Línea de tiempo del paciente: turnos, notificaciones, feedback, adjuntos y conversación"""
+    try:
+        # Validar y normalizar número de teléfono (E.164)
+        phone_number = normalize_phone(phone_number)
+        if not phone_number:
+            return jsonify({'error': 'Número de teléfono inválido'}), 400
+        
+        # Paginación por cursor: ?limit=N&cursor=<next_cursor de la página anterior>
+        try:
+            limit = parse_limit(request.args.get('limit'))
+            after = decode_event_cursor(request.args.get('cursor'))
+        except ValueError:
+            return jsonify({'error': 'Parámetros de paginación inválidos (limit, cursor)'}), 400
+        
+        page = agenda_service.get_patient_timeline(phone_number, after, limit)
+        
+        return jsonify({
+            'success': True,
+            'phone_number': phone_number,
+            'events': page['events'],
+            'limit': limit,
+            'next_cursor': page['next_cursor']
+        })
+        
+    except Exception as e:
+        logger.error(f"Error al obtener línea de tiempo del paciente: {str(e)}", exc_info=True)
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @api_bp.route('/conversations/<phone_number>/analyze', methods=['POST'])
 def analyze_message(phone_number):
     """Analizar mensaje con IA"""
@@ -332,8 +531,9 @@ def analyze_message(phone_number):
         if not data or 'message' not in data:
             return jsonify({'error': 'Campo message requerido'}), 400
         
-        # Validar número de teléfono
-        if not is_valid_phone(phone_number):
+        # Validar y normalizar número de teléfono (E.164)
+        phone_number = normalize_phone(phone_number)
+        if not phone_number:
             return jsonify({'error': 'Número de teléfono inválido'}), 400
         
         # Analizar mensaje
@@ -355,8 +555,9 @@ def analyze_message(phone_number):
 def get_conversation_summary(phone_number):
     """Obtener resumen de conversación"""
     try:
-        # Validar número de teléfono
-        if not is_valid_phone(phone_number):
+        # Validar y normalizar número de teléfono (E.164)
+        phone_number = normalize_phone(phone_number)
+        if not phone_number:
             return jsonify({'error': 'Número de teléfono inválido'}), 400
         
         # Obtener resumen
@@ -378,8 +579,9 @@ def get_conversation_summary(phone_number):
 def clear_conversation(phone_number):
     """Limpiar contexto de conversación"""
     try:
-        # Validar número de teléfono
-        if not is_valid_phone(phone_number):
+        # Validar y normalizar número de teléfono (E.164)
+        phone_number = normalize_phone(phone_number)
+        if not phone_number:
             return jsonify({'error': 'Número de teléfono inválido'}), 400
         
         # Limpiar contexto
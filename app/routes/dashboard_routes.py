@@ -3,17 +3,21 @@ Rutas del dashboard para panel de administración
 Gestión de turnos, usuarios y estadísticas
 """
 
-from flask import Blueprint, render_template, request, jsonify, redirect, url_for, flash, session
+from flask import Blueprint, Response, render_template, request, jsonify, redirect, url_for, flash, session
 from functools import wraps
 import logging
 from datetime import datetime, date, timedelta
 from app.services import agenda_service, notification_service, ai_service
 from app.schemas import TurnoCreate, TurnoUpdate, UsuarioLogin
 from app.config import CLINIC_NAME
+from app.utils.pagination import decode_cursor, parse_limit
+from app.utils.export import EXPORT_FORMATS, export_stream
+from app.utils.phone import phone_key
 from app.db.queries import (
-    get_all_appointments, get_appointments_by_date_range,
+    get_appointments_by_date_range,
     get_user_by_username, create_user, get_all_users,
-    get_notifications_stats, get_conversation_stats
+    get_notifications_stats, get_conversation_stats,
+    iter_appointments, iter_notifications, iter_feedback
 )
 
 logger = logging.getLogger('asistente_salud')
@@ -286,17 +290,24 @@ def api_appointments():
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date')
         
-        if start_date and end_date:
-            appointments = get_appointments_by_date_range(
-                datetime.strptime(start_date, '%Y-%m-%d').date(),
-                datetime.strptime(end_date, '%Y-%m-%d').date()
-            )
-        else:
-            appointments = get_all_appointments()
+        try:
+            limit = parse_limit(request.args.get('limit'))
+            after = decode_cursor(request.args.get('cursor'))
+        except ValueError:
+            return jsonify({'success': False, 'error': 'Parámetros de paginación inválidos (limit, cursor)'}), 400
+        
+        # Sin fechas se pagina sobre todos los turnos en vez de devolverlos completos
+        page = agenda_service.get_appointments_page(
+            after, limit,
+            start_date=datetime.strptime(start_date, '%Y-%m-%d').date() if start_date else None,
+            end_date=datetime.strptime(end_date, '%Y-%m-%d').date() if end_date else None
+        )
         
         return jsonify({
             'success': True,
-            'appointments': appointments
+            'appointments': page['appointments'],
+            'limit': limit,
+            'next_cursor': page['next_cursor']
         })
         
     except Exception as e:
@@ -306,6 +317,44 @@ def api_appointments():
             'error': str(e)
         }), 500
 
+@dashboard_bp.route('/api/export/<kind>', methods=['GET'])
+@login_required
+def api_export(kind):
+    """Exportación en streaming (NDJSON o CSV) de turnos, notificaciones o feedback"""
+    sources = {
+        'appointments': iter_appointments,
+        'notifications': iter_notifications,
+        # El feedback no tiene estado
+        'feedback': lambda start, end, status: iter_feedback(start, end)
+    }
+    if kind not in sources:
+        return jsonify({'success': False, 'error': f'Exportación desconocida: {kind}'}), 404
+    
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({'success': False, 'error': 'Formato inválido (ndjson, csv)'}), 400
+    
+    try:
+        start_date = request.args.get('start_date')
+        end_date = request.args.get('end_date')
+        start_date = datetime.strptime(start_date, '%Y-%m-%d').date() if start_date else None
+        end_date = datetime.strptime(end_date, '%Y-%m-%d').date() if end_date else None
+    except ValueError:
+        return jsonify({'success': False, 'error': 'Formato de fecha inválido (YYYY-MM-DD)'}), 400
+    
+    # Las filas se leen a medida que se envían: la memoria no crece con el tamaño de la exportación
+    rows = sources[kind](start_date, end_date, request.args.get('status'))
+    logger.info(f"Exportación de {kind} ({fmt}) solicitada", extra={'user_id': session.get('user_id')})
+    return Response(
+        export_stream(kind, rows, fmt),
+        mimetype=EXPORT_FORMATS[fmt],
+        headers={
+            'Content-Disposition': f'attachment; filename={kind}-{date.today():%Y%m%d}.{fmt}',
+            # Evita que un proxy (nginx) acumule la respuesta completa antes de reenviarla
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
 @dashboard_bp.route('/api/available-slots', methods=['GET'])
 @login_required
 def api_available_slots():
@@ -335,7 +384,7 @@ def api_available_slots():
 def api_conversation_summary(phone_number):
     """API para obtener resumen de conversación"""
     try:
-        summary = ai_service.get_conversation_summary(phone_number)
+        summary = ai_service.get_conversation_summary(phone_key(phone_number))
         
         return jsonify({
             'success': True,
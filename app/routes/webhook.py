@@ -13,16 +13,17 @@ from app.db.queries import (
     get_last_appointment, insert_pending_appointment, get_pending_appointment, delete_pending_appointment,
     insert_appointment, mark_appointment_as_confirmed, cancel_appointment, insert_feedback
 )
+from app.services.feedback_tracker import feedback_tracker
 from app.services.calendar_service import get_google_calendar_service, is_slot_available_in_calendar, create_calendar_event
 from app.services.email_service import send_email_notification
 from app.services.whatsapp_service import send_whatsapp_message
 from app.services.image_handler import save_image_and_notify
 from app.config import CLINIC_NAME
 from app.utils.validators import is_valid_name, is_valid_phone, is_valid_date, is_valid_image
+from app.utils.phone import phone_key
 import re
 from datetime import datetime, timedelta
 from app.handlers import greeting_handler, appointment_handler, date_handler, time_handler, patient_name_handler, cancellation_handler, confirmation_handler, urgency_handler, image_handler, faq_handler, default_handler
-from app.db.postgres import get_connection
 from app.handlers.ai_handler import handle_with_ai
 
 webhook_bp = Blueprint('webhook', __name__)
@@ -109,7 +110,7 @@ def webhook():
         str: Respuesta Twilio serializada.
     """
     incoming_msg = request.values.get('Body', '')
-    phone_number = request.values.get('From', '')
+    phone_number = phone_key(request.values.get('From', ''))
     norm_msg = normalize_text(incoming_msg)
     
     # Validar teléfono
@@ -120,15 +121,17 @@ def webhook():
         return str(resp)
     
     # --- FEEDBACK POST-TURNO ---
-    # Si el paciente responde y su último turno está marcado como followup_sent=1 y attended no es NULL, se considera feedback
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute("SELECT patient_name FROM appointments WHERE phone_number = %s AND followup_sent = TRUE AND appointment_date < NOW() ORDER BY appointment_date DESC LIMIT 1", (phone_number,))
-    row = c.fetchone()
-    conn.close()
-    if row:
-        patient_name = row[0]
-        insert_feedback(patient_name, phone_number, incoming_msg)
+    # Si el paciente recibió un seguimiento dentro de la ventana de feedback, su respuesta se
+    # considera feedback. Se consulta el conjunto en memoria, no la base, en cada mensaje.
+    # Sólo el primer mensaje es feedback: los siguientes (p. ej. pedir otro turno) siguen el flujo normal
+    turno = feedback_tracker.get(phone_number)
+    if turno:
+        if insert_feedback({
+            'phone_number': phone_number,
+            'patient_name': turno['patient_name'],
+            'comment': incoming_msg
+        }):
+            feedback_tracker.discard(phone_number)
         resp = MessagingResponse()
         msg = resp.message()
         msg.body("¡Gracias por tu mensaje! Tu opinión es muy valiosa para nosotros.")
@@ -7,7 +7,7 @@ from flask import Blueprint, request, jsonify
 import logging
 from datetime import datetime
 from app.services import ai_service, agenda_service, notification_service
-from app.utils.validators import is_valid_phone
+from app.utils.phone import normalize_phone
 from app.handlers import (
     greeting_handler, appointment_handler, cancellation_handler,
     confirmation_handler, faq_handler, image_handler, default_handler
@@ -33,14 +33,14 @@ def webhook():
         except Exception as e:
             logger.warning(f"Datos de webhook inválidos: {e}")
             return jsonify({'error': f'Datos inválidos: {e}'}), 400
-        # Extraer información del mensaje
-        phone_number = mensaje.From.replace('whatsapp:', '')
+        # Extraer información del mensaje; 'whatsapp:+549...' queda como '+549...' (E.164)
+        phone_number = normalize_phone(mensaje.From)
         message_body = mensaje.Body.strip()
         message_type = mensaje.MediaContentType0 or 'text'
         
         # Validar número de teléfono
-        if not is_valid_phone(phone_number):
-            logger.warning(f"Número de teléfono inválido: {phone_number}")
+        if not phone_number:
+            logger.warning(f"Número de teléfono inválido: {mensaje.From}")
             return jsonify({'error': 'Invalid phone number'}), 400
         
         # Log del request
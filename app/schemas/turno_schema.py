@@ -7,6 +7,7 @@ from pydantic import BaseModel, Field, field_validator
 from typing import Optional, List
 from datetime import date, time
 from enum import Enum
+from app.config import MAX_APPOINTMENT_MINUTES
 
 class EstadoTurno(str, Enum):
     """Estados posibles de un turno"""
@@ -22,6 +23,8 @@ class TurnoBase(BaseModel):
     patient_name: Optional[str] = Field(None, description="Nombre del paciente")
     appointment_date: date = Field(..., description="Fecha del turno")
     appointment_time: time = Field(..., description="Hora del turno")
+    professional: Optional[str] = Field(None, description="Profesional o recurso que atiende el turno")
+    duration_minutes: Optional[int] = Field(None, ge=5, le=MAX_APPOINTMENT_MINUTES, description="Duración del turno en minutos")
     urgency_level: Optional[str] = Field(None, description="Nivel de urgencia")
     notes: Optional[str] = Field(None, description="Notas adicionales")
     
@@ -52,9 +55,12 @@ class TurnoUpdate(BaseModel):
     patient_name: Optional[str] = None
     appointment_date: Optional[date] = None
     appointment_time: Optional[time] = None
+    professional: Optional[str] = None
+    duration_minutes: Optional[int] = Field(None, ge=5, le=MAX_APPOINTMENT_MINUTES)
     urgency_level: Optional[str] = None
     notes: Optional[str] = None
     status: Optional[EstadoTurno] = None
+    version: Optional[int] = Field(None, description="Versión leída del turno; si cambió, la actualización se rechaza")
 
 class TurnoResponse(TurnoBase):
     """Schema para respuesta de turno"""
@@ -62,6 +68,7 @@ class TurnoResponse(TurnoBase):
     status: EstadoTurno = Field(..., description="Estado actual del turno")
     created_at: str = Field(..., description="Fecha de creación")
     updated_at: Optional[str] = Field(None, description="Fecha de última actualización")
+    version: Optional[int] = Field(None, description="Versión del turno, se incrementa en cada cambio")
     
     model_config = {
         "json_schema_extra": {
@@ -71,11 +78,13 @@ class TurnoResponse(TurnoBase):
                 "patient_name": "Juan Pérez",
                 "appointment_date": "2024-01-15",
                 "appointment_time": "14:30:00",
+                "duration_minutes": 30,
                 "urgency_level": "normal",
                 "notes": "Primera consulta",
                 "status": "pendiente",
                 "created_at": "2024-01-10T10:00:00Z",
-                "updated_at": "2024-01-10T10:00:00Z"
+                "updated_at": "2024-01-10T10:00:00Z",
+                "version": 1
             }
         }
     }
@@ -85,7 +94,8 @@ class TurnoListResponse(BaseModel):
     turnos: List[TurnoResponse] = Field(..., description="Lista de turnos")
     total: int = Field(..., description="Total de turnos")
     page: int = Field(..., description="Página actual")
-    per_page: int = Field(..., description="Turnos por página") 
+    per_page: int = Field(..., description="Turnos por página")
+    next_cursor: Optional[str] = Field(None, description="Cursor de la página siguiente (None en la última)") 
 
 # Alias para compatibilidad y claridad
 TurnoSchema = TurnoCreate 
\ No newline at end of file
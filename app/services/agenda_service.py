@@ -3,30 +3,65 @@ Servicio de agenda para gestión de turnos y citas
 Maneja la lógica de negocio para turnos
 """
 
+import calendar
 import logging
+from collections import defaultdict
 from datetime import datetime, date, time
-from typing import List, Optional, Dict, Any
-from app.config import CLINIC_NAME
+from typing import List, Optional, Dict, Any, Iterator, Tuple
+from app.config import CLINIC_NAME, AVAILABILITY_SEARCH_DAYS, AVAILABILITY_WARM_DAYS, DEFAULT_APPOINTMENT_MINUTES
 from app.schemas.turno_schema import TurnoCreate, TurnoUpdate, TurnoResponse, EstadoTurno
 from app.db.queries import (
     create_appointment, get_appointment, update_appointment,
-    delete_appointment, get_appointments_by_date, get_all_appointments,
-    get_appointments, mark_appointment_absent
+    delete_appointment, get_appointments_by_date, get_appointments_by_date_range, get_all_appointments,
+    get_appointments_page, get_patient_timeline,
+    get_appointments, mark_appointment_absent,
+    get_followup_candidates, get_absence_candidates,
+    mark_followup_sent, set_appointment_attended, is_slot_available
 )
+from app.db.errors import SlotUnavailableError, VersionConflictError
+from app.db.query_cache import availability_cache, day_tag, range_tags
+from app.db.records import AppointmentRecord, appointment_json
+from app.services.schedule import WorkSchedule, work_schedule
 
 from apscheduler.schedulers.background import BackgroundScheduler
 from app.services.whatsapp_service import send_whatsapp_message
-from app.db.queries import get_connection
+from app.services.feedback_tracker import feedback_tracker
+from app.db.timeline import event_json
+from app.utils.pagination import encode_cursor, encode_event_cursor, DEFAULT_PAGE_SIZE
 from datetime import timedelta
 from functools import wraps
 
 logger = logging.getLogger('asistente_salud')
 
+# Campos de un turno que se devuelven en las respuestas de la API
+RESPONSE_FIELDS = (
+    'id', 'phone_number', 'patient_name', 'appointment_date', 'appointment_time', 'professional',
+    'urgency_level', 'notes', 'status', 'created_at', 'updated_at', 'version', 'duration_minutes'
+)
+
+# Intentos de un cambio que parte de una lectura antes de informar el conflicto de versión
+UPDATE_ATTEMPTS = 3
+
+VERSION_CONFLICT = {
+    'success': False,
+    'message': 'El turno fue modificado por otra operación; volvé a cargarlo',
+    'error': 'VERSION_CONFLICT'
+}
+
+# Días que lee find_next_available en la primera consulta; cada ventana siguiente duplica la anterior
+SEARCH_WINDOW_DAYS = 7
+MAX_SEARCH_WINDOW_DAYS = 56
+
+def _occupies(appointment: Dict[str, Any], professional: Optional[str]) -> bool:
+    """Si el turno ocupa la agenda de `professional` (None: la de toda la clínica)"""
+    return not professional or (appointment.get('professional') or '') in ('', professional)
+
 class AgendaService:
     """Servicio para gestión de agenda y turnos"""
     
-    def __init__(self):
+    def __init__(self, schedule: WorkSchedule = None):
         self.clinic_name = CLINIC_NAME
+        self.schedule = schedule or work_schedule
     
     def create_appointment(self, turno_data: TurnoCreate) -> Dict[str, Any]:
         """
@@ -39,23 +74,25 @@ class AgendaService:
             Dict con el resultado de la operación
         """
         try:
-            # Validar disponibilidad
-            if not self._check_availability(turno_data.appointment_date, turno_data.appointment_time):
+            # Crear el turno: el índice de reservas rechaza el horario ocupado
+            # en la misma operación, sin consultar antes la agenda del día
+            appointment = create_appointment({
+                'phone_number': turno_data.phone_number,
+                'patient_name': turno_data.patient_name,
+                'appointment_date': turno_data.appointment_date,
+                'appointment_time': turno_data.appointment_time,
+                'professional': turno_data.professional,
+                'duration_minutes': turno_data.duration_minutes,
+                'urgency_level': turno_data.urgency_level,
+                'notes': turno_data.notes
+            })
+            if not appointment:
                 return {
                     'success': False,
-                    'message': f'No hay disponibilidad para el {turno_data.appointment_date} a las {turno_data.appointment_time}',
-                    'error': 'SLOT_UNAVAILABLE'
+                    'message': 'Error interno al crear el turno',
+                    'error': 'DATABASE_ERROR'
                 }
-            
-            # Crear el turno
-            appointment_id = create_appointment(
-                phone_number=turno_data.phone_number,
-                patient_name=turno_data.patient_name,
-                appointment_date=turno_data.appointment_date,
-                appointment_time=turno_data.appointment_time,
-                urgency_level=turno_data.urgency_level,
-                notes=turno_data.notes
-            )
+            appointment_id = appointment['id']
             
             logger.info(f"Turno creado exitosamente - ID: {appointment_id}, Teléfono: {turno_data.phone_number}")
             
@@ -67,6 +104,12 @@ class AgendaService:
                 'appointment_time': turno_data.appointment_time
             }
             
+        except SlotUnavailableError:
+            return {
+                'success': False,
+                'message': f'No hay disponibilidad para el {turno_data.appointment_date} a las {turno_data.appointment_time}',
+                'error': 'SLOT_UNAVAILABLE'
+            }
         except Exception as e:
             logger.error(f"Error creando turno: {str(e)}")
             return {
@@ -106,8 +149,12 @@ class AgendaService:
             Dict con el resultado de la operación
         """
         try:
-            # Verificar que el turno existe
-            existing_appointment = get_appointment(appointment_id)
+            # Con la versión que vio el cliente, el cambio falla si el turno se modificó después
+            changes = update_data.dict(exclude_unset=True)
+            expected_version = changes.pop('version', None)
+            
+            # Actualizar el turno (si cambia fecha/hora, el índice valida el nuevo horario)
+            existing_appointment = self._update_with_retry(appointment_id, lambda current: changes, expected_version)
             if not existing_appointment:
                 return {
                     'success': False,
@@ -115,18 +162,6 @@ class AgendaService:
                     'error': 'APPOINTMENT_NOT_FOUND'
                 }
             
-            # Validar disponibilidad si se cambia fecha/hora
-            if update_data.appointment_date and update_data.appointment_time:
-                if not self._check_availability(update_data.appointment_date, update_data.appointment_time, exclude_id=appointment_id):
-                    return {
-                        'success': False,
-                        'message': f'No hay disponibilidad para el {update_data.appointment_date} a las {update_data.appointment_time}',
-                        'error': 'SLOT_UNAVAILABLE'
-                    }
-            
-            # Actualizar el turno
-            update_appointment(appointment_id, update_data.dict(exclude_unset=True))
-            
             logger.info(f"Turno {appointment_id} actualizado exitosamente")
             
             return {
@@ -134,6 +169,14 @@ class AgendaService:
                 'message': 'Turno actualizado exitosamente'
             }
             
+        except SlotUnavailableError:
+            return {
+                'success': False,
+                'message': f'No hay disponibilidad para el {update_data.appointment_date} a las {update_data.appointment_time}',
+                'error': 'SLOT_UNAVAILABLE'
+            }
+        except VersionConflictError:
+            return dict(VERSION_CONFLICT)
         except Exception as e:
             logger.error(f"Error actualizando turno {appointment_id}: {str(e)}")
             return {
@@ -142,20 +185,27 @@ class AgendaService:
                 'error': str(e)
             }
     
-    def cancel_appointment(self, appointment_id: int, reason: str = None) -> Dict[str, Any]:
+    def cancel_appointment(self, appointment_id: int, reason: str = None,
+                           expected_version: int = None) -> Dict[str, Any]:
         """
         Cancela un turno
         
         Args:
             appointment_id: ID del turno
             reason: Motivo de la cancelación
+            expected_version: Versión del turno que vio el cliente (opcional)
             
         Returns:
             Dict con el resultado de la operación
         """
         try:
-            # Verificar que el turno existe
-            existing_appointment = get_appointment(appointment_id)
+            # Actualizar estado a cancelado; si ya lo estaba no hay nada que escribir
+            update_data = TurnoUpdate(status=EstadoTurno.CANCELADO).dict(exclude_unset=True)
+            existing_appointment = self._update_with_retry(
+                appointment_id,
+                lambda current: None if current.get('status') == EstadoTurno.CANCELADO.value else update_data,
+                expected_version
+            )
             if not existing_appointment:
                 return {
                     'success': False,
@@ -163,10 +213,6 @@ class AgendaService:
                     'error': 'APPOINTMENT_NOT_FOUND'
                 }
             
-            # Actualizar estado a cancelado
-            update_data = TurnoUpdate(status=EstadoTurno.CANCELADO)
-            update_appointment(appointment_id, update_data.dict(exclude_unset=True))
-            
             logger.info(f"Turno {appointment_id} cancelado - Motivo: {reason}")
             
             return {
@@ -174,6 +220,8 @@ class AgendaService:
                 'message': 'Turno cancelado exitosamente'
             }
             
+        except VersionConflictError:
+            return dict(VERSION_CONFLICT)
         except Exception as e:
             logger.error(f"Error cancelando turno {appointment_id}: {str(e)}")
             return {
@@ -231,6 +279,72 @@ class AgendaService:
             logger.error(f"Error obteniendo turnos para {target_date}: {str(e)}")
             return []
     
+    def get_appointments_by_date_range(self, start_date: date, end_date: date) -> List[Dict[str, Any]]:
+        """
+        Obtiene los turnos entre dos fechas (inclusive), ordenados por fecha
+        
+        Args:
+            start_date: Fecha inicial
+            end_date: Fecha final
+            
+        Returns:
+            Lista de turnos
+        """
+        try:
+            appointments = get_appointments_by_date_range(start_date, end_date)
+            return [self._format_appointment_response(apt) for apt in appointments]
+        except Exception as e:
+            logger.error(f"Error obteniendo turnos entre {start_date} y {end_date}: {str(e)}")
+            return []
+    
+    def get_appointments_page(self, after=None, limit: int = DEFAULT_PAGE_SIZE, start_date: date = None,
+                              end_date: date = None, phone_number: str = None, status: str = None) -> Dict[str, Any]:
+        """
+        Obtiene una página de turnos ordenada por (fecha, hora, id)
+        
+        Args:
+            after: Clave (fecha, hora, id) decodificada del cursor, o None para la primera página
+            limit: Cantidad máxima de turnos
+            start_date, end_date, phone_number, status: Filtros opcionales
+            
+        Returns:
+            Dict con 'appointments' y 'next_cursor' (None en la última página)
+        """
+        try:
+            # Se pide un turno de más para saber si hay otra página sin una consulta extra
+            rows = get_appointments_page(after, limit + 1, start_date, end_date, phone_number, status)
+            next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+            return {
+                'appointments': [self._format_appointment_response(apt) for apt in rows[:limit]],
+                'next_cursor': next_cursor
+            }
+        except Exception as e:
+            logger.error(f"Error obteniendo página de turnos: {str(e)}")
+            return {'appointments': [], 'next_cursor': None}
+    
+    def get_patient_timeline(self, phone_number: str, after=None, limit: int = DEFAULT_PAGE_SIZE) -> Dict[str, Any]:
+        """
+        Obtiene la línea de tiempo de un paciente, del evento más reciente al más antiguo
+        
+        Args:
+            phone_number: Teléfono del paciente
+            after: Clave (instante, tipo, id) decodificada del cursor, o None para la primera página
+            limit: Cantidad máxima de eventos
+            
+        Returns:
+            Dict con 'events' y 'next_cursor' (None en la última página)
+        """
+        try:
+            rows = get_patient_timeline(phone_number, after, limit + 1)
+            next_cursor = encode_event_cursor(rows[limit - 1]) if len(rows) > limit else None
+            return {
+                'events': [event_json(item, self._format_appointment_response) for item in rows[:limit]],
+                'next_cursor': next_cursor
+            }
+        except Exception as e:
+            logger.error(f"Error obteniendo línea de tiempo del paciente: {str(e)}")
+            return {'events': [], 'next_cursor': None}
+    
     def get_appointments_by_phone(self, phone_number: str) -> List[Dict[str, Any]]:
         """
         Obtiene todos los turnos de un número de teléfono
@@ -248,64 +362,273 @@ class AgendaService:
             logger.error(f"Error obteniendo turnos para {phone_number}: {str(e)}")
             return []
     
-    def get_available_slots(self, target_date: date) -> List[str]:
+    def get_available_slots(self, target_date: date, professional: str = None, duration: int = None) -> List[str]:
         """
         Obtiene horarios disponibles para una fecha
         
         Args:
             target_date: Fecha para buscar disponibilidad
+            professional: Profesional cuya agenda se consulta (None para la de la clínica)
+            duration: Minutos que necesita el turno (DEFAULT_APPOINTMENT_MINUTES por defecto)
             
         Returns:
             Lista de horarios disponibles
         """
         try:
-            # Horarios de trabajo (configurable)
-            work_hours = [
-                '09:00', '09:30', '10:00', '10:30', '11:00', '11:30',
-                '14:00', '14:30', '15:00', '15:30', '16:00', '16:30', '17:00'
-            ]
+            # Horarios de atención del día menos los ocupados; los turnos se leen sólo si no está en caché
+            free = self._day_free_mask(target_date, professional, lambda: get_appointments_by_date(target_date))
+            return self.schedule.slots(self.schedule.fits(free, duration or DEFAULT_APPOINTMENT_MINUTES))
             
-            # Obtener turnos existentes para la fecha
-            existing_appointments = get_appointments_by_date(target_date)
-            booked_times = {apt['appointment_time'].strftime('%H:%M') for apt in existing_appointments}
+        except Exception as e:
+            logger.error(f"Error obteniendo horarios disponibles para {target_date}: {str(e)}")
+            return []
+    
+    def find_next_available(self, from_date: date, count: int = 1,
+                            constraints: Optional[Dict[str, Any]] = None) -> List[Dict[str, str]]:
+        """
+        Busca los primeros horarios libres desde una fecha
+        
+        Recorre los días en orden y se detiene apenas junta `count` horarios.
+        Los días en caché no leen turnos; los demás se leen por ventanas de
+        días que se duplican (7, 14, 28...), así un hueco a varias semanas
+        cuesta pocas consultas y no una por día.
+        
+        Args:
+            from_date: Primer día de la búsqueda
+            count: Cantidad de horarios a devolver
+            constraints: Filtros opcionales: 'professional' (cuentan sus turnos y los sin profesional),
+                'weekdays' (días de la semana permitidos, 0 = lunes), 'earliest' y
+                'latest' (rango de horas 'HH:MM' de inicio, inclusive), 'duration'
+                (minutos seguidos que necesita el turno) y 'max_days' (días a
+                recorrer, AVAILABILITY_SEARCH_DAYS por defecto)
             
-            # Filtrar horarios disponibles
-            available_slots = [time for time in work_hours if time not in booked_times]
+        Returns:
+            Lista de {'date': 'YYYY-MM-DD', 'time': 'HH:MM'} en orden cronológico
+        """
+        try:
+            found = []
+            if count < 1:
+                return found
+            for day, slot in self._iter_free_slots(from_date, constraints or {}):
+                found.append({'date': day.isoformat(), 'time': slot})
+                if len(found) == count:
+                    break
+            return found
             
-            return available_slots
+        except Exception as e:
+            logger.error(f"Error buscando próximos horarios disponibles desde {from_date}: {str(e)}")
+            return []
+    
+    def _iter_free_slots(self, from_date: date, constraints: Dict[str, Any]) -> Iterator[Tuple[date, str]]:
+        """Genera (día, horario) libres desde from_date; sólo consulta la ventana que se está recorriendo"""
+        professional = constraints.get('professional')
+        duration = constraints.get('duration')
+        weekdays = constraints.get('weekdays')
+        hours = self.schedule.window(constraints.get('earliest'), constraints.get('latest'))
+        # Si las horas y los días pedidos no dejan ningún horario posible, no se recorre nada
+        reachable = self.schedule.reachable(professional, weekdays)
+        if not self.schedule.fits(reachable, duration or DEFAULT_APPOINTMENT_MINUTES) & hours:
+            return
+        max_days = min(constraints.get('max_days', AVAILABILITY_SEARCH_DAYS), (date.max - from_date).days + 1)
+        last_day = from_date + timedelta(days=max_days - 1)
+        now = datetime.now()
+        window = SEARCH_WINDOW_DAYS
+        start = from_date
+        while start <= last_day:
+            end = start + timedelta(days=min(window, (last_day - start).days + 1) - 1)
+            for day, free in self._free_masks(start, end, professional):
+                if weekdays is None or day.weekday() in weekdays:
+                    free = self.schedule.fits(free, duration or DEFAULT_APPOINTMENT_MINUTES) & hours
+                    # Los horarios de hoy que ya pasaron no se ofrecen
+                    if day == now.date():
+                        free &= self.schedule.after(now.time())
+                    for slot in self.schedule.slots(free):
+                        yield day, slot
+            if end == last_day:
+                break
+            start = end + timedelta(days=1)
+            window = min(window * 2, MAX_SEARCH_WINDOW_DAYS)
+    
+    def warm_availability(self, days: int = AVAILABILITY_WARM_DAYS) -> int:
+        """
+        Precalcula los horarios libres de la clínica de los próximos días
+        
+        Args:
+            days: Días desde hoy a cargar en la caché
             
+        Returns:
+            Cantidad de días cargados
+        """
+        try:
+            today = date.today()
+            loaded = sum(1 for _ in self._free_masks(today, today + timedelta(days=days - 1)))
+            logger.info(f"Disponibilidad precalculada para {loaded} días")
+            return loaded
         except Exception as e:
-            logger.error(f"Error obteniendo horarios disponibles para {target_date}: {str(e)}")
+            logger.error(f"Error precalculando disponibilidad: {str(e)}")
+            return 0
+    
+    def get_month_availability(self, year: int, month: int, professional: str = None) -> List[Dict[str, Any]]:
+        """
+        Resumen de disponibilidad de cada día de un mes (vista de calendario)
+        
+        Lee los turnos del mes con una sola consulta por rango de fechas y
+        recorre los días una vez contra la agenda compilada. El resultado se
+        guarda en availability_cache con la etiqueta de cada día del mes:
+        cualquier alta, cambio, cancelación o ausencia en el mes lo invalida.
+        
+        Args:
+            year: Año
+            month: Mes (1 a 12)
+            professional: Profesional cuya agenda se consulta (None para la de la clínica)
+            
+        Returns:
+            Lista de {'date', 'free', 'booked', 'first_free'} por día: horarios
+            libres para un turno de duración estándar, turnos activos y primer
+            horario libre ('HH:MM' o None)
+        """
+        try:
+            first = date(year, month, 1)
+            last = first.replace(day=calendar.monthrange(year, month)[1])
+            
+            def load():
+                by_day = defaultdict(list)
+                for apt in get_appointments_by_date_range(first, last):
+                    if apt.get('status') == EstadoTurno.CANCELADO.value:
+                        continue
+                    if _occupies(apt, professional):
+                        by_day[apt['appointment_date']].append(apt)
+                days = []
+                day = first
+                while day <= last:
+                    free = self.schedule.fits(
+                        self._day_free_mask(day, professional, lambda: by_day[day]), DEFAULT_APPOINTMENT_MINUTES
+                    )
+                    slots = self.schedule.slots(free & -free)
+                    days.append({
+                        'date': day.isoformat(),
+                        'free': self.schedule.count(free),
+                        'booked': len(by_day[day]),
+                        'first_free': slots[0] if slots else None
+                    })
+                    day += timedelta(days=1)
+                return days
+            
+            return availability_cache.get_or_load(
+                ('month', self.schedule, year, month, professional), range_tags(first, last), load
+            )
+            
+        except Exception as e:
+            logger.error(f"Error obteniendo disponibilidad del mes {month}/{year}: {str(e)}")
             return []
     
-    def _check_availability(self, appointment_date: date, appointment_time: time, exclude_id: int = None) -> bool:
+    def _free_masks(self, start: date, end: date, professional: str = None) -> Iterator[Tuple[date, int]]:
+        """(día, máscara de horarios libres) de start a end; el primer día fuera de caché lee los turnos de todo el rango"""
+        by_day = None
+        
+        def appointments_of(day):
+            nonlocal by_day
+            if by_day is None:
+                by_day = defaultdict(list)
+                for apt in get_appointments_by_date_range(start, end):
+                    by_day[apt['appointment_date']].append(apt)
+            return by_day[day]
+        
+        for offset in range((end - start).days + 1):
+            day = start + timedelta(days=offset)
+            yield day, self._day_free_mask(day, professional, lambda: appointments_of(day))
+    
+    def _day_free_mask(self, day: date, professional: str, load_appointments) -> int:
+        """
+        Máscara de la grilla con los horarios libres de un día, desde availability_cache
+        
+        Cada turno ocupa todos los horarios que toca su duración. Un turno
+        cancelado libera su horario, como en el índice de reservas. Sin
+        `professional` (agenda de la clínica) ocupan todos los turnos del día;
+        con `professional`, los suyos y los que no tienen profesional, que
+        ocupan a toda la clínica. Es la misma regla con la que el índice de
+        reservas rechaza solapes, así que un horario libre acá se puede
+        reservar. Cualquier escritura de turnos del día invalida la entrada.
+        """
+        def load():
+            booked = self.schedule.booked_mask(
+                (apt['appointment_time'], apt.get('duration_minutes') or DEFAULT_APPOINTMENT_MINUTES)
+                for apt in load_appointments()
+                if apt.get('status') != EstadoTurno.CANCELADO.value and _occupies(apt, professional)
+            )
+            return self.schedule.free_mask(day, booked, professional)
+        
+        return availability_cache.get_or_load(('free', self.schedule, day, professional), {day_tag(day)}, load)
+    
+    def _check_availability(self, appointment_date: date, appointment_time: time, exclude_id: int = None,
+                            professional: str = None, duration: int = None) -> bool:
         """
         Verifica disponibilidad de un horario
         
+        Es sólo informativa: la reserva real la garantiza el índice de
+        intervalos al crear o mover el turno.
+        
         Args:
             appointment_date: Fecha del turno
             appointment_time: Hora del turno
             exclude_id: ID de turno a excluir (para actualizaciones)
+            professional: Profesional del turno, si la agenda distingue profesionales
+            duration: Duración en minutos (DEFAULT_APPOINTMENT_MINUTES si es None)
             
         Returns:
-            True si está disponible, False si no
+            True si [hora, hora + duración) no se solapa con otro turno activo
         """
         try:
-            existing_appointments = get_appointments_by_date(appointment_date)
-            
-            # Filtrar por hora y excluir el turno actual si se está actualizando
-            conflicting_appointments = [
-                apt for apt in existing_appointments
-                if apt['appointment_time'] == appointment_time
-                and (exclude_id is None or apt['id'] != exclude_id)
-            ]
-            
-            return len(conflicting_appointments) == 0
+            return is_slot_available(appointment_date, appointment_time, professional, exclude_id, duration)
             
         except Exception as e:
             logger.error(f"Error verificando disponibilidad: {str(e)}")
             return False
     
+    def _update_with_retry(self, appointment_id: int, changes_for, expected_version: int = None,
+                           attempts: int = UPDATE_ATTEMPTS) -> Optional[Dict[str, Any]]:
+        """
+        Lee un turno y escribe los cambios sólo si nadie lo modificó entretanto
+        
+        Ante un conflicto de versión vuelve a leer el turno y recalcula los
+        cambios, hasta `attempts` veces. Con `expected_version` no se
+        reintenta: el cliente editó una versión que ya no existe.
+        
+        Args:
+            appointment_id: ID del turno
+            changes_for: Función que recibe el turno leído y devuelve los cambios (o None si no hay cambios)
+            expected_version: Versión del turno que vio el cliente, o None para usar la de la lectura
+            attempts: Cantidad máxima de intentos
+            
+        Returns:
+            El turno leído en el intento que se aplicó, o None si no existe
+            
+        Raises:
+            VersionConflictError: si el turno siguió cambiando en todos los intentos
+            RuntimeError: si el backend no aplicó el cambio a un turno que existe
+        """
+        for attempt in range(1, attempts + 1):
+            appointment = get_appointment(appointment_id)
+            if not appointment:
+                return None
+            # La versión se toma antes de calcular los cambios: son los de esa versión
+            version = appointment.get('version') if expected_version is None else expected_version
+            changes = changes_for(appointment)
+            if not changes:
+                return appointment
+            try:
+                if update_appointment(appointment_id, changes, expected_version=version):
+                    return appointment
+            except VersionConflictError:
+                if expected_version is not None or attempt == attempts:
+                    raise
+                logger.info(f"Turno {appointment_id} modificado durante la actualización; reintento {attempt}/{attempts - 1}")
+                continue
+            # No se escribió: o el turno se borró después de leerlo, o falló el backend
+            if not get_appointment(appointment_id):
+                return None
+            raise RuntimeError(f"No se pudo guardar el cambio del turno {appointment_id}")
+    
     def _format_appointment_response(self, appointment: Dict[str, Any]) -> Dict[str, Any]:
         """
         Formatea la respuesta de un turno
@@ -316,18 +639,12 @@ class AgendaService:
         Returns:
             Datos formateados
         """
-        return {
-            'id': appointment['id'],
-            'phone_number': appointment['phone_number'],
-            'patient_name': appointment['patient_name'],
-            'appointment_date': appointment['appointment_date'].isoformat() if appointment['appointment_date'] else None,
-            'appointment_time': appointment['appointment_time'].strftime('%H:%M') if appointment['appointment_time'] else None,
-            'urgency_level': appointment['urgency_level'],
-            'notes': appointment['notes'],
-            'status': appointment['status'],
-            'created_at': appointment['created_at'].isoformat() if appointment['created_at'] else None,
-            'updated_at': appointment['updated_at'].isoformat() if appointment['updated_at'] else None
-        } 
+        # Los turnos del backend en memoria traen su forma JSON en caché: no se reformatea en cada lectura
+        if isinstance(appointment, AppointmentRecord):
+            data = appointment.as_json()
+        else:
+            data = appointment_json(appointment)
+        return {field: data[field] for field in RESPONSE_FIELDS}
 
 # --- Funciones reutilizables de agendamiento ---
 
@@ -350,36 +667,26 @@ def retry(max_retries=3):
 @retry(max_retries=3)
 def send_followup_messages():
     """Envía mensajes de seguimiento a pacientes que tuvieron turno el día anterior."""
-    now = datetime.now()
-    yesterday = now - timedelta(days=1)
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute('''SELECT id, patient_name, phone_number, appointment_date FROM appointments WHERE status = 'confirmado' AND followup_sent = 0 AND appointment_date < %s''', (yesterday,))
-    turnos = c.fetchall()
-    for turno in turnos:
-        turno_id, patient_name, phone_number, appointment_date = turno
+    today = datetime.now().date()
+    for turno in get_followup_candidates(today):
+        patient_name, phone_number = turno['patient_name'], turno['phone_number']
         message = f"Hola {patient_name}, ¿cómo te fue en la consulta? Si querés dejar una reseña o reprogramar otro turno, escribime 😊"
         try:
             send_whatsapp_message(phone_number, message)
         except Exception as e:
             logger.error(f"Error enviando WhatsApp a {phone_number}: {e}")
             continue
-        c.execute('UPDATE appointments SET followup_sent = 1 WHERE id = %s', (turno_id,))
-    conn.commit()
-    conn.close()
+        mark_followup_sent(turno['id'])
+        feedback_tracker.add(phone_number, patient_name)
 
 @retry(max_retries=3)
 def mark_absences_and_send_followup():
     """Marca ausencias y envía mensajes de seguimiento a pacientes que no asistieron."""
-    now = datetime.now()
-    conn = get_connection()
-    c = conn.cursor()
-    c.execute('''SELECT id, patient_name, phone_number, appointment_date FROM appointments WHERE status = 'confirmado' AND appointment_date < %s AND (attended IS NULL OR attended = 0) AND followup_sent = 0''', (now,))
-    turnos = c.fetchall()
-    for turno in turnos:
-        turno_id, patient_name, phone_number, appointment_date = turno
+    today = datetime.now().date()
+    for turno in get_absence_candidates(today):
+        turno_id, patient_name, phone_number = turno['id'], turno['patient_name'], turno['phone_number']
         # Marcar como ausente
-        c.execute('UPDATE appointments SET attended = 0 WHERE id = %s', (turno_id,))
+        set_appointment_attended(turno_id, False)
         # Enviar mensaje de seguimiento por ausencia
         message = f"Hola {patient_name}, notamos que no asististe a tu turno. ¿Querés reprogramar o necesitas ayuda? Si fue un error, avísanos 😊"
         try:
@@ -387,6 +694,5 @@ def mark_absences_and_send_followup():
         except Exception as e:
             logger.error(f"Error enviando WhatsApp a {phone_number}: {e}")
             continue
-        c.execute('UPDATE appointments SET followup_sent = 1 WHERE id = %s', (turno_id,))
-    conn.commit()
-    conn.close() 
\ No newline at end of file
+        mark_followup_sent(turno_id)
+        feedback_tracker.add(phone_number, patient_name) 
\ No newline at end of file
@@ -0,0 +1,85 @@
+"""
+Pacientes a la espera de feedback post-turno
+Conjunto en memoria con vencimiento que evita consultar la base en cada mensaje entrante
+"""
+
+import logging
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Optional
+
+from app.config import FEEDBACK_WINDOW_DAYS, FEEDBACK_REFRESH_INTERVAL
+from app.db.queries import get_recent_followups
+from app.db.store import date_key
+from app.utils.cache import TTLCache
+from app.utils.phone import phone_key
+
+logger = logging.getLogger('asistente_salud')
+
+# Teléfonos retenidos como máximo; con la ventana de días alcanza de sobra
+MAX_TRACKED = 50000
+
+
+class FeedbackTracker:
+    """Teléfonos a los que se envió seguimiento, con el nombre del paciente
+
+    Los jobs del scheduler agregan cada teléfono al enviar el mensaje y el
+    webhook consulta la pertenencia en O(1). La base sólo se lee al arrancar
+    y luego cada `refresh_interval` segundos, para incorporar los seguimientos
+    enviados por otro proceso; la recarga agrega entradas y nunca vacía el
+    conjunto, así que un error de base no pierde lo ya conocido.
+    Sólo el primer mensaje después del seguimiento es feedback: discard()
+    saca al teléfono y lo recuerda durante la ventana para que la recarga
+    no lo vuelva a agregar; sus mensajes siguientes van al flujo normal.
+    """
+
+    def __init__(self, window_days: int = FEEDBACK_WINDOW_DAYS,
+                 refresh_interval: float = FEEDBACK_REFRESH_INTERVAL, clock=time.monotonic):
+        self.window = timedelta(days=window_days)
+        self.refresh_interval = refresh_interval
+        self._clock = clock
+        self._phones = TTLCache(self.window.total_seconds(), MAX_TRACKED, clock=clock)
+        self._answered = TTLCache(self.window.total_seconds(), MAX_TRACKED, clock=clock)
+        self._loaded_at: Optional[float] = None
+        self._refresh_lock = threading.Lock()
+
+    def add(self, phone_number: str, patient_name: Optional[str] = None):
+        """Registra que el teléfono recibió un mensaje de seguimiento"""
+        phone_number = phone_key(phone_number)
+        self._answered.pop(phone_number)
+        self._phones.set(phone_number, {'patient_name': patient_name})
+
+    def get(self, phone_number: str) -> Optional[Dict[str, Any]]:
+        """Datos del seguimiento pendiente de feedback, o None"""
+        if self._stale():
+            self.refresh()
+        return self._phones.get(phone_key(phone_number))
+
+    def discard(self, phone_number: str):
+        """Registra que el teléfono ya respondió el seguimiento"""
+        phone_number = phone_key(phone_number)
+        self._phones.pop(phone_number)
+        self._answered.set(phone_number, True)
+
+    def refresh(self):
+        """Carga desde la base los seguimientos de la ventana vigente"""
+        with self._refresh_lock:
+            if self._loaded_at is not None and not self._stale():
+                return
+            today = datetime.now().date()
+            for appointment in get_recent_followups(today - self.window):
+                # La ventana se cuenta desde el día del turno: el seguimiento sale al día siguiente
+                expires = date.fromisoformat(date_key(appointment['appointment_date'])) + self.window
+                ttl = (expires - today).total_seconds()
+                phone_number = phone_key(appointment['phone_number'])
+                if ttl > 0 and self._answered.get(phone_number) is None:
+                    self._phones.set(phone_number, {'patient_name': appointment.get('patient_name')}, ttl=ttl)
+            self._loaded_at = self._clock()
+            logger.debug(f"Seguimientos pendientes de feedback cargados: {len(self._phones)}")
+
+    def _stale(self) -> bool:
+        return self._loaded_at is None or self._clock() - self._loaded_at >= self.refresh_interval
+
+
+feedback_tracker = FeedbackTracker()
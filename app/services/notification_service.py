@@ -12,6 +12,7 @@ from app.config import (
     CLINIC_NAME
 )
 from app.schemas.notification_schema import NotificacionCreate, RecordatorioSchema
+from app.utils.phone import whatsapp_address
 
 logger = logging.getLogger('asistente_salud')
 
@@ -286,7 +287,7 @@ class NotificationService:
             message = client.messages.create(
                 body=message,
                 from_=TWILIO_PHONE_NUMBER,
-                to=f"whatsapp:{phone_number}"
+                to=whatsapp_address(phone_number)
             )
             
             return {
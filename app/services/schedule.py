@@ -0,0 +1,192 @@
+"""
+Horarios de atención compilados a bitmaps por día
+La definición (WORK_SCHEDULE) se compila una sola vez; los horarios libres de un día
+salen de un AND-NOT entre la máscara del día y la de los turnos ocupados
+"""
+
+import json
+from datetime import date, time, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.config import WORK_SCHEDULE
+
+WEEKDAYS = ('mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun')
+MINUTES_PER_DAY = 24 * 60
+
+# Lunes a viernes 9:00-12:00 y 14:00-17:30 (último turno 17:00), sábados 9:00-13:00
+DEFAULT_SCHEDULE = {
+    'slot_minutes': 30,
+    'weekly': dict(
+        {day: ['09:00-12:00', '14:00-17:30'] for day in WEEKDAYS[:5]},
+        sat=['09:00-13:00']
+    )
+}
+
+
+def _minutes(value: Any) -> int:
+    """Minutos desde las 00:00 de un time o de un 'HH:MM'"""
+    if isinstance(value, str):
+        hour, minute = value.split(':')[:2]
+        value = time(int(hour), int(minute))
+    return value.hour * 60 + value.minute
+
+
+def _days(value: str) -> List[date]:
+    """Días de 'YYYY-MM-DD' o de un rango 'YYYY-MM-DD..YYYY-MM-DD' (inclusive)"""
+    first, _, last = value.partition('..')
+    start = date.fromisoformat(first.strip())
+    end = date.fromisoformat(last.strip()) if last else start
+    if end < start:
+        raise ValueError(f"Rango de fechas invertido: {value}")
+    return [start + timedelta(days=offset) for offset in range((end - start).days + 1)]
+
+
+class WorkSchedule:
+    """Horarios de atención de la clínica y de cada profesional
+
+    Cada día se representa como un entero cuyo bit i es el turno que empieza
+    en i * slot_minutes. La definición admite:
+
+    - 'slot_minutes': duración de la grilla (30 por defecto)
+    - 'weekly': {'mon'..'sun': ['HH:MM-HH:MM', ...]}; un día ausente está cerrado
+    - 'closed': fechas o rangos 'YYYY-MM-DD..YYYY-MM-DD' sin atención (feriados)
+    - 'dates': {'YYYY-MM-DD': ['HH:MM-HH:MM', ...]} horarios especiales de un día
+    - 'professionals': {nombre: {'weekly', 'closed', 'dates'}} agenda propia de un
+      profesional (sin 'weekly' usa la de la clínica); sus licencias van en 'closed'
+
+    Los feriados y horarios especiales de la clínica valen también para cada
+    profesional. Todo se resuelve al compilar: obtener la máscara de un día
+    son dos búsquedas en diccionarios, sin importar cuántas reglas haya.
+    """
+
+    def __init__(self, spec: Optional[Dict[str, Any]] = None):
+        spec = DEFAULT_SCHEDULE if spec is None else spec
+        self.slot_minutes = int(spec.get('slot_minutes', DEFAULT_SCHEDULE['slot_minutes']))
+        if self.slot_minutes <= 0 or MINUTES_PER_DAY % self.slot_minutes:
+            raise ValueError(f"slot_minutes debe dividir al día en partes iguales: {self.slot_minutes}")
+        self.slots_per_day = MINUTES_PER_DAY // self.slot_minutes
+        self.full = (1 << self.slots_per_day) - 1
+        self.labels = tuple(
+            f'{minute // 60:02d}:{minute % 60:02d}' for minute in range(0, MINUTES_PER_DAY, self.slot_minutes)
+        )
+        clinic_weekly = self._compile_weekly(spec.get('weekly', {}))
+        clinic_days = self._compile_days(spec)
+        self._weekly: Dict[Optional[str], Tuple[int, ...]] = {None: clinic_weekly}
+        self._overrides: Dict[Tuple[Optional[str], date], int] = {
+            (None, day): mask for day, mask in clinic_days.items()
+        }
+        for name, calendar in spec.get('professionals', {}).items():
+            weekly = self._compile_weekly(calendar['weekly']) if 'weekly' in calendar else clinic_weekly
+            self._weekly[name] = weekly
+            for day, mask in clinic_days.items():
+                self._overrides[(name, day)] = weekly[day.weekday()] & mask
+            for day, mask in self._compile_days(calendar).items():
+                self._overrides[(name, day)] = mask & clinic_days.get(day, self.full)
+
+    def day_mask(self, day: date, professional: Optional[str] = None) -> int:
+        """Horarios de atención de un día; un profesional sin agenda propia usa la de la clínica"""
+        if professional not in self._weekly:
+            professional = None
+        mask = self._overrides.get((professional, day))
+        return self._weekly[professional][day.weekday()] if mask is None else mask
+
+    def reachable(self, professional: Optional[str] = None, weekdays: Optional[Iterable[int]] = None) -> int:
+        """Horarios que algún día de `weekdays` (0 = lunes; todos por defecto) puede tener abiertos"""
+        if professional not in self._weekly:
+            professional = None
+        weekdays = set(range(7)) if weekdays is None else set(weekdays)
+        mask = 0
+        for weekday in weekdays:
+            mask |= self._weekly[professional][weekday]
+        for (name, day), day_mask in self._overrides.items():
+            if name == professional and day.weekday() in weekdays:
+                mask |= day_mask
+        return mask
+
+    def slot_index(self, value: Any) -> int:
+        """Posición en la grilla del turno que contiene a la hora `value`"""
+        return _minutes(value) // self.slot_minutes
+
+    def booked_mask(self, bookings: Iterable[Tuple[Any, int]]) -> int:
+        """Máscara de los horarios que tocan turnos (hora de inicio, duración en minutos)"""
+        mask = 0
+        for start, duration in bookings:
+            first = _minutes(start)
+            mask |= self._span(first // self.slot_minutes, -(-(first + duration) // self.slot_minutes))
+        return mask & self.full
+
+    def fits(self, free: int, duration: int) -> int:
+        """Horarios libres desde los que hay `duration` minutos seguidos libres"""
+        # Un AND por cada turno extra de la grilla que ocupa la duración
+        for shift in range(1, -(-duration // self.slot_minutes)):
+            free &= free >> shift
+        return free
+
+    def window(self, earliest: Any = None, latest: Any = None) -> int:
+        """Horarios que empiezan entre earliest y latest (inclusive)"""
+        first = 0 if earliest is None else -(-_minutes(earliest) // self.slot_minutes)
+        last = self.slots_per_day - 1 if latest is None else _minutes(latest) // self.slot_minutes
+        return self._span(first, last + 1)
+
+    def after(self, value: Any) -> int:
+        """Horarios que empiezan estrictamente después de `value`"""
+        return self._span(_minutes(value) // self.slot_minutes + 1, self.slots_per_day)
+
+    def free_mask(self, day: date, booked: int = 0, professional: Optional[str] = None) -> int:
+        return self.day_mask(day, professional) & ~booked
+
+    def slots(self, mask: int) -> List[str]:
+        """Horarios 'HH:MM' de una máscara, en orden"""
+        labels = []
+        while mask:
+            lowest = mask & -mask
+            labels.append(self.labels[lowest.bit_length() - 1])
+            mask ^= lowest
+        return labels
+
+    @staticmethod
+    def count(mask: int) -> int:
+        return bin(mask).count('1')
+
+    def _span(self, first: int, stop: int) -> int:
+        # Bits [first, stop) de la grilla
+        if stop <= first:
+            return 0
+        return ((1 << (stop - first)) - 1) << first
+
+    def _windows(self, windows: Iterable[str]) -> int:
+        # 'HH:MM-HH:MM': los turnos que empiezan y terminan dentro del intervalo
+        mask = 0
+        for window in windows:
+            start, end = (_minutes(part.strip()) for part in window.split('-'))
+            mask |= self._span(-(-start // self.slot_minutes), end // self.slot_minutes)
+        return mask
+
+    def _compile_weekly(self, weekly: Dict[str, List[str]]) -> Tuple[int, ...]:
+        unknown = set(weekly) - set(WEEKDAYS)
+        if unknown:
+            raise ValueError(f"Días de la semana desconocidos: {', '.join(sorted(unknown))}")
+        return tuple(self._windows(weekly.get(day, ())) for day in WEEKDAYS)
+
+    def _compile_days(self, spec: Dict[str, Any]) -> Dict[date, int]:
+        days = {}
+        for value, windows in spec.get('dates', {}).items():
+            for day in _days(value):
+                days[day] = self._windows(windows)
+        for value in spec.get('closed', ()):
+            for day in _days(value):
+                days[day] = 0
+        return days
+
+
+def load_schedule(value: str = WORK_SCHEDULE) -> WorkSchedule:
+    """Compila WORK_SCHEDULE: vacío usa DEFAULT_SCHEDULE, '{...}' es JSON y otro valor, la ruta de un archivo JSON"""
+    if not value:
+        return WorkSchedule()
+    if value.lstrip().startswith('{'):
+        return WorkSchedule(json.loads(value))
+    with open(value, encoding='utf-8') as f:
+        return WorkSchedule(json.load(f))
+
+
+work_schedule = load_schedule()
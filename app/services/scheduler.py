@@ -1,5 +1,6 @@
 from apscheduler.schedulers.background import BackgroundScheduler
 from app.services.agenda_service import send_followup_messages, mark_absences_and_send_followup
+from app.db.queries import archive_old_appointments, purge_expired_conversation_states
 
 scheduler = BackgroundScheduler()
 
@@ -11,4 +12,6 @@ def init_scheduler(app=None):
     """
     scheduler.add_job(send_followup_messages, 'cron', hour=8, minute=0)  # Seguimiento post-turno
     scheduler.add_job(mark_absences_and_send_followup, 'cron', hour=9, minute=0)  # Gestión de ausencias
+    scheduler.add_job(purge_expired_conversation_states, 'interval', minutes=30)  # Estados de conversación vencidos
+    scheduler.add_job(archive_old_appointments, 'cron', hour=3, minute=0)  # Archivo de turnos cerrados
     scheduler.start() 
\ No newline at end of file
@@ -2,6 +2,7 @@
 import requests
 import logging
 from app.config import TWILIO_ACCOUNT_SID, TWILIO_AUTH_TOKEN, TWILIO_PHONE_NUMBER
+from app.utils.phone import whatsapp_address
 try:
     from twilio.rest import Client
 except ImportError:
@@ -19,7 +20,7 @@ def send_whatsapp_message(phone_number, message):
         account_sid = TWILIO_ACCOUNT_SID
         auth_token = TWILIO_AUTH_TOKEN
         from_whatsapp_number = TWILIO_PHONE_NUMBER
-        to_whatsapp_number = f'whatsapp:{phone_number}' if not phone_number.startswith('whatsapp:') else phone_number
+        to_whatsapp_number = whatsapp_address(phone_number)
         client = Client(account_sid, auth_token)
         try:
             client.messages.create(
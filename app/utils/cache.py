@@ -0,0 +1,150 @@
+"""
+Caché en memoria con expiración (TTL) y desalojo LRU
+Acota la memoria de estructuras que crecen con cada paciente que escribe
+"""
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+logger = logging.getLogger('asistente_salud')
+
+_MISSING = object()
+
+
+class TTLCache:
+    """Diccionario acotado: cada entrada vence a los `ttl` segundos sin uso
+    y, al superar `maxsize`, se desaloja la usada hace más tiempo
+
+    Las lecturas renuevan la posición LRU pero no el vencimiento; las
+    escrituras renuevan ambos. Es seguro entre hilos.
+    """
+
+    def __init__(self, ttl: float, maxsize: int, clock=time.monotonic):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self._clock = clock
+        self._data: OrderedDict = OrderedDict()  # clave -> [valor, vence]
+        self._lock = threading.Lock()
+        self._sweeper: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def get(self, key, default=None):
+        """Valor vigente de la clave o `default` si no existe o venció"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            if entry[1] <= self._clock():
+                del self._data[key]
+                self.expirations += 1
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def get_entry(self, key):
+        """(valor, segundos restantes) de la clave vigente, o None; cuenta como get()"""
+        with self._lock:
+            entry = self._data.get(key)
+            now = self._clock()
+            if entry is None or entry[1] <= now:
+                if entry is not None:
+                    del self._data[key]
+                    self.expirations += 1
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[0], entry[1] - now
+
+    def set(self, key, value, ttl: Optional[float] = None):
+        """Guarda el valor, renueva su vencimiento y desaloja por LRU si hace falta
+
+        `ttl` reemplaza el vencimiento por defecto sólo para esta entrada.
+        """
+        with self._lock:
+            self._data[key] = [value, self._clock() + (self.ttl if ttl is None else ttl)]
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def pop(self, key, default=None):
+        """Quita la clave y devuelve su valor vigente"""
+        with self._lock:
+            entry = self._data.pop(key, None)
+        if entry is None or entry[1] <= self._clock():
+            return default
+        return entry[0]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def items(self):
+        """Lista (clave, valor, segundos restantes) de las entradas vigentes"""
+        now = self._clock()
+        with self._lock:
+            return [(key, entry[0], entry[1] - now) for key, entry in self._data.items() if entry[1] > now]
+
+    def sweep(self) -> int:
+        """Elimina las entradas vencidas; devuelve cuántas quitó"""
+        now = self._clock()
+        with self._lock:
+            expired = [key for key, entry in self._data.items() if entry[1] <= now]
+            for key in expired:
+                del self._data[key]
+            self.expirations += len(expired)
+        return len(expired)
+
+    def stats(self) -> Dict[str, int]:
+        """Contadores de uso para métricas y diagnóstico"""
+        return {
+            'size': len(self._data),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'expirations': self.expirations
+        }
+
+    def start_sweeper(self, interval: float):
+        """Lanza un hilo daemon que ejecuta sweep() cada `interval` segundos"""
+        if self._sweeper is not None or interval <= 0:
+            return
+        self._stop.clear()
+
+        def run():
+            while not self._stop.wait(interval):
+                try:
+                    removed = self.sweep()
+                    if removed:
+                        logger.debug(f"Caché: {removed} entradas vencidas eliminadas")
+                except Exception as e:
+                    logger.error(f"Error en el barrido de la caché: {str(e)}")
+
+        self._sweeper = threading.Thread(target=run, name='ttl-cache-sweeper', daemon=True)
+        self._sweeper.start()
+
+    def stop_sweeper(self):
+        """Detiene el hilo de barrido, si está activo"""
+        if self._sweeper is None:
+            return
+        self._stop.set()
+        self._sweeper.join(timeout=1)
+        self._sweeper = None
@@ -0,0 +1,94 @@
+"""
+Exportación de turnos, notificaciones y feedback en NDJSON o CSV
+Arma la salida por bloques a partir de un iterador de filas, sin construir el archivo en memoria
+"""
+
+import csv
+import io
+import json
+from datetime import date, datetime, time
+from enum import Enum
+from typing import Any, Dict, Iterable, Iterator, Sequence
+
+from app.db.backends.sql import APPOINTMENT_COLUMNS, NOTIFICATION_COLUMNS, FEEDBACK_COLUMNS
+
+# Tamaño aproximado (caracteres) de cada bloque que se entrega al servidor WSGI
+CHUNK_SIZE = 64 * 1024
+
+EXPORT_COLUMNS = {
+    'appointments': APPOINTMENT_COLUMNS,
+    'notifications': NOTIFICATION_COLUMNS,
+    'feedback': FEEDBACK_COLUMNS
+}
+
+# Caracteres con los que una hoja de cálculo interpreta la celda como fórmula
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+EXPORT_FORMATS = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv'
+}
+
+
+def _plain(value: Any) -> Any:
+    """Fechas y horas en ISO 8601 y enums por su valor"""
+    if isinstance(value, (datetime, date, time)):
+        return value.isoformat()
+    if isinstance(value, Enum):
+        return value.value
+    raise TypeError(f"Tipo no exportable: {type(value).__name__}")
+
+
+_encoder = json.JSONEncoder(separators=(',', ':'), ensure_ascii=False, default=_plain)
+
+
+def _cell(value: Any) -> Any:
+    if isinstance(value, bool):
+        return 'true' if value else 'false'
+    if isinstance(value, str):
+        # Texto que cargó el paciente: con un apóstrofo adelante se muestra tal cual
+        return "'" + value if value.startswith(FORMULA_PREFIXES) else value
+    if value is None or isinstance(value, (int, float)):
+        return value
+    return _plain(value)
+
+
+def ndjson_lines(rows: Iterable[Dict[str, Any]], columns: Sequence[str]) -> Iterator[str]:
+    """Una línea JSON por fila, con las columnas en orden fijo"""
+    for row in rows:
+        yield _encoder.encode({name: row.get(name) for name in columns}) + '\n'
+
+
+def csv_lines(rows: Iterable[Dict[str, Any]], columns: Sequence[str]) -> Iterator[str]:
+    """Encabezado y una línea CSV por fila, reutilizando un único buffer"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    for row in rows:
+        writer.writerow([_cell(row.get(name)) for name in columns])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    # Sin filas todavía queda el encabezado en el buffer
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def chunked(lines: Iterable[str], size: int = CHUNK_SIZE) -> Iterator[str]:
+    """Agrupa líneas en bloques de ~`size` caracteres para no escribir fila por fila"""
+    pending, length = [], 0
+    for line in lines:
+        pending.append(line)
+        length += len(line)
+        if length >= size:
+            yield ''.join(pending)
+            pending, length = [], 0
+    if pending:
+        yield ''.join(pending)
+
+
+def export_stream(kind: str, rows: Iterable[Dict[str, Any]], fmt: str = 'ndjson') -> Iterator[str]:
+    """Bloques de texto de la exportación `kind` en el formato pedido"""
+    columns = EXPORT_COLUMNS[kind]
+    lines = csv_lines(rows, columns) if fmt == 'csv' else ndjson_lines(rows, columns)
+    return chunked(lines)
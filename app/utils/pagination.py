@@ -0,0 +1,65 @@
+"""
+Paginación por cursor (keyset) de listados de turnos y de la línea de tiempo del paciente
+El cursor es opaco para el cliente: codifica la clave (fecha, hora, id) del último turno devuelto
+o la clave (instante, tipo, id) del último evento
+"""
+
+import base64
+from datetime import date, time
+from typing import Any, Dict, Optional, Tuple
+
+from app.db.store import order_key
+from app.db.timeline import EVENT_TYPES, event_key, moment_key
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+
+def encode_cursor(appointment: Dict[str, Any]) -> str:
+    """Cursor que apunta justo después de `appointment`"""
+    day, hour, appointment_id = order_key(appointment)
+    raw = f"{day}|{hour}|{appointment_id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Tuple[str, str, int]]:
+    """Clave (fecha, hora, id) de un cursor; ValueError si está mal formado"""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        day, hour, appointment_id = raw.split('|')
+        # Valida formato: se conservan como texto ISO, que ordena igual que los tipos
+        date.fromisoformat(day)
+        time.fromisoformat(hour)
+        return day, hour, int(appointment_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError('Cursor inválido') from e
+
+
+def encode_event_cursor(event: Dict[str, Any]) -> str:
+    """Cursor que apunta justo después de `event` en la línea de tiempo"""
+    raw = '|'.join(str(part) for part in event_key(event))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_event_cursor(cursor: Optional[str]) -> Optional[Tuple[str, str, int]]:
+    """Clave (instante, tipo, id) de un cursor de eventos; ValueError si está mal formado"""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        moment, kind, event_id = raw.split('|')
+        if kind not in EVENT_TYPES:
+            raise ValueError(kind)
+        # Valida el instante y lo lleva al ancho fijo de las claves de la línea de tiempo
+        return moment_key(moment), kind, int(event_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError('Cursor inválido') from e
+
+
+def parse_limit(value: Optional[str]) -> int:
+    """Tamaño de página pedido, acotado a [1, MAX_PAGE_SIZE]; ValueError si no es entero"""
+    if value in (None, ''):
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(int(value), MAX_PAGE_SIZE))
@@ -0,0 +1,66 @@
+"""
+Normalización de teléfonos a E.164
+Una única clave canónica por paciente para índices, estados de conversación y consultas
+"""
+
+import re
+import sys
+from functools import lru_cache
+from typing import Optional
+
+from app.config import DEFAULT_COUNTRY_CODE
+
+WHATSAPP_PREFIX = 'whatsapp:'
+
+# Un número nacional (sin código de país) tiene a lo sumo 10 dígitos
+NATIONAL_MAX_DIGITS = 10
+
+_SEPARATORS = re.compile(r'[\s\-().]')
+_E164 = re.compile(r'\+[1-9][0-9]{7,14}')
+
+
+@lru_cache(maxsize=65536)
+def normalize_phone(raw: Optional[str]) -> Optional[str]:
+    """Forma E.164 internada de un teléfono, o None si no es un número válido
+
+    Acepta el prefijo 'whatsapp:' de Twilio, separadores (espacios, guiones,
+    paréntesis, puntos), el prefijo internacional 00 y números nacionales, a
+    los que antepone DEFAULT_COUNTRY_CODE. 'whatsapp:+54 9 11 1234-5678',
+    '005491112345678' y '+5491112345678' dan la misma clave.
+    """
+    if not raw:
+        return None
+    value = str(raw).strip()
+    if value[:len(WHATSAPP_PREFIX)].lower() == WHATSAPP_PREFIX:
+        value = value[len(WHATSAPP_PREFIX):]
+    value = _SEPARATORS.sub('', value)
+    if value.startswith('00'):
+        value = '+' + value[2:]
+    elif not value.startswith('+'):
+        if not (value.isascii() and value.isdigit()):
+            return None
+        # Con el 0 de larga distancia o sin código de país: número nacional
+        if value.startswith('0') or len(value) <= NATIONAL_MAX_DIGITS:
+            value = '+' + DEFAULT_COUNTRY_CODE + value.lstrip('0')
+        else:
+            value = '+' + value
+    if not _E164.fullmatch(value):
+        return None
+    # Internado: todos los índices comparten el mismo objeto por paciente
+    return sys.intern(value)
+
+
+def phone_key(raw: Optional[str]) -> Optional[str]:
+    """Clave con la que se guarda y se busca un teléfono
+
+    La forma E.164 si se puede normalizar; si no, el valor tal cual, para no
+    perder datos que no tienen forma de número (identificadores de prueba).
+    """
+    if raw is None:
+        return None
+    return normalize_phone(raw) or raw
+
+
+def whatsapp_address(phone_number: str) -> str:
+    """Destinatario para Twilio ('whatsapp:+549...') sin duplicar el prefijo"""
+    return WHATSAPP_PREFIX + phone_key(phone_number)
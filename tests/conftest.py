@@ -0,0 +1,23 @@
+import pytest
+from app.db.backends import MemoryBackend, set_backend
+from app.db.backends.sqlite import SQLiteBackend
+from app.db.query_cache import query_cache
+from app.main import create_app
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def backend(request, tmp_path):
+    """Backend activo durante el test: cada test corre contra memoria y contra SQLite"""
+    if request.param == 'sqlite':
+        backend = set_backend(SQLiteBackend(str(tmp_path / 'test.db')))
+    else:
+        backend = set_backend(MemoryBackend())
+    query_cache.reset()
+    yield backend
+    set_backend(MemoryBackend())
+
+@pytest.fixture
+def client():
+    app = create_app()
+    app.config['TESTING'] = True
+    with app.test_client() as client:
+        yield client
@@ -1,4 +1,5 @@
 import pytest
+from app.db.errors import SlotUnavailableError
 from app.services.agenda_service import AgendaService
 from app.schemas.turno_schema import TurnoCreate, EstadoTurno
 from unittest.mock import patch
@@ -19,13 +20,19 @@ def turno_data():
         notes='Test unitario'
     )
 
-@patch('app.services.agenda_service.create_appointment', return_value=1)
-@patch('app.services.agenda_service.AgendaService._check_availability', return_value=True)
-def test_create_appointment_success(mock_check, mock_create, agenda_service, turno_data):
+@patch('app.services.agenda_service.create_appointment', return_value={'id': 1})
+def test_create_appointment_success(mock_create, agenda_service, turno_data):
     result = agenda_service.create_appointment(turno_data)
     assert result['success'] is True
     assert 'appointment_id' in result
 
+@patch('app.services.agenda_service.create_appointment', side_effect=SlotUnavailableError)
+def test_create_appointment_slot_taken(mock_create, agenda_service, turno_data):
+    # El conflicto lo detecta la base al guardar, no una consulta previa de la agenda
+    result = agenda_service.create_appointment(turno_data)
+    assert result['success'] is False
+    assert result['error'] == 'SLOT_UNAVAILABLE'
+
 @patch('app.services.agenda_service.get_appointment', return_value=None)
 def test_get_appointment_not_found(mock_get, agenda_service):
     result = agenda_service.get_appointment(999)
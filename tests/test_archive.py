@@ -0,0 +1,92 @@
+import pytest
+from datetime import date, time
+from app.db import queries
+from app.db.archive import MonthlyArchive
+from app.db.backends import MemoryBackend, set_backend
+from app.db.backends.sqlite import SQLiteBackend
+
+TODAY = date(2030, 6, 1)
+PHONE = '+5491112345678'
+
+pytestmark = pytest.mark.usefixtures('backend')
+
+def _book(day, hour, status, phone=PHONE):
+    appointment = queries.save_appointment({
+        'phone_number': phone,
+        'appointment_date': day,
+        'appointment_time': time(hour, 0)
+    })
+    queries.update_appointment(appointment['id'], {'status': status})
+    return appointment['id']
+
+def _history():
+    return {
+        'completed': _book(date(2028, 3, 10), 9, 'completado'),
+        'cancelled': _book(date(2028, 3, 10), 10, 'cancelado'),
+        'absent': _book(date(2028, 4, 2), 9, 'ausente'),
+        'pending': _book(date(2028, 3, 10), 11, 'pendiente'),
+        'recent': _book(date(2030, 3, 1), 9, 'completado'),
+        'future': _book(date(2030, 7, 1), 9, 'confirmado')
+    }
+
+def test_archive_moves_only_old_closed_appointments(backend):
+    ids = _history()
+    queries.insert_attachment({'phone_number': PHONE, 'filename': 'receta.pdf', 'appointment_id': ids['absent']})
+    assert queries.archive_old_appointments(TODAY) == 2
+    assert str(backend.archived_until()) == '2028-03-10'
+    remaining = {apt['id'] for apt in backend.get_appointments()}
+    assert remaining == {ids['absent'], ids['pending'], ids['recent'], ids['future']}
+    # Repetir el job no mueve nada más
+    assert queries.archive_old_appointments(TODAY) == 0
+
+def test_queries_reach_the_archive_only_when_asked(backend):
+    ids = _history()
+    queries.archive_old_appointments(TODAY)
+    assert [apt['id'] for apt in queries.get_appointments_by_date(date(2028, 3, 10))] == [
+        ids['completed'], ids['cancelled'], ids['pending']
+    ]
+    in_range = queries.get_appointments_by_date_range(date(2028, 1, 1), date(2028, 12, 31))
+    assert [apt['id'] for apt in in_range] == [ids['completed'], ids['cancelled'], ids['pending'], ids['absent']]
+    assert queries.get_appointment(ids['completed'])['status'] == 'completado'
+    exported = [apt['id'] for apt in queries.iter_appointments(start_date=date(2028, 1, 1))]
+    assert exported == [ids['completed'], ids['cancelled'], ids['pending'], ids['absent'], ids['recent'], ids['future']]
+    # Sin start_date, o con el teléfono, se leen sólo los turnos activos
+    assert len(list(queries.iter_appointments())) == 3
+    assert ids['completed'] not in {apt['id'] for apt in queries.get_appointments(PHONE)}
+    assert queries.get_last_appointment(PHONE)['id'] == ids['future']
+
+def test_pages_merge_the_archive_in_order():
+    ids = _history()
+    queries.archive_old_appointments(TODAY)
+    seen, after = [], None
+    while True:
+        page = queries.get_appointments_page(after, 2, start_date=date(2028, 1, 1))
+        seen += [apt['id'] for apt in page]
+        if len(page) < 2:
+            break
+        after = (str(page[-1]['appointment_date']), str(page[-1]['appointment_time']), page[-1]['id'])
+    assert seen == [ids['completed'], ids['cancelled'], ids['pending'], ids['absent'], ids['recent'], ids['future']]
+
+def test_memory_archive_survives_restart_and_replay(backend, tmp_path):
+    if isinstance(backend, SQLiteBackend):
+        pytest.skip('journal del backend en memoria')
+    journal_dir = str(tmp_path / 'journal')
+    set_backend(MemoryBackend(journal_dir))
+    ids = _history()
+    queries.archive_old_appointments(TODAY)
+    restarted = set_backend(MemoryBackend(journal_dir))
+    assert restarted.get_appointment(ids['completed']) is None
+    assert restarted.get_archived_appointment(ids['completed'])['status'] == 'completado'
+    assert len(restarted.archive) == 3
+    assert len(list(restarted.iter_archived_appointments())) == 3
+
+def test_monthly_archive_add_is_idempotent(tmp_path):
+    archive = MonthlyArchive(str(tmp_path))
+    row = {'id': 1, 'phone_number': PHONE, 'appointment_date': '2028-03-10', 'appointment_time': '09:00:00'}
+    archive.add([row])
+    archive.add([dict(row, status='completado')])
+    reopened = MonthlyArchive(str(tmp_path))
+    assert len(reopened) == 1 and str(reopened.until) == '2028-03-10'
+    assert reopened.get(1)['status'] == 'completado'
+    assert [record['id'] for record in reopened.scan(date(2028, 3, 1), date(2028, 3, 31))] == [1]
+    assert list(reopened.scan(date(2028, 4, 1))) == []
@@ -0,0 +1,223 @@
+import importlib
+import pytest
+from datetime import date, time, timedelta
+from app.config import AVAILABILITY_SEARCH_DAYS
+from app.db import queries
+from app.db.query_cache import availability_cache
+from app.main import create_app
+from app.schemas.turno_schema import TurnoCreate, TurnoUpdate
+from app.services.agenda_service import AgendaService
+from app.services.schedule import work_schedule
+
+START = date(2030, 1, 14)
+
+pytestmark = pytest.mark.usefixtures('backend')
+
+def _slots(day):
+    return work_schedule.slots(work_schedule.day_mask(day))
+
+def _fill(day, professional=None, skip=()):
+    for slot in _slots(day):
+        if slot in skip:
+            continue
+        hour, minute = map(int, slot.split(':'))
+        queries.save_appointment({
+            'phone_number': '+5491112345678',
+            'appointment_date': day,
+            'appointment_time': time(hour, minute),
+            'professional': professional
+        })
+
+def test_first_free_slot_skips_full_days():
+    for offset in range(3):
+        _fill(START + timedelta(days=offset))
+    service = AgendaService()
+    assert service.find_next_available(START) == [{'date': '2030-01-17', 'time': '09:00'}]
+    thursday = len(_slots(date(2030, 1, 17)))
+    found = service.find_next_available(START, count=thursday + 2)
+    assert [slot['date'] for slot in found] == ['2030-01-17'] * thursday + ['2030-01-18'] * 2
+
+def test_cancelled_appointments_free_their_slot():
+    _fill(START, skip=('17:00',))
+    appointment = queries.get_appointments_by_date(START)[0]
+    queries.update_appointment(appointment['id'], {'status': 'cancelado'})
+    assert AgendaService().find_next_available(START, count=2) == [
+        {'date': '2030-01-14', 'time': '09:00'}, {'date': '2030-01-14', 'time': '17:00'}
+    ]
+
+def test_constraints_filter_slots():
+    _fill(START, professional='Dra. Gómez')
+    service = AgendaService()
+    # Los turnos de otro profesional no ocupan su agenda
+    assert service.find_next_available(START, constraints={'professional': 'Dr. Pérez'})[0]['date'] == '2030-01-14'
+    assert service.find_next_available(START, constraints={'professional': 'Dra. Gómez'})[0]['date'] == '2030-01-15'
+    # Sólo miércoles por la tarde
+    assert service.find_next_available(START, constraints={'weekdays': {2}, 'earliest': '14:00'}) == [
+        {'date': '2030-01-16', 'time': '14:00'}
+    ]
+    assert service.find_next_available(START, constraints={'latest': '08:00', 'max_days': 30}) == []
+
+def test_distant_opening_costs_few_queries(backend, monkeypatch):
+    for offset in range(40):
+        _fill(START + timedelta(days=offset))
+    agenda_module = importlib.import_module('app.services.agenda_service')
+    calls = []
+    original = agenda_module.get_appointments_by_date_range
+    monkeypatch.setattr(agenda_module, 'get_appointments_by_date_range',
+                        lambda start, end: calls.append((start, end)) or original(start, end))
+    assert AgendaService().find_next_available(START) == [{'date': '2030-02-23', 'time': '09:00'}]
+    # Ventanas de 7, 14 y 28 días: tres consultas en lugar de cuarenta y una
+    assert [(end - start).days + 1 for start, end in calls] == [7, 14, 28]
+
+def test_next_available_endpoint():
+    _fill(START)
+    app = create_app()
+    with app.test_client() as client:
+        response = client.get('/api/v1/available-slots/next?from=2030-01-14&count=2&after=10:00')
+        assert response.status_code == 200
+        assert response.get_json()['slots'] == [
+            {'date': '2030-01-15', 'time': '10:00'}, {'date': '2030-01-15', 'time': '10:30'}
+        ]
+        assert client.get('/api/v1/available-slots/next?weekdays=7').status_code == 400
+        assert client.get('/api/v1/available-slots/next?from=14/01/2030').status_code == 400
+
+def test_free_slots_are_cached_per_day(monkeypatch):
+    agenda_module = importlib.import_module('app.services.agenda_service')
+    calls = []
+    original = agenda_module.get_appointments_by_date
+    monkeypatch.setattr(agenda_module, 'get_appointments_by_date', lambda day: calls.append(day) or original(day))
+    service = AgendaService()
+    for _ in range(3):
+        assert service.get_available_slots(START)[0] == '09:00'
+    assert service.get_available_slots(START, duration=60)[0] == '09:00'
+    assert calls == [START]
+    assert availability_cache.stats()['hits'] == 3
+
+def test_bookings_invalidate_only_their_days():
+    service = AgendaService()
+    service.get_available_slots(START)
+    service.get_available_slots(START + timedelta(days=1))
+    service.get_available_slots(START + timedelta(days=2))
+    result = service.create_appointment(TurnoCreate(
+        phone_number='+5491112345678', appointment_date=START, appointment_time=time(9, 0)
+    ))
+    assert len(availability_cache) == 2
+    assert '09:00' not in service.get_available_slots(START)
+    # Mover el turno invalida el día de origen y el de destino
+    service.update_appointment(result['appointment_id'], TurnoUpdate(appointment_date=START + timedelta(days=1)))
+    assert len(availability_cache) == 1
+    assert '09:00' in service.get_available_slots(START)
+    assert '09:00' not in service.get_available_slots(START + timedelta(days=1))
+    service.cancel_appointment(result['appointment_id'])
+    assert '09:00' in service.get_available_slots(START + timedelta(days=1))
+    assert service.get_available_slots(START + timedelta(days=2))[0] == '09:00'
+    assert availability_cache.stats()['hits'] == 1
+
+def test_warm_up_reads_the_range_once(monkeypatch):
+    agenda_module = importlib.import_module('app.services.agenda_service')
+    calls = []
+    original = agenda_module.get_appointments_by_date_range
+    monkeypatch.setattr(agenda_module, 'get_appointments_by_date_range',
+                        lambda start, end: calls.append((start, end)) or original(start, end))
+    service = AgendaService()
+    assert service.warm_availability(10) == 10
+    assert len(calls) == 1
+    today = date.today()
+    service.find_next_available(today, count=5, constraints={'max_days': 7})
+    service.get_available_slots(today + timedelta(days=3))
+    assert len(calls) == 1
+
+def test_metrics_expose_hit_rate_and_staleness():
+    AgendaService().get_available_slots(START)
+    AgendaService().get_available_slots(START)
+    app = create_app()
+    with app.test_client() as client:
+        metrics = client.get('/api/v1/metrics').get_json()
+    assert metrics['availability_cache']['hit_rate'] > 0
+    assert 'max_hit_age' in metrics['availability_cache'] and 'hit_rate' in metrics['query_cache']
+
+def test_month_availability_in_one_query(monkeypatch):
+    _fill(START, skip=('17:00',))
+    queries.save_appointment({'phone_number': '+5491112345678', 'appointment_date': START + timedelta(days=1),
+                              'appointment_time': time(9, 0), 'duration_minutes': 60})
+    agenda_module = importlib.import_module('app.services.agenda_service')
+    calls = []
+    original = agenda_module.get_appointments_by_date_range
+    monkeypatch.setattr(agenda_module, 'get_appointments_by_date_range',
+                        lambda start, end: calls.append((start, end)) or original(start, end))
+    service = AgendaService()
+    days = service.get_month_availability(2030, 1)
+    assert len(days) == 31 and calls == [(date(2030, 1, 1), date(2030, 1, 31))]
+    by_date = {day['date']: day for day in days}
+    assert by_date['2030-01-14'] == {'date': '2030-01-14', 'free': 1, 'booked': 12, 'first_free': '17:00'}
+    assert by_date['2030-01-15'] == {'date': '2030-01-15', 'free': 11, 'booked': 1, 'first_free': '10:00'}
+    assert by_date['2030-01-20'] == {'date': '2030-01-20', 'free': 0, 'booked': 0, 'first_free': None}
+    # Los días del mes quedan en caché y un turno nuevo invalida sólo ese mes
+    service.get_month_availability(2030, 1)
+    service.get_available_slots(date(2030, 1, 16))
+    service.get_month_availability(2030, 2)
+    assert len(calls) == 2
+    service.create_appointment(TurnoCreate(
+        phone_number='+5491112345678', appointment_date=START, appointment_time=time(17, 0)
+    ))
+    service.get_month_availability(2030, 2)
+    assert len(calls) == 2
+    assert service.get_month_availability(2030, 1)[13]['first_free'] is None
+    assert len(calls) == 3
+
+def test_month_availability_endpoint():
+    app = create_app()
+    with app.test_client() as client:
+        response = client.get('/api/v1/availability/month?year=2030&month=2')
+        assert response.status_code == 200
+        body = response.get_json()
+        assert len(body['days']) == 28 and body['days'][0]['date'] == '2030-02-01'
+        assert client.get('/api/v1/availability/month?year=2030&month=13').status_code == 400
+        assert client.get('/api/v1/availability/month?year=abc').status_code == 400
+
+def test_listed_slots_can_be_booked():
+    service = AgendaService()
+    assert service.create_appointment(TurnoCreate(
+        phone_number='+5491112345678', appointment_date=START, appointment_time=time(10, 0), professional='dr_a'
+    ))['success']
+    # La agenda de la clínica ya no ofrece las 10:00, y reservarlas sin profesional se rechaza
+    assert '10:00' not in service.get_available_slots(START)
+    assert service.create_appointment(TurnoCreate(
+        phone_number='+5491112345678', appointment_date=START, appointment_time=time(10, 0)
+    ))['error'] == 'SLOT_UNAVAILABLE'
+    assert '10:00' in service.get_available_slots(START, 'dr_b')
+    assert service.create_appointment(TurnoCreate(
+        phone_number='+5491112345678', appointment_date=START, appointment_time=time(11, 0)
+    ))['success']
+    # El turno sin profesional ocupa también la agenda de cada profesional
+    assert '11:00' not in service.get_available_slots(START, 'dr_b')
+    assert service.create_appointment(TurnoCreate(
+        phone_number='+5491112345678', appointment_date=START, appointment_time=time(11, 0), professional='dr_b'
+    ))['error'] == 'SLOT_UNAVAILABLE'
+
+def test_impossible_constraints_read_nothing(monkeypatch):
+    agenda_module = importlib.import_module('app.services.agenda_service')
+    calls = []
+    original = agenda_module.get_appointments_by_date_range
+    monkeypatch.setattr(agenda_module, 'get_appointments_by_date_range',
+                        lambda start, end: calls.append((start, end)) or original(start, end))
+    service = AgendaService()
+    assert service.find_next_available(START, constraints={'earliest': '23:00', 'latest': '23:30', 'max_days': 100000}) == []
+    assert service.find_next_available(START, constraints={'weekdays': {6}, 'max_days': 100000}) == []
+    assert service.find_next_available(START, constraints={'weekdays': {5}, 'earliest': '13:00'}) == []
+    assert calls == []
+    # Un rango que pasaría date.max se acota en lugar de fallar
+    assert service.find_next_available(date(9999, 12, 27), constraints={'max_days': 30}) == [
+        {'date': '9999-12-27', 'time': '09:00'}
+    ]
+
+def test_endpoint_caps_search_days(monkeypatch):
+    agenda_module = importlib.import_module('app.services.agenda_service')
+    seen = []
+    original = agenda_module.AgendaService.find_next_available
+    monkeypatch.setattr(agenda_module.AgendaService, 'find_next_available',
+                        lambda self, *args: seen.append(args[2]) or original(self, *args))
+    app = create_app()
+    with app.test_client() as client:
+        assert client.get('/api/v1/available-slots/next?from=2030-01-14&days=3000000').status_code == 200
+    assert seen[0]['max_days'] == AVAILABILITY_SEARCH_DAYS
@@ -0,0 +1,58 @@
+import pytest
+from app.utils.cache import TTLCache
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+def test_entries_expire_after_ttl(clock):
+    cache = TTLCache(ttl=10, maxsize=5, clock=clock)
+    cache.set('a', 1)
+    clock.now = 9
+    assert cache.get('a') == 1
+    clock.now = 10
+    assert cache.get('a') is None
+    assert cache.stats()['expirations'] == 1
+
+def test_write_renews_ttl(clock):
+    cache = TTLCache(ttl=10, maxsize=5, clock=clock)
+    cache.set('a', 1)
+    clock.now = 8
+    cache.set('a', 2)
+    clock.now = 15
+    assert cache.get('a') == 2
+
+def test_lru_eviction(clock):
+    cache = TTLCache(ttl=10, maxsize=2, clock=clock)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert cache.get('b') is None
+    assert cache.get('a') == 1 and cache.get('c') == 3
+    stats = cache.stats()
+    assert stats['evictions'] == 1
+    assert stats['hits'] == 3 and stats['misses'] == 1
+
+def test_sweep_removes_expired(clock):
+    cache = TTLCache(ttl=10, maxsize=5, clock=clock)
+    cache.set('a', 1)
+    clock.now = 5
+    cache.set('b', 2)
+    clock.now = 12
+    assert cache.sweep() == 1
+    assert len(cache) == 1
+
+def test_sweeper_thread_stops():
+    cache = TTLCache(ttl=0, maxsize=5)
+    cache.set('a', 1)
+    cache.start_sweeper(0.01)
+    cache.stop_sweeper()
+    assert cache._sweeper is None
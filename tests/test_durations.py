@@ -0,0 +1,109 @@
+import pytest
+from datetime import date, time
+from app.db import queries
+from app.db.backends import MemoryBackend
+from app.db.backends.sqlite import SQLiteBackend
+from app.db.errors import SlotUnavailableError
+from app.db.intervals import IntervalIndex
+from app.main import create_app
+from app.services.agenda_service import AgendaService
+
+DAY = date(2030, 1, 14)
+
+pytestmark = pytest.mark.usefixtures('backend')
+
+def _book(backend, hour, minute=0, duration=None, professional=None):
+    return backend.save_appointment({
+        'phone_number': '+5491112345678',
+        'appointment_date': DAY,
+        'appointment_time': time(hour, minute),
+        'duration_minutes': duration,
+        'professional': professional
+    })
+
+def test_long_appointments_block_the_slots_they_cover(backend):
+    treatment = _book(backend, 9, duration=60)
+    assert treatment['duration_minutes'] == 60
+    with pytest.raises(SlotUnavailableError):
+        _book(backend, 9, 30)
+    with pytest.raises(SlotUnavailableError):
+        _book(backend, 8, 45)
+    # Termina justo cuando empieza el tratamiento, o empieza cuando termina
+    assert _book(backend, 8, 30)['duration_minutes'] == 30
+    assert _book(backend, 10, 0, duration=15)
+    # Cada profesional tiene su propia agenda; un turno sin profesional ocupa a todos
+    assert _book(backend, 12, 0, duration=60, professional='Dra. Gómez')
+    assert _book(backend, 12, 0, professional='Dr. Pérez')
+    assert not backend.is_slot_available(DAY, time(9, 45), duration=15, professional='Dr. Pérez')
+    assert not backend.is_slot_available(DAY, time(12, 45), duration=15)
+    assert backend.is_slot_available(DAY, time(10, 15), duration=90)
+    assert backend.is_slot_available(DAY, time(9, 15), exclude_id=treatment['id'], duration=30)
+
+def test_updates_are_checked_against_overlaps(backend):
+    first = _book(backend, 9)
+    second = _book(backend, 10)
+    with pytest.raises(SlotUnavailableError):
+        backend.update_appointment(first['id'], {'duration_minutes': 90})
+    with pytest.raises(SlotUnavailableError):
+        backend.update_appointment(second['id'], {'appointment_time': time(9, 15)})
+    assert backend.get_appointment(first['id'])['duration_minutes'] == 30
+    # Cancelar libera el intervalo; reactivar vuelve a verificarlo
+    assert backend.update_appointment(second['id'], {'status': 'cancelado'})
+    assert backend.update_appointment(first['id'], {'duration_minutes': 90})
+    with pytest.raises(SlotUnavailableError):
+        backend.update_appointment(second['id'], {'status': 'pendiente'})
+
+def test_memory_intervals_survive_restart(backend, tmp_path):
+    if isinstance(backend, SQLiteBackend):
+        pytest.skip('journal del backend en memoria')
+    memory = MemoryBackend(str(tmp_path / 'journal'))
+    memory.save_appointment({'phone_number': '+5491112345678', 'appointment_date': DAY,
+                             'appointment_time': time(9, 0), 'duration_minutes': 60})
+    restarted = MemoryBackend(str(tmp_path / 'journal'))
+    assert not restarted.is_slot_available(DAY, time(9, 30))
+    memory.close()
+    restarted.close()
+
+def test_interval_index_finds_overlaps():
+    index = IntervalIndex()
+    key = ('2030-01-14', '')
+    index.add(key, 540, 600, 1)
+    index.add(key, 600, 690, 2)
+    assert index.conflict(key, 570, 580) == 1
+    assert index.conflict(key, 680, 700) == 2
+    assert index.conflict(key, 690, 720) is None
+    assert index.conflict(key, 500, 540) is None
+    assert index.conflict(key, 560, 620, exclude_id=1) == 2
+    index.remove(key, 540, 600, 1)
+    assert index.conflict(key, 540, 600) is None
+
+def test_availability_needs_room_for_the_whole_duration():
+    queries.save_appointment({'phone_number': '+5491112345678', 'appointment_date': DAY,
+                              'appointment_time': time(10, 0), 'duration_minutes': 60})
+    service = AgendaService()
+    assert service.get_available_slots(DAY)[:3] == ['09:00', '09:30', '11:00']
+    # 90 minutos no entran antes del turno de las 10:00 ni a partir de las 11:00 de la mañana
+    assert service.get_available_slots(DAY, duration=90)[:2] == ['14:00', '14:30']
+    assert service.find_next_available(DAY, constraints={'duration': 90, 'latest': '12:00'}) == [
+        {'date': '2030-01-15', 'time': '09:00'}
+    ]
+
+def test_api_validates_durations():
+    app = create_app()
+    with app.test_client() as client:
+        response = client.post('/api/v1/appointments', json={
+            'phone_number': '+5491112345678', 'appointment_date': '2030-01-14',
+            'appointment_time': '09:00', 'duration_minutes': 60
+        })
+        assert response.status_code == 201
+        assert queries.get_appointment(response.get_json()['appointment_id'])['duration_minutes'] == 60
+        assert client.post('/api/v1/appointments', json={
+            'phone_number': '+5491112345678', 'appointment_date': '2030-01-14',
+            'appointment_time': '09:30'
+        }).status_code == 400
+        assert client.post('/api/v1/appointments', json={
+            'phone_number': '+5491112345678', 'appointment_date': '2030-01-14',
+            'appointment_time': '11:00', 'duration_minutes': 0
+        }).status_code == 400
+        assert client.get('/api/v1/available-slots?date=2030-01-14&duration=abc').status_code == 400
+        assert client.get('/api/v1/available-slots?date=2030-01-14').get_json()['available_slots'][0] == '10:00'
@@ -0,0 +1,88 @@
+import csv
+import io
+import json
+import pytest
+from datetime import date, time
+from app.db import queries
+from app.utils.export import chunked, export_stream
+
+pytestmark = pytest.mark.usefixtures('backend')
+
+@pytest.fixture
+def client(client):
+    # El dashboard exige sesión iniciada
+    with client.session_transaction() as session:
+        session['user_id'] = 1
+    return client
+
+def _agenda():
+    slots = [(16, 10), (15, 9), (17, 9)]
+    return [
+        queries.save_appointment({
+            'phone_number': '+5491112345678',
+            'patient_name': 'Ana, "la paciente"',
+            'appointment_date': date(2030, 1, day),
+            'appointment_time': time(hour, 0)
+        })['id']
+        for day, hour in slots
+    ]
+
+def test_iter_appointments_is_lazy_and_ordered():
+    ids = _agenda()
+    queries.update_appointment(ids[0], {'status': 'confirmado'})
+    rows = queries.iter_appointments()
+    assert iter(rows) is rows
+    assert [apt['id'] for apt in rows] == [ids[1], ids[0], ids[2]]
+    assert [apt['id'] for apt in queries.iter_appointments(date(2030, 1, 16), date(2030, 1, 17))] == [ids[0], ids[2]]
+    assert [apt['id'] for apt in queries.iter_appointments(status='confirmado')] == [ids[0]]
+
+def test_iter_feedback_and_notifications_by_created_day():
+    queries.insert_feedback({'phone_number': '+5491112345678', 'rating': 5})
+    queries.save_notification({'phone_number': '+5491112345678', 'message': 'hola'})
+    today = date.today()
+    assert len(list(queries.iter_feedback(today, today))) == 1
+    assert list(queries.iter_feedback(date(2000, 1, 1), date(2000, 1, 2))) == []
+    assert len(list(queries.iter_notifications(status='pendiente'))) == 1
+    assert list(queries.iter_notifications(status='enviada')) == []
+
+def test_csv_quotes_and_header_without_rows():
+    _agenda()
+    output = ''.join(export_stream('appointments', queries.iter_appointments(), 'csv'))
+    rows = list(csv.DictReader(io.StringIO(output)))
+    assert len(rows) == 3
+    assert rows[0]['patient_name'] == 'Ana, "la paciente"'
+    assert rows[0]['appointment_date'] == '2030-01-15'
+    assert rows[0]['followup_sent'] == 'false'
+    empty = ''.join(export_stream('feedback', iter([]), 'csv'))
+    assert empty.splitlines() == ['id,phone_number,patient_name,rating,comment,created_at']
+
+def test_csv_escapes_formulas():
+    queries.insert_feedback({'phone_number': '+5491112345678', 'patient_name': '=HYPERLINK("http://x")', 'rating': 1, 'comment': '@SUM(A1)'})
+    queries.insert_feedback({'phone_number': '+5491112345678', 'patient_name': 'Ana', 'rating': 5, 'comment': 'Muy bien - gracias'})
+    output = ''.join(export_stream('feedback', queries.iter_feedback(), 'csv'))
+    rows = list(csv.DictReader(io.StringIO(output)))
+    assert rows[0]['patient_name'] == '\'=HYPERLINK("http://x")'
+    assert rows[0]['comment'] == "'@SUM(A1)"
+    assert rows[0]['phone_number'] == "'+5491112345678"
+    assert (rows[1]['patient_name'], rows[1]['comment'], rows[1]['rating']) == ('Ana', 'Muy bien - gracias', '5')
+
+def test_chunked_groups_lines():
+    assert list(chunked(['ab', 'cd', 'e'], size=4)) == ['abcd', 'e']
+
+def test_export_endpoint_streams_ndjson(client):
+    ids = _agenda()
+    response = client.get('/dashboard/api/export/appointments?start_date=2030-01-16')
+    assert response.status_code == 200
+    assert response.is_streamed
+    assert response.mimetype == 'application/x-ndjson'
+    lines = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert [line['id'] for line in lines] == [ids[0], ids[2]]
+    assert lines[0]['appointment_time'].startswith('10:00')
+
+def test_export_endpoint_validation(client):
+    assert client.get('/dashboard/api/export/users').status_code == 404
+    assert client.get('/dashboard/api/export/feedback?format=xml').status_code == 400
+    assert client.get('/dashboard/api/export/feedback?start_date=ayer').status_code == 400
+    response = client.get('/dashboard/api/export/feedback?format=csv')
+    assert response.mimetype == 'text/csv'
+    assert 'attachment' in response.headers['Content-Disposition']
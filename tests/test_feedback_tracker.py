@@ -0,0 +1,59 @@
+import pytest
+from datetime import date, timedelta
+from unittest.mock import patch
+from app.services.feedback_tracker import FeedbackTracker
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+@patch('app.services.feedback_tracker.get_recent_followups', return_value=[])
+def test_membership_does_not_hit_database_per_message(mock_recent, clock):
+    tracker = FeedbackTracker(window_days=7, refresh_interval=300, clock=clock)
+    tracker.add('+5491112345678', 'Ana')
+    for _ in range(5):
+        assert tracker.get('+5491112345678') == {'patient_name': 'Ana'}
+        assert tracker.get('+5490000000000') is None
+    assert mock_recent.call_count == 1
+
+@patch('app.services.feedback_tracker.get_recent_followups')
+def test_reload_after_restart(mock_recent, clock):
+    yesterday = date.today() - timedelta(days=1)
+    mock_recent.return_value = [
+        {'phone_number': '+5491112345678', 'patient_name': 'Ana', 'appointment_date': yesterday},
+        {'phone_number': '+5491199999999', 'patient_name': 'Luis', 'appointment_date': yesterday - timedelta(days=30)}
+    ]
+    tracker = FeedbackTracker(window_days=7, refresh_interval=300, clock=clock)
+    assert tracker.get('+5491112345678')['patient_name'] == 'Ana'
+    assert tracker.get('+5491199999999') is None
+
+@patch('app.services.feedback_tracker.get_recent_followups', return_value=[])
+def test_entries_expire_and_refresh_periodically(mock_recent, clock):
+    tracker = FeedbackTracker(window_days=1, refresh_interval=300, clock=clock)
+    tracker.add('+5491112345678', 'Ana')
+    assert tracker.get('+5491112345678')
+    clock.now = 86400
+    assert tracker.get('+5491112345678') is None
+    assert mock_recent.call_count == 2
+
+@patch('app.services.feedback_tracker.get_recent_followups')
+def test_answered_phones_are_not_reloaded(mock_recent, clock):
+    mock_recent.return_value = [
+        {'phone_number': '+5491112345678', 'patient_name': 'Ana', 'appointment_date': date.today()}
+    ]
+    tracker = FeedbackTracker(window_days=7, refresh_interval=300, clock=clock)
+    assert tracker.get('+5491112345678')
+    tracker.discard('+5491112345678')
+    clock.now += 301
+    assert tracker.get('+5491112345678') is None
+    assert mock_recent.call_count == 2
+    # Un seguimiento nuevo vuelve a esperar feedback
+    tracker.add('+5491112345678', 'Ana')
+    assert tracker.get('+5491112345678') == {'patient_name': 'Ana'}
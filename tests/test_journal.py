@@ -0,0 +1,66 @@
+import os
+from datetime import date, time
+from unittest.mock import patch
+from app.db.backends import create_backend
+from app.db.backends.memory import MemoryBackend, journal_dir_from_url
+from app.db.journal import JOURNAL_FILE, SNAPSHOT_FILE
+
+def _turno(backend, hour):
+    return backend.save_appointment({
+        'phone_number': '+5491112345678',
+        'patient_name': 'Juan Pérez',
+        'appointment_date': date(2030, 1, 15),
+        'appointment_time': time(hour, 0)
+    })
+
+def test_journal_dir_from_url():
+    assert journal_dir_from_url('memory://') is None
+    assert journal_dir_from_url('memory:///var/lib/asistente') == '/var/lib/asistente'
+    assert journal_dir_from_url('memory://datos') == 'datos'
+
+def test_state_survives_restart(tmp_path):
+    backend = MemoryBackend(str(tmp_path))
+    first = _turno(backend, 9)
+    second = _turno(backend, 10)
+    backend.update_appointment(first['id'], {'status': 'confirmado'})
+    backend.delete_appointment(second['id'])
+    backend.save_notification({'phone_number': '+5491112345678', 'message': 'hola'})
+    backend.save_conversation_state('+5491112345678', {'conversation_step': 2})
+    backend.journal.close()  # caída sin snapshot: sólo queda el journal
+
+    restored = MemoryBackend(str(tmp_path))
+    apt = restored.get_appointment(first['id'])
+    assert apt['status'] == 'confirmado'
+    assert apt['appointment_date'] == date(2030, 1, 15) and apt['appointment_time'] == time(9, 0)
+    assert restored.get_appointment(second['id']) is None
+    assert len(restored.get_notifications()) == 1
+    assert restored.get_conversation_state('+5491112345678') == {'conversation_step': 2}
+    assert _turno(restored, 11)['id'] == second['id'] + 1
+    restored.close()
+
+def test_snapshot_compacts_journal(tmp_path):
+    with patch('app.db.backends.memory.MEMORY_SNAPSHOT_EVERY', 3):
+        backend = MemoryBackend(str(tmp_path))
+        for hour in range(9, 14):
+            _turno(backend, hour)
+    assert os.path.exists(tmp_path / SNAPSHOT_FILE)
+    assert backend.journal.pending == 2
+    backend.close()
+    assert os.path.getsize(tmp_path / JOURNAL_FILE) == 0
+
+    restored = create_backend(f'memory://{tmp_path}')
+    assert len(restored.get_appointments()) == 5
+    restored.close()
+
+def test_torn_last_line_is_discarded(tmp_path):
+    backend = MemoryBackend(str(tmp_path))
+    _turno(backend, 9)
+    backend.journal.close()
+    with open(tmp_path / JOURNAL_FILE, 'a', encoding='utf-8') as f:
+        f.write('[2,"appointment+",{"id":2')
+
+    restored = MemoryBackend(str(tmp_path))
+    assert len(restored.get_appointments()) == 1
+    _turno(restored, 10)
+    restored.journal.close()
+    assert len(MemoryBackend(str(tmp_path)).get_appointments()) == 2
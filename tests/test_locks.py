@@ -0,0 +1,117 @@
+import threading
+from datetime import date, time, timedelta
+from app.db.backends import MemoryBackend
+from app.db.errors import SlotUnavailableError, VersionConflictError
+from app.db.locks import IdAllocator, StripedLock, day_stripe, phone_stripe
+
+THREADS = 8
+PER_THREAD = 50
+
+def _run(worker):
+    threads = [threading.Thread(target=worker, args=(number,)) for number in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+def test_concurrent_writers_keep_ids_and_indexes_consistent(tmp_path):
+    backend = MemoryBackend(str(tmp_path))
+    # Compacta varias veces mientras los hilos escriben
+    backend.journal.snapshot_every = 97
+    start = date(2030, 1, 1)
+
+    def worker(number):
+        phone = f'+54911000000{number:02d}'
+        for index in range(PER_THREAD):
+            backend.save_appointment({
+                'phone_number': phone,
+                'appointment_date': start + timedelta(days=index % 5),
+                'appointment_time': time(8 + number, index // 5),
+                'duration_minutes': 1
+            })
+            backend.save_notification({'phone_number': phone, 'message': str(index)})
+            backend.update_conversation_state(phone, {str(index): index})
+
+    _run(worker)
+    total = THREADS * PER_THREAD
+    appointments = backend.get_appointments()
+    assert len({apt['id'] for apt in appointments}) == total
+    assert len({notification['id'] for notification in backend.get_notifications()}) == total
+    assert sum(len(backend.get_appointments_by_date(start + timedelta(days=day))) for day in range(5)) == total
+    assert all(len(backend.get_conversation_state(f'+54911000000{number:02d}')) == PER_THREAD
+               for number in range(THREADS))
+    # El journal quedó en el orden en que se aplicaron las operaciones de cada franja
+    restored = MemoryBackend(str(tmp_path))
+    assert sorted(apt['id'] for apt in restored.get_appointments()) == sorted(apt['id'] for apt in appointments)
+    assert len(restored.get_notifications()) == total
+    assert restored.get_conversation_state('+5491100000000') == backend.get_conversation_state('+5491100000000')
+    assert restored.save_appointment({'phone_number': '+5491199999999'})['id'] == total + 1
+    backend.close()
+    restored.close()
+
+def test_same_slot_is_reserved_once():
+    backend = MemoryBackend()
+    won, lost = [], []
+
+    def worker(number):
+        try:
+            won.append(backend.save_appointment({
+                'phone_number': f'+54911000000{number:02d}',
+                'appointment_date': date(2030, 1, 15),
+                'appointment_time': time(9, 0)
+            }))
+        except SlotUnavailableError:
+            lost.append(number)
+
+    _run(worker)
+    assert len(won) == 1 and len(lost) == THREADS - 1
+
+def test_compare_and_set_loses_no_updates():
+    backend = MemoryBackend()
+    appointment = backend.save_appointment({'phone_number': '+5491112345678', 'notes': '0'})
+
+    def worker(number):
+        for _ in range(PER_THREAD):
+            while True:
+                current = backend.get_appointment(appointment['id'])
+                version, notes = current['version'], current['notes']
+                try:
+                    backend.update_appointment(appointment['id'], {'notes': str(int(notes) + 1)}, expected_version=version)
+                    break
+                except VersionConflictError:
+                    continue
+
+    _run(worker)
+    final = backend.get_appointment(appointment['id'])
+    assert final['notes'] == str(THREADS * PER_THREAD)
+    assert final['version'] == THREADS * PER_THREAD + 1
+
+def test_stripes_only_block_their_own_keys():
+    stripes = StripedLock(64)
+    first = phone_stripe('+5491112345678')
+    other = next(day_stripe(f'2030-01-{day:02d}') for day in range(1, 29)
+                 if stripes.indexes([day_stripe(f'2030-01-{day:02d}')]) != stripes.indexes([first]))
+    acquired = threading.Event()
+
+    def writer(key):
+        with stripes.holding(key):
+            acquired.set()
+
+    with stripes.holding(first):
+        thread = threading.Thread(target=writer, args=(other,))
+        thread.start()
+        assert acquired.wait(1)
+        thread.join()
+        acquired.clear()
+        blocked = threading.Thread(target=writer, args=(first,))
+        blocked.start()
+        assert not acquired.wait(0.05)
+    blocked.join(1)
+    assert acquired.is_set()
+
+def test_id_allocator_is_monotonic():
+    ids = IdAllocator()
+    assert [ids.next(), ids.next()] == [1, 2]
+    ids.observe(10)
+    ids.observe(4)
+    assert ids.next() == 11
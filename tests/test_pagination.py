@@ -0,0 +1,58 @@
+import pytest
+from datetime import date, time
+from app.db import queries
+from app.utils.pagination import decode_cursor, encode_cursor, parse_limit, MAX_PAGE_SIZE
+
+pytestmark = pytest.mark.usefixtures('backend')
+
+def _agenda():
+    # Insertados fuera de orden: la página debe salir ordenada por (fecha, hora, id)
+    slots = [(16, 10), (15, 9), (15, 11), (15, 10), (17, 9)]
+    return [
+        queries.save_appointment({
+            'phone_number': '+5491112345678',
+            'appointment_date': date(2030, 1, day),
+            'appointment_time': time(hour, 0)
+        })['id']
+        for day, hour in slots
+    ]
+
+def test_cursor_roundtrip():
+    cursor = encode_cursor({'id': 7, 'appointment_date': date(2030, 1, 15), 'appointment_time': time(9, 30)})
+    assert decode_cursor(cursor) == ('2030-01-15', '09:30', 7)
+    assert decode_cursor(None) is None
+    with pytest.raises(ValueError):
+        decode_cursor('no-es-un-cursor')
+    assert parse_limit('10000') == MAX_PAGE_SIZE
+
+def test_keyset_pages_cover_everything_once():
+    ids = _agenda()
+    expected = [ids[1], ids[3], ids[2], ids[0], ids[4]]
+    seen, after = [], None
+    while True:
+        page = queries.get_appointments_page(after, 2)
+        seen += [apt['id'] for apt in page]
+        if len(page) < 2:
+            break
+        after = decode_cursor(encode_cursor(page[-1]))
+    assert seen == expected
+
+def test_page_filters():
+    ids = _agenda()
+    page = queries.get_appointments_page(None, 10, start_date=date(2030, 1, 16), end_date=date(2030, 1, 17))
+    assert [apt['id'] for apt in page] == [ids[0], ids[4]]
+    queries.update_appointment(ids[2], {'status': 'confirmado'})
+    assert [apt['id'] for apt in queries.get_appointments_page(None, 10, status='confirmado')] == [ids[2]]
+    page = queries.get_appointments_page(('2030-01-15', '10:00', ids[3]), 10, phone_number='+5491112345678')
+    assert [apt['id'] for apt in page] == [ids[2], ids[0], ids[4]]
+
+def test_api_next_cursor(client):
+    _agenda()
+    response = client.get('/api/v1/appointments?start_date=2030-01-01&end_date=2030-01-31&limit=3')
+    body = response.get_json()
+    assert len(body['appointments']) == 3 and body['next_cursor']
+    assert body['count'] == 3 and 'total' not in body
+    response = client.get(f"/api/v1/appointments?start_date=2030-01-01&end_date=2030-01-31&limit=3&cursor={body['next_cursor']}")
+    body = response.get_json()
+    assert len(body['appointments']) == 2 and body['next_cursor'] is None
+    assert client.get('/api/v1/appointments?start_date=2030-01-01&cursor=xx').status_code == 400
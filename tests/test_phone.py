@@ -0,0 +1,54 @@
+import pytest
+from datetime import date, time
+from app.db import queries
+from app.db.backends import MemoryBackend, set_backend
+from app.main import create_app
+from app.utils.phone import normalize_phone, phone_key, whatsapp_address
+
+@pytest.fixture(autouse=True)
+def backend():
+    backend = set_backend(MemoryBackend())
+    yield backend
+    set_backend(MemoryBackend())
+
+@pytest.mark.parametrize('raw', [
+    '+5491112345678',
+    'whatsapp:+5491112345678',
+    'WhatsApp:+54 9 11 1234-5678',
+    '005491112345678',
+    '5491112345678',
+    ' (+54) 911.1234.5678 '
+])
+def test_variants_share_one_key(raw):
+    assert normalize_phone(raw) == '+5491112345678'
+
+def test_national_number_gets_default_country_code():
+    assert normalize_phone('011 1234 5678') == '+541112345678'
+
+@pytest.mark.parametrize('raw', ['', None, 'abc', '+0123456789', '123', '+54911123456789012'])
+def test_invalid_numbers(raw):
+    assert normalize_phone(raw) is None
+
+def test_keys_are_interned():
+    assert normalize_phone('whatsapp:+5491112345678') is normalize_phone(''.join(['+549', '1112345678']))
+    assert phone_key('paciente-de-prueba') == 'paciente-de-prueba'
+    assert whatsapp_address('whatsapp:+5491112345678') == 'whatsapp:+5491112345678'
+
+def test_data_layer_uses_canonical_key():
+    queries.save_appointment({
+        'phone_number': 'whatsapp:+54 9 11 1234-5678',
+        'appointment_date': date(2030, 1, 15),
+        'appointment_time': time(9, 0)
+    })
+    assert len(queries.get_appointments('+5491112345678')) == 1
+    assert queries.get_last_appointment('5491112345678')['phone_number'] == '+5491112345678'
+    queries.save_conversation_state('whatsapp:+5491112345678', {'conversation_step': 1})
+    queries.update_conversation_state('+5491112345678', {'conversation_step': 2})
+    assert queries.get_conversation_state('005491112345678') == {'conversation_step': 2}
+
+def test_api_rejects_unparseable_phone_filter():
+    app = create_app()
+    with app.test_client() as client:
+        assert client.get('/api/v1/appointments?phone_number=abc').status_code == 400
+        response = client.get('/api/v1/appointments?phone_number=%2B54%209%2011%201234-5678')
+        assert response.status_code == 200
@@ -0,0 +1,59 @@
+import pytest
+from unittest.mock import MagicMock, patch
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+from app.db import postgres
+
+class FakePool:
+    """Pool mínimo que entrega conexiones simuladas"""
+
+    def __init__(self, minconn, maxconn, **kwargs):
+        self.created = 0
+        self.returned = []
+
+    def getconn(self):
+        self.created += 1
+        conn = MagicMock(closed=0)
+        conn.get_transaction_status.return_value = TRANSACTION_STATUS_IDLE
+        return conn
+
+    def putconn(self, conn, close=False):
+        self.returned.append((conn, close))
+
+    def closeall(self):
+        pass
+
+@pytest.fixture
+def fake_pool():
+    postgres.close_pool()
+    with patch('psycopg2.pool.ThreadedConnectionPool', FakePool), \
+         patch.object(postgres, 'DB_POOL_MAX', 2):
+        yield postgres._get_pool()
+    postgres.close_pool()
+
+def test_close_returns_connection_to_pool(fake_pool):
+    conn = postgres.get_connection()
+    conn.cursor()
+    conn.close()
+    assert len(fake_pool.returned) == 1
+    assert fake_pool.returned[0][1] is False
+
+def test_checkout_times_out_when_exhausted(fake_pool):
+    held = [postgres.get_connection(), postgres.get_connection()]
+    with pytest.raises(postgres.PoolTimeoutError):
+        postgres.acquire_connection(timeout=0.01)
+    held[0].close()
+    postgres.acquire_connection(timeout=0.01)
+
+def test_closed_connection_is_discarded_on_release(fake_pool):
+    conn = postgres.acquire_connection()
+    conn.closed = 1
+    postgres.release_connection(conn)
+    assert fake_pool.returned[-1] == (conn, True)
+
+def test_context_manager_rolls_back_on_error(fake_pool):
+    with pytest.raises(RuntimeError):
+        with postgres.connection() as conn:
+            raise RuntimeError('boom')
+    conn.rollback.assert_called()
+    conn.commit.assert_not_called()
+    assert fake_pool.returned[-1][0] is conn
@@ -0,0 +1,249 @@
+import pytest
+import threading
+from datetime import date, time
+from app.db import queries
+from app.db.backends import create_backend
+from app.db.backends.sqlite import SQLiteBackend
+from app.db.errors import SlotUnavailableError
+from app.db.migrations import migration_files
+from app.db.store import AppointmentStore, DateIndex
+from app.main import create_app
+
+pytestmark = pytest.mark.usefixtures('backend')
+
+def _ids(appointments):
+    return [apt['id'] for apt in appointments]
+
+def _turno(phone='+5491112345678', day=date(2030, 1, 15), hour=time(10, 0)):
+    return queries.save_appointment({
+        'phone_number': phone,
+        'patient_name': 'Juan Pérez',
+        'appointment_date': day,
+        'appointment_time': hour
+    })
+
+def test_save_and_get_by_id():
+    apt = _turno()
+    assert queries.get_appointment(apt['id'])['id'] == apt['id']
+    assert queries.get_appointment(999) is None
+
+def test_ids_not_reused_after_delete():
+    first = _turno()
+    second = _turno(hour=time(11, 0))
+    assert queries.delete_appointment(first['id'])
+    third = _turno(hour=time(12, 0))
+    assert third['id'] > second['id']
+
+def test_indexes_follow_updates():
+    apt = _turno()
+    assert _ids(queries.get_appointments_by_date(date(2030, 1, 15))) == [apt['id']]
+    assert _ids(queries.get_appointments_by_date('2030-01-15')) == [apt['id']]
+
+    queries.update_appointment(apt['id'], {'appointment_date': date(2030, 1, 16), 'phone_number': '+5491199999999'})
+    assert queries.get_appointments_by_date(date(2030, 1, 15)) == []
+    assert _ids(queries.get_appointments_by_date(date(2030, 1, 16))) == [apt['id']]
+    assert queries.get_appointments('+5491112345678') == []
+    assert _ids(queries.get_appointments('+5491199999999')) == [apt['id']]
+
+def test_delete_removes_from_indexes():
+    apt = _turno()
+    assert queries.delete_appointment(apt['id'])
+    assert not queries.delete_appointment(apt['id'])
+    assert queries.get_appointments(apt['phone_number']) == []
+    assert queries.get_appointments_by_date(date(2030, 1, 15)) == []
+
+def test_last_appointment_by_phone():
+    _turno()
+    last = _turno(hour=time(15, 0))
+    _turno(phone='+5491100000000', hour=time(16, 0))
+    assert queries.get_last_appointment('+5491112345678')['id'] == last['id']
+    assert queries.get_last_appointment_id_by_phone('+5491112345678') == last['id']
+    assert queries.get_last_appointment('+5490000000000') is None
+
+def test_status_index():
+    store = AppointmentStore()
+    store.insert({'id': 1, 'phone_number': 'a', 'appointment_date': '2030-01-01', 'status': 'pendiente'})
+    store.update(1, {'status': 'cancelado'})
+    assert store.by_status('pendiente') == []
+    assert [apt['id'] for apt in store.by_status('cancelado')] == [1]
+
+def test_followup_and_absence_candidates():
+    past = _turno(day=date(2020, 1, 10))
+    future = _turno(hour=time(11, 0))
+    queries.update_appointment(past['id'], {'status': 'confirmado'})
+    queries.update_appointment(future['id'], {'status': 'confirmado'})
+
+    assert _ids(queries.get_followup_candidates(date(2025, 1, 1))) == [past['id']]
+    assert _ids(queries.get_absence_candidates(date(2025, 1, 1))) == [past['id']]
+    assert queries.get_last_followed_up_appointment(past['phone_number']) is None
+
+    queries.mark_followup_sent(past['id'])
+    assert queries.get_followup_candidates(date(2025, 1, 1)) == []
+    assert queries.get_last_followed_up_appointment(past['phone_number'])['id'] == past['id']
+    # El panel de admin sigue mostrando al ausente después del seguimiento
+    assert _ids(queries.get_absent_appointments(date(2025, 1, 1))) == [past['id']]
+    queries.set_appointment_attended(past['id'], True)
+    assert queries.get_absent_appointments(date(2025, 1, 1)) == []
+
+def test_date_range_queries_are_ordered():
+    late = _turno(day=date(2030, 1, 20))
+    early = _turno(day=date(2030, 1, 10))
+    middle = _turno(day=date(2030, 1, 15))
+    old = _turno(day=date(2020, 5, 1))
+    assert _ids(queries.get_appointments_by_date_range(date(2030, 1, 10), date(2030, 1, 15))) == [early['id'], middle['id']]
+    assert _ids(queries.get_appointments_by_date_range('2030-01-16', '2030-12-31')) == [late['id']]
+    assert _ids(queries.get_upcoming_appointments()) == [early['id'], middle['id'], late['id']]
+    assert _ids(queries.get_past_unattended_appointments()) == [old['id']]
+
+def test_date_index_bounds():
+    index = DateIndex()
+    for appointment_id, day in enumerate(['2030-01-03', None, '2030-01-01', '2030-01-02', '2030-01-01']):
+        index.add(day, appointment_id)
+    assert list(index.range()) == [1, 2, 4, 3, 0]
+    assert list(index.range(before='2030-01-02')) == [2, 4]
+    assert list(index.range(start='2030-01-02', end='2030-01-03')) == [3, 0]
+    index.remove('2030-01-02', 3)
+    assert list(index.range(start='2030-01-02')) == [0]
+    assert index._sorted == ['', '2030-01-01', '2030-01-03']
+
+def test_slot_cannot_be_booked_twice():
+    first = _turno()
+    with pytest.raises(SlotUnavailableError):
+        _turno(phone='+5491100000000')
+    assert not queries.is_slot_available(date(2030, 1, 15), time(10, 0))
+    assert queries.is_slot_available(date(2030, 1, 15), time(10, 0), exclude_id=first['id'])
+    assert _ids(queries.get_appointments_by_date(date(2030, 1, 15))) == [first['id']]
+
+def test_cancelled_appointment_releases_slot():
+    first = _turno()
+    queries.update_appointment(first['id'], {'status': 'cancelado'})
+    assert queries.is_slot_available(date(2030, 1, 15), time(10, 0))
+    second = _turno(phone='+5491100000000')
+    assert second['id'] != first['id']
+
+def test_slots_are_per_professional():
+    queries.save_appointment({'phone_number': 'a', 'appointment_date': date(2030, 1, 15),
+                              'appointment_time': time(10, 0), 'professional': 'Dra. Gómez'})
+    assert queries.is_slot_available(date(2030, 1, 15), time(10, 0), 'Dr. Pérez')
+    assert not queries.is_slot_available(date(2030, 1, 15), time(10, 0), 'Dra. Gómez')
+    # Un turno sin profesional ocupa a toda la clínica
+    assert not queries.is_slot_available(date(2030, 1, 15), time(10, 0))
+    with pytest.raises(SlotUnavailableError):
+        _turno()
+    _turno(hour=time(11, 0))
+    assert not queries.is_slot_available(date(2030, 1, 15), time(11, 0), 'Dr. Pérez')
+
+def test_api_books_each_professional_separately():
+    app = create_app()
+    with app.test_client() as client:
+        def book(professional):
+            return client.post('/api/v1/appointments', json={
+                'phone_number': '+5491112345678', 'appointment_date': '2030-01-15',
+                'appointment_time': '10:00', 'professional': professional
+            })
+        first = book('dr_a')
+        assert first.status_code == 201
+        assert queries.get_appointment(first.get_json()['appointment_id'])['professional'] == 'dr_a'
+        slots = client.get('/api/v1/available-slots?date=2030-01-15&professional=dr_a').get_json()
+        assert '10:00' not in slots['available_slots']
+        assert book('dr_b').status_code == 201
+        assert book('dr_a').status_code == 400
+        # Reasignar el turno a un profesional ocupado en ese horario se rechaza
+        assert client.put(f"/api/v1/appointments/{first.get_json()['appointment_id']}",
+                          json={'professional': 'dr_b'}).status_code == 400
+        assert client.put(f"/api/v1/appointments/{first.get_json()['appointment_id']}",
+                          json={'professional': 'dr_c'}).status_code == 200
+        assert queries.get_appointment(first.get_json()['appointment_id'])['professional'] == 'dr_c'
+
+def test_moving_onto_booked_slot_is_rejected():
+    _turno()
+    other = _turno(hour=time(11, 0))
+    with pytest.raises(SlotUnavailableError):
+        queries.update_appointment(other['id'], {'appointment_time': time(10, 0)})
+    assert queries.get_appointment(other['id'])['appointment_time'] in (time(11, 0), '11:00', '11:00:00')
+
+def test_conversation_state_merge():
+    queries.save_conversation_state('+5491112345678', {'conversation_step': 1, 'patient_name': 'Ana'})
+    queries.update_conversation_state('+5491112345678', {'conversation_step': 2})
+    assert queries.get_conversation_state('+5491112345678') == {'conversation_step': 2, 'patient_name': 'Ana'}
+    queries.clear_conversation_state('+5491112345678')
+    assert queries.get_conversation_state('+5491112345678') == {}
+
+def test_backend_selection_by_url(tmp_path):
+    assert create_backend('memory://').name == 'memory'
+    sqlite_backend = create_backend(f'sqlite:///{tmp_path}/clinica.db')
+    assert sqlite_backend.name == 'sqlite'
+    sqlite_backend.close()
+    with pytest.raises(ValueError):
+        create_backend('mysql://localhost/db')
+
+@pytest.mark.parametrize('dialect', ['postgres', 'sqlite'])
+def test_migrations_are_versioned(dialect):
+    versions = [version for version, _ in migration_files(dialect)]
+    assert versions == sorted(versions)
+    assert versions[0] == '0001_initial'
+
+def test_sqlite_uses_wal(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / 'wal.db'))
+    with backend._connection() as conn:
+        assert conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+    assert backend.migrate() == []
+    backend.close()
+
+def test_failed_sqlite_migration_is_rolled_back(tmp_path, monkeypatch):
+    broken = tmp_path / '0100_broken.sql'
+    broken.write_text(
+        '-- Agrega una columna y falla después\n'
+        'ALTER TABLE appointments ADD COLUMN room VARCHAR(20);\n'
+        'CREATE INDEX idx_missing ON no_such_table (id);\n',
+        encoding='utf-8'
+    )
+    backend = SQLiteBackend(str(tmp_path / 'migrate.db'))
+    files = migration_files('sqlite')
+    monkeypatch.setattr('app.db.backends.sql.migration_files', lambda dialect: files + [('0100_broken', str(broken))])
+    with pytest.raises(Exception):
+        backend.migrate()
+    with backend._connection() as conn:
+        columns = [row[1] for row in conn.execute('PRAGMA table_info(appointments)')]
+        versions = [row[0] for row in conn.execute('SELECT version FROM schema_migrations')]
+    assert 'room' not in columns and '0100_broken' not in versions
+    # Corregido el script, la migración vuelve a aplicarse desde el principio
+    broken.write_text('ALTER TABLE appointments ADD COLUMN room VARCHAR(20);\n', encoding='utf-8')
+    assert backend.migrate() == ['0100_broken']
+    backend.close()
+
+def test_phone_migration_normalizes_stored_numbers(tmp_path, monkeypatch):
+    files = migration_files('sqlite')
+    assert files[-1][0] == '0010_phone_normalize'
+    monkeypatch.setattr('app.db.backends.sql.migration_files', lambda dialect: files[:-1])
+    backend = SQLiteBackend(str(tmp_path / 'phones.db'))
+    for raw in ('+54 9 11 1234-5678', '005491112345678', 'no es un teléfono'):
+        backend.save_notification({'phone_number': raw, 'message': 'a'})
+    backend.save_conversation_state('011 1234 5678', {'conversation_step': 1})
+    monkeypatch.setattr('app.db.backends.sql.migration_files', lambda dialect: files)
+    assert backend.migrate() == ['0010_phone_normalize']
+    phones = sorted(notification['phone_number'] for notification in backend.get_notifications())
+    assert phones == ['+5491112345678', '+5491112345678', 'no es un teléfono']
+    assert backend.get_conversation_state('011 1234 5678') == {}
+    backend.close()
+
+def test_concurrent_sqlite_startups_migrate_once(tmp_path):
+    path = str(tmp_path / 'workers.db')
+    backends, errors = [], []
+
+    def start():
+        try:
+            backends.append(SQLiteBackend(path))
+        except Exception as e:
+            errors.append(e)
+
+    workers = [threading.Thread(target=start) for _ in range(4)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    assert errors == [] and len(backends) == 4
+    with backends[0]._connection() as conn:
+        assert conn.execute('SELECT COUNT(*) FROM schema_migrations').fetchone()[0] == len(migration_files('sqlite'))
+    for backend in backends:
+        backend.close()
@@ -0,0 +1,93 @@
+import pytest
+from datetime import date, time
+from app.db import queries
+from app.db.query_cache import QueryCache, query_cache, range_tags
+
+pytestmark = pytest.mark.usefixtures('backend')
+
+def _book(day, hour, phone='+5491112345678'):
+    return queries.save_appointment({
+        'phone_number': phone,
+        'appointment_date': date(2030, 1, day),
+        'appointment_time': time(hour, 0)
+    })
+
+def test_repeated_reads_are_served_from_cache(backend, monkeypatch):
+    _book(15, 9)
+    assert len(queries.get_appointments_by_date(date(2030, 1, 15))) == 1
+    calls = []
+    original = backend.get_appointments_by_date
+    monkeypatch.setattr(backend, 'get_appointments_by_date', lambda day: calls.append(day) or original(day))
+    for _ in range(3):
+        assert len(queries.get_appointments_by_date(date(2030, 1, 15))) == 1
+    assert calls == []
+    assert query_cache.stats()['hits'] == 3
+
+def test_writes_invalidate_only_their_tags():
+    appointment = _book(15, 9)
+    queries.get_appointments_by_date(date(2030, 1, 15))
+    queries.get_appointments_by_date(date(2030, 1, 16))
+    queries.get_appointments_by_date_range(date(2030, 1, 13), date(2030, 1, 19))
+    assert not queries.is_slot_available(date(2030, 1, 15), time(9, 0))
+    assert len(query_cache) == 4
+    queries.update_appointment(appointment['id'], {'appointment_date': date(2030, 1, 20)})
+    # Se invalidan el día anterior (15) y el nuevo (20); el 16 sigue en caché
+    assert len(query_cache) == 1
+    assert queries.get_appointments_by_date(date(2030, 1, 15)) == []
+    assert queries.is_slot_available(date(2030, 1, 15), time(9, 0))
+    assert len(queries.get_appointments_by_date(date(2030, 1, 20))) == 1
+    assert queries.get_appointments_by_date_range(date(2030, 1, 13), date(2030, 1, 19)) == []
+
+def test_phone_reads_follow_saves_and_deletes():
+    first = _book(15, 9)
+    assert queries.get_last_appointment('+5491112345678')['id'] == first['id']
+    second = _book(16, 9)
+    assert queries.get_last_appointment('+5491112345678')['id'] == second['id']
+    assert len(queries.get_appointments('+5491112345678')) == 2
+    assert queries.delete_appointment(second['id'])
+    assert [apt['id'] for apt in queries.get_appointments('+5491112345678')] == [first['id']]
+    assert queries.get_appointment(second['id']) is None
+
+def test_returned_lists_are_copies():
+    _book(15, 9)
+    queries.get_appointments_by_date(date(2030, 1, 15)).clear()
+    assert len(queries.get_appointments_by_date(date(2030, 1, 15))) == 1
+
+def test_load_racing_an_invalidation_is_not_stored():
+    cache = QueryCache(maxsize=10, ttl=60)
+
+    def loader():
+        cache.invalidate({'day:2030-01-15'})
+        return ['viejo']
+
+    assert cache.get_or_load('k', {'day:2030-01-15'}, loader) == ['viejo']
+    assert len(cache) == 0
+
+def test_lru_bound_and_ttl():
+    now = [0.0]
+    cache = QueryCache(maxsize=2, ttl=10, clock=lambda: now[0])
+    for key in 'abc':
+        cache.get_or_load(key, {key}, lambda: key)
+    assert len(cache) == 2 and cache.stats()['evictions'] == 1
+    now[0] = 11
+    assert cache.get_or_load('c', {'c'}, lambda: 'nuevo') == 'nuevo'
+    assert cache.stats()['expirations'] == 1
+
+def test_hits_report_the_age_of_what_they_serve():
+    now = [0.0]
+    cache = QueryCache(maxsize=10, ttl=60, clock=lambda: now[0])
+    linked = QueryCache(maxsize=10, ttl=60)
+    cache.link(linked)
+    cache.get_or_load('k', {'day:2030-01-15'}, lambda: 1)
+    linked.get_or_load('k', {'day:2030-01-15'}, lambda: 1)
+    now[0] = 5
+    cache.get_or_load('k', set(), lambda: 2)
+    now[0] = 15
+    cache.get_or_load('k', set(), lambda: 2)
+    assert cache.stats()['avg_hit_age'] == 10.0 and cache.stats()['max_hit_age'] == 15.0
+    cache.invalidate({'day:2030-01-15'})
+    assert len(linked) == 0
+
+def test_long_ranges_use_the_catch_all_tag():
+    assert range_tags(date(2030, 1, 1), date(2030, 1, 3)) == {'day:2030-01-01', 'day:2030-01-02', 'day:2030-01-03'}
+    assert range_tags(date(2030, 1, 1), date(2030, 12, 31)) == {'appointments'}
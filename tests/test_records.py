@@ -0,0 +1,56 @@
+from datetime import date, datetime, time
+from app.db.backends import MemoryBackend
+from app.db.records import AppointmentRecord, appointment_json
+from app.schemas.turno_schema import EstadoTurno
+from app.services.agenda_service import AgendaService
+
+def _record(**changes):
+    data = {
+        'id': 1,
+        'phone_number': '+5491112345678',
+        'patient_name': 'Juan Pérez',
+        'appointment_date': '2030-01-15',
+        'appointment_time': '09:30',
+        'status': EstadoTurno.PENDIENTE,
+        'created_at': '2030-01-10T10:00:00'
+    }
+    data.update(changes)
+    return AppointmentRecord(data)
+
+def test_record_normalizes_to_native_types():
+    record = _record()
+    assert record['appointment_date'] == date(2030, 1, 15)
+    assert record['appointment_time'] == time(9, 30)
+    assert record['created_at'] == datetime(2030, 1, 10, 10, 0)
+    assert record['status'] == 'pendiente' and type(record['status']) is str
+    assert record['status'] is _record(id=2)['status']
+    assert not hasattr(record, '__dict__')
+
+def test_record_behaves_like_a_row():
+    record = _record()
+    assert record.get('notes') is None and record.get('inexistente', 'x') == 'x'
+    assert dict(record, status='confirmado')['status'] == 'confirmado'
+    assert 'phone_number' in record and len(record) == len(dict(record))
+
+def test_json_form_is_cached_until_update():
+    record = _record()
+    first = record.as_json()
+    assert first['appointment_date'] == '2030-01-15' and first['appointment_time'] == '09:30'
+    assert record.as_json() is first
+    record.apply({'status': 'confirmado', 'campo_desconocido': 1})
+    assert record.as_json() is not first
+    assert record.as_json()['status'] == 'confirmado'
+    assert record.as_json() == appointment_json(dict(record))
+
+def test_memory_backend_stores_records():
+    backend = MemoryBackend()
+    saved = backend.save_appointment({
+        'phone_number': '+5491112345678',
+        'appointment_date': date(2030, 1, 15),
+        'appointment_time': time(9, 0)
+    })
+    assert isinstance(saved, AppointmentRecord)
+    assert isinstance(saved['created_at'], datetime)
+    response = AgendaService()._format_appointment_response(backend.get_appointment(saved['id']))
+    assert response['created_at'] == saved['created_at'].isoformat()
+    assert response['appointment_time'] == '09:00'
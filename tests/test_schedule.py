@@ -0,0 +1,74 @@
+import json
+import pytest
+from datetime import date, time
+from app.services.schedule import WorkSchedule, load_schedule
+
+MONDAY = date(2030, 1, 14)
+SATURDAY = date(2030, 1, 19)
+SUNDAY = date(2030, 1, 20)
+
+SPEC = {
+    'slot_minutes': 30,
+    'weekly': {'mon': ['09:00-12:00'], 'tue': ['09:00-12:00'], 'sat': ['09:00-10:00']},
+    'closed': ['2030-01-15'],
+    'dates': {'2030-01-21': ['10:00-11:00']},
+    'professionals': {
+        'Dra. Gómez': {'weekly': {'mon': ['14:00-16:00']}, 'closed': ['2030-01-28..2030-02-03']},
+        'Dr. Pérez': {}
+    }
+}
+
+def test_default_schedule_keeps_weekday_hours_and_half_saturdays():
+    schedule = WorkSchedule()
+    assert schedule.slots(schedule.day_mask(MONDAY)) == [
+        '09:00', '09:30', '10:00', '10:30', '11:00', '11:30',
+        '14:00', '14:30', '15:00', '15:30', '16:00', '16:30', '17:00'
+    ]
+    assert schedule.slots(schedule.day_mask(SATURDAY)) == [
+        '09:00', '09:30', '10:00', '10:30', '11:00', '11:30', '12:00', '12:30'
+    ]
+    assert schedule.day_mask(SUNDAY) == 0
+
+def test_free_slots_are_the_day_minus_bookings():
+    schedule = WorkSchedule(SPEC)
+    booked = schedule.booked_mask([(time(9, 0), 30), ('10:30', 30), (time(9, 40), 15)])
+    assert schedule.slots(schedule.free_mask(MONDAY, booked)) == ['10:00', '11:00', '11:30']
+    assert schedule.slots(schedule.free_mask(MONDAY, booked) & schedule.window('10:15', '11:00')) == ['11:00']
+    assert schedule.slots(schedule.day_mask(MONDAY) & schedule.after(time(11, 0))) == ['11:30']
+    assert schedule.count(schedule.day_mask(MONDAY)) == 6
+
+def test_exceptions_overlay_the_weekly_hours():
+    schedule = WorkSchedule(SPEC)
+    assert schedule.day_mask(date(2030, 1, 15)) == 0
+    assert schedule.slots(schedule.day_mask(date(2030, 1, 21))) == ['10:00', '10:30']
+    # Agenda propia, licencia y feriado de la clínica
+    assert schedule.slots(schedule.day_mask(MONDAY, 'Dra. Gómez')) == ['14:00', '14:30', '15:00', '15:30']
+    assert schedule.day_mask(date(2030, 1, 28), 'Dra. Gómez') == 0
+    assert schedule.day_mask(date(2030, 1, 15), 'Dr. Pérez') == 0
+    assert schedule.day_mask(date(2030, 1, 21), 'Dra. Gómez') == 0
+    # Un profesional sin agenda propia usa la de la clínica
+    assert schedule.day_mask(MONDAY, 'Dr. Pérez') == schedule.day_mask(MONDAY, 'Otro') == schedule.day_mask(MONDAY)
+
+def test_reachable_slots_cover_weekly_and_special_hours():
+    schedule = WorkSchedule(SPEC)
+    assert schedule.slots(schedule.reachable(weekdays={5})) == ['09:00', '09:30']
+    assert schedule.reachable(weekdays={6}) == 0
+    # Los horarios especiales cuentan para el día de la semana en que caen
+    assert schedule.reachable(weekdays={0}) == schedule.day_mask(MONDAY) | schedule.day_mask(date(2030, 1, 21))
+    assert schedule.slots(schedule.reachable('Dra. Gómez', {0})) == ['14:00', '14:30', '15:00', '15:30']
+
+def test_load_schedule_from_json_and_file(tmp_path):
+    assert load_schedule(json.dumps(SPEC)).day_mask(date(2030, 1, 15)) == 0
+    path = tmp_path / 'horarios.json'
+    path.write_text(json.dumps({'slot_minutes': 15, 'weekly': {'mon': ['09:00-10:00']}}), encoding='utf-8')
+    assert load_schedule(str(path)).slots(load_schedule(str(path)).day_mask(MONDAY)) == ['09:00', '09:15', '09:30', '09:45']
+    assert load_schedule('').day_mask(SATURDAY) == WorkSchedule().day_mask(SATURDAY)
+
+@pytest.mark.parametrize('spec', [
+    {'slot_minutes': 7},
+    {'weekly': {'lunes': ['09:00-12:00']}},
+    {'closed': ['2030-01-20..2030-01-10']}
+])
+def test_invalid_definitions_are_rejected(spec):
+    with pytest.raises(ValueError):
+        WorkSchedule(spec)
@@ -0,0 +1,53 @@
+import pytest
+from datetime import date
+from app.db import queries
+from app.db.backends import MemoryBackend, set_backend
+from app.db.backends.sqlite import SQLiteBackend
+from app.db.state import StorageStateBackend, create_state_backend, set_state_backend, encode_state, decode_state
+from app.db.state.redis import RedisStateBackend
+
+@pytest.fixture
+def redis_state():
+    fakeredis = pytest.importorskip('fakeredis')
+    backend = set_state_backend(RedisStateBackend(ttl=60, client=fakeredis.FakeRedis()))
+    yield backend
+    set_state_backend(StorageStateBackend())
+
+def test_compact_serialization():
+    raw = encode_state({'patient_name': 'Ana', 'appointment_date': date(2030, 1, 15)})
+    assert raw == '{"patient_name":"Ana","appointment_date":"2030-01-15"}'
+    assert decode_state(raw.encode()) == {'patient_name': 'Ana', 'appointment_date': '2030-01-15'}
+    assert decode_state(None) == {}
+
+def test_state_backend_selection():
+    assert create_state_backend('').name == 'storage'
+    with pytest.raises(ValueError):
+        create_state_backend('memcached://localhost')
+
+def test_redis_state_roundtrip(redis_state):
+    queries.save_conversation_state('+5491112345678', {'conversation_step': 1, 'patient_name': 'Ana'})
+    queries.update_conversation_state('+5491112345678', {'conversation_step': 2})
+    assert queries.get_conversation_state('+5491112345678') == {'conversation_step': 2, 'patient_name': 'Ana'}
+    assert 0 < redis_state._client.ttl('conv:+5491112345678') <= 60
+    assert queries.clear_conversation_state('+5491112345678')
+    assert queries.get_conversation_state('+5491112345678') == {}
+
+def test_sqlite_state_expires(tmp_path):
+    backend = set_backend(SQLiteBackend(str(tmp_path / 'state.db')))
+    try:
+        queries.save_conversation_state('+5491112345678', {'conversation_step': 1})
+        assert queries.get_conversation_state('+5491112345678') == {'conversation_step': 1}
+        backend.state_ttl = -1
+        queries.update_conversation_state('+5491112345678', {'patient_name': 'Ana'})
+        assert queries.get_conversation_state('+5491112345678') == {}
+        assert queries.purge_expired_conversation_states() == 1
+    finally:
+        set_backend(MemoryBackend())
+
+def test_memory_state_stats():
+    set_backend(MemoryBackend())
+    queries.save_conversation_state('+5491112345678', {'conversation_step': 1})
+    queries.get_conversation_state('+5491112345678')
+    queries.get_conversation_state('+5490000000000')
+    stats = queries.get_conversation_state_stats()
+    assert stats['size'] == 1 and stats['hits'] >= 1 and stats['misses'] >= 1
@@ -0,0 +1,100 @@
+import pytest
+from datetime import datetime
+from app.db import queries
+from app.db.backends import MemoryBackend, set_backend
+from app.db.backends.sqlite import SQLiteBackend
+from app.db.state import StorageStateBackend, set_state_backend
+from app.db.state.redis import RedisStateBackend
+from app.db.stats import StatsCollector, stats
+
+class FakeClock:
+    def __init__(self):
+        self.now = datetime.now().timestamp()
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture(autouse=True)
+def clean_stats():
+    stats.reset()
+    yield
+    stats.reset()
+    set_backend(MemoryBackend())
+
+def test_notification_counters_follow_status_changes():
+    first = queries.save_notification({'phone_number': '+5491112345678', 'message': 'a'})
+    queries.save_notification({'phone_number': '+5491112345678', 'message': 'b'})
+    queries.update_notification(first['id'], {'status': 'enviada'})
+    result = queries.get_notifications_stats()
+    assert (result['total'], result['sent'], result['pending'], result['failed']) == (2, 1, 1, 0)
+    assert result['today'] == 2
+
+def test_active_conversations_sliding_window():
+    clock = FakeClock()
+    collector = StatsCollector(active_window=60, clock=clock)
+    collector.conversation_started('+5491112345678')
+    clock.now += 30
+    collector.conversation_started('+5491199999999')
+    collector.conversation_message('+5491199999999')
+    assert collector.conversations()['active_conversations'] == 2
+    clock.now += 45
+    result = collector.conversations()
+    assert result['active_conversations'] == 1
+    assert result['total_conversations'] == 2
+    assert result['messages_today'] == 3
+
+def test_rebuild_from_storage(tmp_path):
+    set_backend(SQLiteBackend(str(tmp_path / 'stats.db')))
+    notification = queries.save_notification({'phone_number': '+5491112345678', 'message': 'a'})
+    queries.update_notification(notification['id'], {'status': 'fallida'})
+    queries.save_conversation_state('+5491112345678', {'conversation_step': 1})
+    stats.reset()
+    assert queries.rebuild_stats()
+    assert queries.get_notifications_stats()['failed'] == 1
+    conversations = queries.get_conversation_stats()
+    assert conversations['total_conversations'] == 1
+    assert conversations['active_conversations'] == 1
+
+@pytest.mark.parametrize('make_backend', [MemoryBackend, lambda: SQLiteBackend(':memory:')], ids=['memory', 'sqlite'])
+def test_rebuild_uses_grouped_counts(make_backend, monkeypatch):
+    backend = set_backend(make_backend())
+    for status in ('enviada', 'enviada', 'fallida'):
+        notification = backend.save_notification({'phone_number': '+5491112345678', 'message': 'a'})
+        backend.update_notification(notification['id'], {'status': status})
+    backend.save_notification({'phone_number': '+5491112345678', 'message': 'b'})
+    today = datetime.now().date().isoformat()
+    assert sorted(backend.notification_counts()) == [('enviada', today, 2), ('fallida', today, 1), ('pendiente', today, 1)]
+    # La reconstrucción no lee las notificaciones una por una
+    monkeypatch.setattr(backend, 'get_notifications', None)
+    assert queries.rebuild_stats()
+    result = queries.get_notifications_stats()
+    assert (result['total'], result['sent'], result['pending'], result['failed']) == (4, 2, 1, 1)
+    assert result['by_day'] == {today: 4}
+
+def test_status_changes_move_counters_without_tracking_ids():
+    backend = set_backend(MemoryBackend())
+    # Creada por otro worker: este proceso la conoce sólo después de reconstruir
+    notification = backend.save_notification({'phone_number': '+5491112345678', 'message': 'a'})
+    assert queries.rebuild_stats()
+    for status in ('fallida', 'pendiente', 'enviada', 'enviada'):
+        assert queries.update_notification(notification['id'], {'status': status})
+    result = queries.get_notifications_stats()
+    assert (result['total'], result['sent'], result['pending'], result['failed']) == (1, 1, 0, 0)
+    assert not queries.update_notification(999, {'status': 'enviada'})
+    assert queries.get_notifications_stats()['total'] == 1
+
+def test_rebuild_reads_redis_activity():
+    fakeredis = pytest.importorskip('fakeredis')
+    state = set_state_backend(RedisStateBackend(ttl=600, client=fakeredis.FakeRedis()))
+    try:
+        queries.save_conversation_state('+5491112345678', {'conversation_step': 1})
+        queries.save_conversation_state('+5491199999999', {'conversation_step': 2})
+        activity = dict(state.activity())
+        assert set(activity) == {'+5491112345678', '+5491199999999'}
+        assert abs((datetime.now() - activity['+5491112345678']).total_seconds()) < 5
+        stats.reset()
+        assert queries.rebuild_stats()
+        conversations = queries.get_conversation_stats()
+        assert conversations['total_conversations'] == 2 and conversations['active_conversations'] == 2
+    finally:
+        set_state_backend(StorageStateBackend())
@@ -0,0 +1,74 @@
+import pytest
+from datetime import date, time
+from app.db import queries
+from app.db.timeline import PhoneIndex, bound, created_moment
+from app.main import create_app
+from app.utils.pagination import decode_event_cursor, encode_event_cursor
+
+PHONE = '+5491112345678'
+
+pytestmark = pytest.mark.usefixtures('backend')
+
+def _history():
+    for day, hour in [(15, 9), (20, 10), (10, 11)]:
+        queries.save_appointment({
+            'phone_number': PHONE,
+            'appointment_date': date(2000 + day, 1, day),
+            'appointment_time': time(hour, 0)
+        })
+    queries.save_appointment({
+        'phone_number': '+5491199999999',
+        'appointment_date': date(2030, 1, 1),
+        'appointment_time': time(9, 0)
+    })
+    queries.save_notification({'phone_number': PHONE, 'message': 'recordatorio'})
+    queries.insert_feedback({'phone_number': PHONE, 'rating': 5})
+    queries.insert_attachment({'phone_number': PHONE, 'filename': 'receta.pdf'})
+    queries.save_conversation_state(PHONE, {'conversation_step': 2})
+
+def test_timeline_merges_all_collections_newest_first():
+    _history()
+    events = queries.get_patient_timeline('whatsapp:+54 9 11 1234-5678', limit=50)
+    assert sorted(item['type'] for item in events) == [
+        'appointment', 'appointment', 'appointment', 'attachment', 'conversation', 'feedback', 'notification'
+    ]
+    assert [item['at'] for item in events] == sorted((item['at'] for item in events), reverse=True)
+    appointments = [item['data']['appointment_date'] for item in events if item['type'] == 'appointment']
+    assert [str(day) for day in appointments] == ['2020-01-20', '2015-01-15', '2010-01-10']
+
+def test_cursor_pages_cover_the_stream_once():
+    _history()
+    expected = queries.get_patient_timeline(PHONE, limit=50)
+    seen, after = [], None
+    while True:
+        page = queries.get_patient_timeline(PHONE, after, limit=2)
+        seen += page
+        if len(page) < 2:
+            break
+        after = decode_event_cursor(encode_event_cursor(page[-1]))
+    assert [(item['type'], item['id']) for item in seen] == [(item['type'], item['id']) for item in expected]
+
+def test_phone_index_bounds_with_ties():
+    index = PhoneIndex(created_moment)
+    for record_id in (1, 2, 3):
+        index.add(PHONE, {'id': record_id, 'created_at': '2030-01-01T10:00:00'})
+    assert [row['id'] for _, row in index.newest(PHONE)] == [3, 2, 1]
+    moment = '2030-01-01T10:00:00.000000'
+    assert [row['id'] for _, row in index.newest(PHONE, bound('feedback', (moment, 'feedback', 2)))] == [1]
+    assert [row['id'] for _, row in index.newest(PHONE, bound('attachment', (moment, 'feedback', 2)))] == [3, 2, 1]
+    assert list(index.newest(PHONE, bound('notification', (moment, 'feedback', 2)))) == []
+    index.remove(PHONE, {'id': 2, 'created_at': '2030-01-01T10:00:00'})
+    assert [row['id'] for _, row in index.newest(PHONE)] == [3, 1]
+
+def test_timeline_endpoint():
+    _history()
+    app = create_app()
+    with app.test_client() as client:
+        assert client.get('/api/v1/patients/abc/timeline').status_code == 400
+        assert client.get(f'/api/v1/patients/{PHONE}/timeline?cursor=xyz').status_code == 400
+        first = client.get(f'/api/v1/patients/{PHONE}/timeline?limit=4').get_json()
+        assert first['phone_number'] == PHONE and len(first['events']) == 4
+        rest = client.get(f"/api/v1/patients/{PHONE}/timeline?cursor={first['next_cursor']}").get_json()
+        assert len(rest['events']) == 3 and rest['next_cursor'] is None
+        appointment = next(item for item in rest['events'] if item['type'] == 'appointment')
+        assert appointment['data']['appointment_time'].startswith(('09:00', '10:00', '11:00'))
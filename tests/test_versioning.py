@@ -0,0 +1,93 @@
+import importlib
+import pytest
+from datetime import date, time
+from app.db import queries
+from app.db.errors import VersionConflictError
+from app.main import create_app
+from app.schemas.turno_schema import TurnoUpdate
+from app.services.agenda_service import AgendaService
+
+pytestmark = pytest.mark.usefixtures('backend')
+
+def _book():
+    return queries.save_appointment({
+        'phone_number': '+5491112345678',
+        'appointment_date': date(2030, 1, 15),
+        'appointment_time': time(9, 0)
+    })
+
+def test_every_update_bumps_the_version():
+    appointment = _book()
+    assert appointment['version'] == 1
+    assert queries.update_appointment(appointment['id'], {'notes': 'uno'})
+    assert queries.update_appointment(appointment['id'], {'notes': 'dos', 'version': 99}, expected_version=2)
+    assert queries.get_appointment(appointment['id'])['version'] == 3
+
+def test_stale_version_fails_without_writing():
+    appointment = _book()
+    queries.update_appointment(appointment['id'], {'status': 'confirmado'}, expected_version=1)
+    with pytest.raises(VersionConflictError):
+        queries.update_appointment(appointment['id'], {'status': 'cancelado'}, expected_version=1)
+    current = queries.get_appointment(appointment['id'])
+    assert current['status'] == 'confirmado' and current['version'] == 2
+    assert not queries.update_appointment(12345, {'notes': 'x'}, expected_version=1)
+
+def test_service_retries_read_modify_write(monkeypatch):
+    appointment = _book()
+    service = AgendaService()
+    original = queries.get_appointment
+    raced = []
+
+    def get_appointment(appointment_id):
+        # La primera lectura queda vieja: otro worker modifica el turno antes de la escritura
+        current = dict(original(appointment_id))
+        if not raced:
+            raced.append(True)
+            queries.update_appointment(appointment_id, {'notes': 'del scheduler'})
+        return current
+
+    # app.services.agenda_service es también la instancia del servicio: se parchea el módulo
+    monkeypatch.setattr(importlib.import_module('app.services.agenda_service'), 'get_appointment', get_appointment)
+    assert service.cancel_appointment(appointment['id'])['success']
+    current = original(appointment['id'])
+    assert current['status'] == 'cancelado' and current['notes'] == 'del scheduler' and current['version'] == 3
+
+def test_client_version_conflict_is_reported():
+    appointment = _book()
+    service = AgendaService()
+    queries.update_appointment(appointment['id'], {'notes': 'otro cambio'})
+    result = service.update_appointment(appointment['id'], TurnoUpdate(notes='mío', version=1))
+    assert result['error'] == 'VERSION_CONFLICT'
+    assert queries.get_appointment(appointment['id'])['notes'] == 'otro cambio'
+    app = create_app()
+    with app.test_client() as client:
+        response = client.put(f"/api/v1/appointments/{appointment['id']}", json={'notes': 'mío', 'version': 1})
+        assert response.status_code == 409
+        assert client.put(f"/api/v1/appointments/{appointment['id']}", json={'version': 'x'}).status_code == 400
+        response = client.post(f"/api/v1/appointments/{appointment['id']}/cancel", json={'version': 2})
+        assert response.status_code == 200
+    assert queries.get_appointment(appointment['id'])['status'] == 'cancelado'
+
+def test_failed_writes_are_not_reported_as_success(backend, monkeypatch):
+    appointment = _book()
+    service = AgendaService()
+
+    def broken(*args, **kwargs):
+        raise RuntimeError('base caída')
+
+    monkeypatch.setattr(backend, 'update_appointment', broken)
+    result = service.update_appointment(appointment['id'], TurnoUpdate(notes='nueva'))
+    assert not result['success'] and result['message'] == 'Error interno al actualizar el turno'
+    assert not service.cancel_appointment(appointment['id'])['success']
+    monkeypatch.undo()
+
+    # Borrado por otro worker entre la lectura y la escritura
+    agenda_module = importlib.import_module('app.services.agenda_service')
+    original = queries.update_appointment
+
+    def deleted_meanwhile(appointment_id, changes, expected_version=None):
+        queries.delete_appointment(appointment_id)
+        return original(appointment_id, changes, expected_version=expected_version)
+
+    monkeypatch.setattr(agenda_module, 'update_appointment', deleted_meanwhile)
+    assert service.update_appointment(appointment['id'], TurnoUpdate(notes='nueva'))['error'] == 'APPOINTMENT_NOT_FOUND'
@@ -1,5 +1,8 @@
 import pytest
+from flask import Flask
+from app.db.queries import get_all_feedback
 from app.main import create_app
+from app.services.feedback_tracker import feedback_tracker
 
 @pytest.fixture
 def client():
@@ -17,4 +20,22 @@ def test_webhook_invalid_data(client):
 def test_webhook_health(client):
     response = client.get('/webhook/health')
     assert response.status_code == 200
-    assert b'status' in response.data 
\ No newline at end of file
+    assert b'status' in response.data 
+def test_only_the_first_reply_after_followup_is_feedback(backend):
+    # app/routes/webhook.py (respuestas TwiML) no está registrado en create_app y hoy no
+    # importa: app.utils.keywords no define match_keywords
+    webhook = pytest.importorskip('app.routes.webhook', exc_type=ImportError)
+    app = Flask(__name__)
+    app.register_blueprint(webhook.webhook_bp)
+    feedback_tracker.add('+5491112345678', 'Ana')
+    try:
+        with app.test_client() as twilio:
+            response = twilio.post('/webhook', data={'From': 'whatsapp:+5491112345678', 'Body': 'Excelente atención'})
+            assert 'Gracias por tu mensaje' in response.get_data(as_text=True)
+            assert [item['comment'] for item in get_all_feedback()] == ['Excelente atención']
+            # El segundo mensaje (p. ej. pedir otro turno) sigue el flujo normal
+            response = twilio.post('/webhook', data={'From': 'whatsapp:+5491112345678', 'Body': 'Hola'})
+            assert 'Gracias por tu mensaje' not in response.get_data(as_text=True)
+            assert len(get_all_feedback()) == 1
+    finally:
+        feedback_tracker.discard('+5491112345678')